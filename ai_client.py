@@ -1,5 +1,181 @@
+import itertools
+import math
+import queue
+import re
+import threading
+import time
+from collections import OrderedDict
 from openai import OpenAI
 import config
+from metrics import ai_metrics
+
+# 单个交易决策的回复格式
+DECISION_FORMAT = "ACTION:[LONG/SHORT/HOLD], TP_CONS:[价格/NONE], SL_CONS:[价格/NONE], TP_AGGR:[价格/NONE], SL_AGGR:[价格/NONE], LEVERAGE:[1-20], MARGIN_MODE:[全仓/逐仓], REASON:[简短理由]"
+_ACTION_RE = re.compile(r"ACTION\s*:\s*(LONG|SHORT|HOLD)\b")
+
+def is_valid_decision(text):
+    """检查决策文本是否包含合法的 ACTION 字段"""
+    return bool(text) and _ACTION_RE.search(text) is not None
+
+class DecisionCache:
+    """
+    AI 交易决策缓存:
+    以量化后的行情指纹 (币种, 价格档位, MA5 档位, 波动率档位) 为键，带 TTL 和 LRU 淘汰
+    """
+
+    def __init__(self, ttl=120, max_size=256, price_step=0.001, vol_step=0.0025):
+        self.ttl = ttl               # 缓存有效期 (秒)
+        self.max_size = max_size
+        self.price_step = price_step # 价格/MA5 档位宽度 (相对值，0.001 = 0.1%)
+        self.vol_step = vol_step     # 波动率档位宽度 (波动率/价格)
+        self._entries = OrderedDict() # key -> (写入时间, 决策文本)
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.expired = 0
+        self.evictions = 0
+
+    def fingerprint(self, symbol, price, ma5, volatility):
+        """价格和 MA5 按对数档位量化，波动率按相对价格的比例量化"""
+        log_step = math.log1p(self.price_step)
+        price_bucket = round(math.log(price) / log_step) if price > 0 else 0
+        ma5_bucket = round(math.log(ma5) / log_step) if ma5 and ma5 > 0 else 0
+        vol_bucket = round(volatility / price / self.vol_step) if price > 0 else 0
+        return (symbol, price_bucket, ma5_bucket, vol_bucket)
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            stored_at, value = entry
+            if time.time() - stored_at > self.ttl:
+                del self._entries[key]
+                self.expired += 1
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def put(self, key, value):
+        with self._lock:
+            self._entries[key] = (time.time(), value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                'size': len(self._entries),
+                'hits': self.hits,
+                'misses': self.misses,
+                'expired': self.expired,
+                'evictions': self.evictions,
+                'hit_rate': self.hits / total if total else 0.0
+            }
+
+def estimate_tokens(text):
+    """粗略估算 token 数: 中日韩字符约 1 token/字，其余约 4 字符/token"""
+    if not text:
+        return 0
+    cjk = sum(1 for ch in text if '\u2e80' <= ch <= '\u9fff' or '\uac00' <= ch <= '\ud7af' or '\uff00' <= ch <= '\uffef')
+    return cjk + (len(text) - cjk + 3) // 4 + 4 # 每条消息额外约 4 token 的格式开销
+
+class ConversationMemory:
+    """
+    固定 token 预算的对话记忆:
+    - 最近的对话原文保留在预算内
+    - 超出预算的旧对话移出原文，在后台线程中压缩进滚动摘要，不阻塞请求
+    """
+
+    def __init__(self, summarize=None, max_tokens=2000, summary_tokens=400):
+        self.summarize = summarize       # summarize(旧摘要, [消息]) -> 新摘要，在后台线程调用
+        self.max_tokens = max_tokens     # 原文对话的 token 预算
+        self.summary_tokens = summary_tokens
+        self.summary = ""
+        self._turns = []                 # [(message, tokens)]
+        self._turn_tokens = 0
+        self._to_compact = []            # 等待压缩进摘要的旧消息
+        self._compacting = False
+        self._generation = 0             # clear() 时递增，压缩线程据此丢弃过期的摘要
+        self._lock = threading.Lock()
+
+    def add(self, role, content):
+        tokens = estimate_tokens(content)
+        with self._lock:
+            self._turns.append(({"role": role, "content": content}, tokens))
+            self._turn_tokens += tokens
+            # 超出预算时按整轮 (user + assistant) 移出最旧的对话
+            while self._turn_tokens > self.max_tokens and len(self._turns) > 2:
+                for _ in range(2):
+                    message, old_tokens = self._turns.pop(0)
+                    self._turn_tokens -= old_tokens
+                    self._to_compact.append(message)
+            start = bool(self._to_compact) and not self._compacting
+            if start:
+                self._compacting = True
+        if start:
+            threading.Thread(target=self._compact, daemon=True).start()
+
+    def messages(self):
+        """返回要发送给模型的记忆消息: 摘要 (如有) + 预算内的最近对话"""
+        with self._lock:
+            result = []
+            if self.summary:
+                result.append({"role": "system", "content": f"【早期对话摘要】\n{self.summary}"})
+            result.extend(message for message, _ in self._turns)
+            return result
+
+    def token_count(self):
+        with self._lock:
+            return self._turn_tokens + estimate_tokens(self.summary)
+
+    def clear(self):
+        with self._lock:
+            self.summary = ""
+            self._turns = []
+            self._turn_tokens = 0
+            self._to_compact = []
+            self._generation += 1
+
+    def _compact(self):
+        """后台压缩: 持续把待压缩的消息合并进摘要，直到队列为空"""
+        while True:
+            with self._lock:
+                batch, self._to_compact = self._to_compact, []
+                previous = self.summary
+                generation = self._generation
+                if not batch:
+                    self._compacting = False
+                    return
+            try:
+                summary = self.summarize(previous, batch) if self.summarize else None
+            except Exception as e:
+                print(f"Memory summarize error: {e}")
+                summary = None
+            if not summary:
+                # 摘要失败时退化为截断拼接，保证记忆仍然有界
+                summary = previous + "\n" + "\n".join(f"{m['role']}: {m['content']}" for m in batch)
+            summary = self._truncate(summary.strip())
+            with self._lock:
+                # 压缩期间记忆已被清空，结果属于清空前的对话，直接丢弃
+                if generation == self._generation:
+                    self.summary = summary
+
+    def _truncate(self, text):
+        # 超出摘要预算时保留最新的部分
+        while estimate_tokens(text) > self.summary_tokens and len(text) > 1:
+            text = text[len(text) // 4:]
+        return text
 
 class CryptoAIAdvisor:
     def __init__(self):
@@ -8,12 +184,90 @@ class CryptoAIAdvisor:
             base_url=config.DEEPSEEK_BASE_URL
         )
         self.model = config.DEEPSEEK_MODEL
-        self.chat_history = [] # 存储对话记忆
+        # 存储对话记忆 (固定 token 预算，旧对话在后台压缩为摘要)
+        self.memory = ConversationMemory(summarize=self._summarize_history,
+                                         max_tokens=config.AI_MEMORY_MAX_TOKENS)
+        self.decision_cache = DecisionCache(
+            ttl=config.AI_DECISION_CACHE_TTL,
+            price_step=config.AI_DECISION_PRICE_STEP,
+            vol_step=config.AI_DECISION_VOL_STEP
+        )
+        # 调用统计: ai.<类型>.queue_wait / ttft / latency 直方图，token 与错误计数器
+        self.metrics = ai_metrics
 
-    def get_advice(self, symbol, market_data, user_query):
+    def _record_usage(self, call_type, usage):
+        if usage is None:
+            return
+        self.metrics.increment(f"ai.{call_type}.prompt_tokens", getattr(usage, 'prompt_tokens', 0) or 0)
+        self.metrics.increment(f"ai.{call_type}.completion_tokens", getattr(usage, 'completion_tokens', 0) or 0)
+
+    def _record_error(self, call_type, error):
+        self.metrics.increment(f"ai.{call_type}.errors")
+        self.metrics.increment(f"ai.{call_type}.errors.{type(error).__name__}")
+
+    def _create(self, call_type, messages, **kwargs):
+        """非流式调用模型，记录耗时、token 用量和错误类型"""
+        self.metrics.increment(f"ai.{call_type}.calls")
+        start = time.perf_counter()
+        try:
+            response = self.client.chat.completions.create(
+                model=self.model,
+                messages=messages,
+                stream=False,
+                **kwargs
+            )
+        except Exception as e:
+            self._record_error(call_type, e)
+            raise
+        self.metrics.record(f"ai.{call_type}.latency", (time.perf_counter() - start) * 1000.0)
+        self._record_usage(call_type, getattr(response, 'usage', None))
+        return response
+
+    def telemetry(self):
         """
-        根据市场数据和用户问题提供建议
+        按调用类型汇总: {类型: {calls, errors, recent_calls, recent_errors, latency, ttft, queue_wait, prompt_tokens, completion_tokens}}
+        calls/errors 为累计次数，recent_calls/recent_errors 与耗时统计一样只算最近的滚动窗口
         """
+        counters = self.metrics.counters()
+        recent = self.metrics.window_counters()
+        stats = {}
+        for call_type in ('advice', 'decision', 'batch', 'summary'):
+            prefix = f"ai.{call_type}."
+            calls = counters.get(prefix + 'calls', 0)
+            if not calls:
+                continue
+            stats[call_type] = {
+                'calls': calls,
+                'errors': counters.get(prefix + 'errors', 0),
+                'recent_calls': recent.get(prefix + 'calls', 0),
+                'recent_errors': recent.get(prefix + 'errors', 0),
+                'latency': self.metrics.summary(prefix + 'latency'),
+                'ttft': self.metrics.summary(prefix + 'ttft'),
+                'queue_wait': self.metrics.summary(prefix + 'queue_wait'),
+                'prompt_tokens': counters.get(prefix + 'prompt_tokens', 0),
+                'completion_tokens': counters.get(prefix + 'completion_tokens', 0),
+            }
+        return stats
+
+    def telemetry_alerts(self, p95_ms=None, error_rate=None):
+        """返回超出阈值的告警文本列表 (p95 总耗时、错误率)"""
+        p95_ms = config.AI_ALERT_P95_MS if p95_ms is None else p95_ms
+        error_rate = config.AI_ALERT_ERROR_RATE if error_rate is None else error_rate
+        alerts = []
+        for call_type, s in self.telemetry().items():
+            latency = s['latency']
+            if latency and latency['count'] and latency['p95_ms'] > p95_ms:
+                alerts.append(f"AI {call_type} 调用 p95 耗时 {latency['p95_ms'] / 1000:.1f}s 超过阈值 {p95_ms / 1000:.1f}s")
+            # 错误率按最近窗口计算，早已恢复的历史错误不会一直触发告警
+            if s['recent_calls'] < 5:
+                continue
+            rate = s['recent_errors'] / s['recent_calls']
+            if rate > error_rate:
+                alerts.append(f"AI {call_type} 调用错误率 {rate:.0%} 超过阈值 {error_rate:.0%}")
+        return alerts
+
+    def _build_advice_messages(self, symbol, market_data, user_query):
+        """构造对话请求的消息列表 (包含记忆)"""
         system_prompt = (
             "你是一位专业的加密货币投资指导师。你拥有深度思考能力，会先分析市场逻辑再给出建议。"
             "你将分析用户提供的市场数据，并结合历史对话记忆给出专业的见解。"
@@ -25,16 +279,70 @@ class CryptoAIAdvisor:
         
         # 构造完整的消息列表（包含记忆）
         messages = [{"role": "system", "content": system_prompt}]
-        # 只保留最近 10 条记忆，防止上下文过长
-        messages.extend(self.chat_history[-10:])
+        # 记忆总量受 token 预算限制，防止上下文过长
+        messages.extend(self.memory.messages())
         messages.append({"role": "user", "content": current_user_msg})
-        
+        return messages
+
+    def _remember(self, user_query, answer):
+        # 更新记忆 (记忆中只保留核心对话，不存思考过程以节省 token)
+        self.memory.add("user", user_query)
+        self.memory.add("assistant", answer)
+
+    def _summarize_history(self, previous_summary, messages):
+        """把旧摘要和移出预算的对话压缩成新的摘要 (在记忆的后台线程中调用)"""
+        dialog = "\n".join(f"{'用户' if m['role'] == 'user' else 'AI'}: {m['content']}" for m in messages)
+        prompt = (
+            f"【已有摘要】\n{previous_summary or '无'}\n\n【新增对话】\n{dialog}\n\n"
+            "请将以上内容合并为一段简洁的中文摘要，保留用户关注的币种、观点、持仓和计划，不超过 300 字。"
+        )
+        response = self._create('summary', [{"role": "user", "content": prompt}], temperature=0.2, timeout=60)
+        return response.choices[0].message.content
+
+    def _stream_completion(self, messages, call_type='advice', **kwargs):
+        """
+        流式调用模型，逐个产出增量: ('reasoning', 文本) 或 ('content', 文本)
+        同时记录首个增量的到达时间 (ttft)、总耗时、token 用量和错误类型
+        """
+        self.metrics.increment(f"ai.{call_type}.calls")
+        start = time.perf_counter()
+        first = True
         try:
-            response = self.client.chat.completions.create(
+            stream = self.client.chat.completions.create(
                 model=self.model,
                 messages=messages,
-                stream=False
+                stream=True,
+                # 最后一个数据块附带本次请求的 token 用量
+                stream_options={"include_usage": True},
+                **kwargs
             )
+            for chunk in stream:
+                self._record_usage(call_type, getattr(chunk, 'usage', None))
+                if not chunk.choices:
+                    continue
+                delta = chunk.choices[0].delta
+                # 深度思考内容 (针对 DeepSeek-R1 等模型)
+                reasoning = getattr(delta, 'reasoning_content', None)
+                if (reasoning or delta.content) and first:
+                    first = False
+                    self.metrics.record(f"ai.{call_type}.ttft", (time.perf_counter() - start) * 1000.0)
+                if reasoning:
+                    yield 'reasoning', reasoning
+                if delta.content:
+                    yield 'content', delta.content
+        except Exception as e:
+            self._record_error(call_type, e)
+            raise
+        self.metrics.record(f"ai.{call_type}.latency", (time.perf_counter() - start) * 1000.0)
+
+    def get_advice(self, symbol, market_data, user_query):
+        """
+        根据市场数据和用户问题提供建议
+        """
+        messages = self._build_advice_messages(symbol, market_data, user_query)
+        
+        try:
+            response = self._create('advice', messages)
             
             # 尝试获取深度思考内容 (针对 DeepSeek-R1 等模型)
             reasoning = getattr(response.choices[0].message, 'reasoning_content', None)
@@ -45,39 +353,332 @@ class CryptoAIAdvisor:
             if reasoning:
                 full_response = f"【思考过程】\n{reasoning}\n\n【建议】\n{answer}"
             
-            # 更新记忆 (记忆中只保留核心对话，不存思考过程以节省 token)
-            self.chat_history.append({"role": "user", "content": user_query})
-            self.chat_history.append({"role": "assistant", "content": answer})
+            self._remember(user_query, answer)
             
             return full_response
         except Exception as e:
             return f"AI 接口调用失败: {str(e)}"
 
-    def get_trade_decision(self, symbol, market_data):
+    def stream_advice(self, symbol, market_data, user_query, timeout=None):
+        """
+        get_advice 的流式版本，边生成边产出 ('reasoning'|'content', 增量文本)
+        调用失败时抛出异常，由调用方处理
+        timeout: 可选的请求超时 (秒)
+        """
+        messages = self._build_advice_messages(symbol, market_data, user_query)
+        answer_parts = []
+        extra = {'timeout': timeout} if timeout else {}
+        for kind, text in self._stream_completion(messages, **extra):
+            if kind == 'content':
+                answer_parts.append(text)
+            yield kind, text
+        self._remember(user_query, "".join(answer_parts))
+
+    def get_trade_decision(self, symbol, market_data, on_delta=None, state=None, timeout=None):
         """
         让 AI 直接做出交易决策
+        on_delta: 可选回调 on_delta(kind, text)，传入时使用流式请求
+        state: 可选的数值行情 {'price', 'ma5', 'volatility'}，传入时相近的行情直接命中决策缓存
+        timeout: 可选的请求超时 (秒)
         返回格式: ACTION:LONG/SHORT/HOLD, TP_CONS:price, SL_CONS:price, TP_AGGR:price, SL_AGGR:price, LEVERAGE:num, MARGIN_MODE:全仓/逐仓, REASON:text
         """
+        cache_key = None
+        if state:
+            cache_key = self.decision_cache.fingerprint(symbol, state['price'], state.get('ma5'), state.get('volatility', 0.0))
+            cached = self.decision_cache.get(cache_key)
+            if cached is not None:
+                self.metrics.increment("ai.decision.cache_hits")
+                return cached
+
+        decision = self._request_trade_decision(symbol, market_data, on_delta, timeout)
+        # 出错时的 HOLD 回复和格式不合法的回复不缓存
+        if cache_key is not None and is_valid_decision(decision) and "AI Error" not in decision:
+            self.decision_cache.put(cache_key, decision)
+        return decision
+
+    def _request_trade_decision(self, symbol, market_data, on_delta=None, timeout=None):
+        """请求模型给出交易决策 (不经过缓存)"""
         system_prompt = (
             "你是一个高频量化交易机器人。请分析市场数据并给出即时交易决策。"
             "你必须提供两套止盈止损方案：保守型 (CONS) 和 激进型 (AGGR)。"
             "你必须严格按照以下格式回复，不要有任何多余文字："
-            "ACTION:[LONG/SHORT/HOLD], TP_CONS:[价格/NONE], SL_CONS:[价格/NONE], TP_AGGR:[价格/NONE], SL_AGGR:[价格/NONE], LEVERAGE:[1-20], MARGIN_MODE:[全仓/逐仓], REASON:[简短理由]"
+            + DECISION_FORMAT +
             "\n策略提示：止盈止损必须设置合理。保守型止盈较近，激进型止盈较远。"
         )
         
         user_prompt = f"币种: {symbol}\n数据: {market_data}\n请给出决策。"
+        messages = [
+            {"role": "system", "content": system_prompt},
+            {"role": "user", "content": user_prompt}
+        ]
         
+        extra = {'timeout': timeout} if timeout else {}
         try:
-            response = self.client.chat.completions.create(
-                model=self.model,
-                messages=[
-                    {"role": "system", "content": system_prompt},
-                    {"role": "user", "content": user_prompt}
-                ],
-                temperature=0.3, # 降低随机性
-                stream=False
-            )
+            if on_delta:
+                # 流式模式：增量通过回调实时产出，最终仍返回完整决策文本
+                parts = []
+                for kind, text in self._stream_completion(messages, 'decision', temperature=0.3, **extra):
+                    on_delta(kind, text)
+                    if kind == 'content':
+                        parts.append(text)
+                return "".join(parts)
+
+            response = self._create('decision', messages, temperature=0.3, **extra) # 降低随机性
             return response.choices[0].message.content
         except Exception as e:
             return f"ACTION:HOLD, REASON:AI Error {str(e)}"
+
+    def get_trade_decisions(self, summaries, states=None, fallback=True, timeout=None):
+        """
+        批量交易决策: 把多个币种的行情摘要放进一次请求，返回 {symbol: 决策文本}
+        summaries: {symbol: market_data}
+        states: 可选 {symbol: {'price', 'ma5', 'volatility'}}，命中缓存的币种不再发送
+        fallback: 批量回复中缺失或格式错误的币种再合并补发一次；否则返回 HOLD
+        timeout: 可选的总超时 (秒)，补发请求只使用剩余时间
+        """
+        deadline = time.monotonic() + timeout if timeout else None
+        remaining = lambda: max(0.1, deadline - time.monotonic()) if deadline else None
+        states = states or {}
+        results = {}
+        cache_keys = {}
+        pending = {}
+        for symbol, market_data in summaries.items():
+            state = states.get(symbol)
+            if state:
+                key = self.decision_cache.fingerprint(symbol, state['price'], state.get('ma5'), state.get('volatility', 0.0))
+                cached = self.decision_cache.get(key)
+                if cached is not None:
+                    results[symbol] = cached
+                    continue
+                cache_keys[symbol] = key
+            pending[symbol] = market_data
+
+        parsed = self._request_decisions(pending, remaining())
+        missing = {symbol: data for symbol, data in pending.items() if symbol not in parsed}
+        if fallback and missing and len(pending) > 1 and (deadline is None or deadline > time.monotonic()):
+            # 缺失的币种合并成一次请求补发，而不是逐个串行请求
+            parsed.update(self._request_decisions(missing, remaining()))
+
+        for symbol in pending:
+            decision = parsed.get(symbol)
+            if decision is None:
+                decision = "ACTION:HOLD, REASON:AI 批量决策缺失该币种"
+            if symbol in cache_keys and is_valid_decision(decision) and "AI Error" not in decision:
+                self.decision_cache.put(cache_keys[symbol], decision)
+            results[symbol] = decision
+        return results
+
+    def _request_decisions(self, summaries, timeout=None):
+        """只有一个币种时走单币种请求，否则走批量请求；返回能成功解析的 {symbol: 决策文本}"""
+        if len(summaries) == 1:
+            symbol, market_data = next(iter(summaries.items()))
+            decision = self._request_trade_decision(symbol, market_data, timeout=timeout)
+            return {symbol: decision} if is_valid_decision(decision) else {}
+        return self._request_batch_decisions(summaries, timeout) if summaries else {}
+
+    def _request_batch_decisions(self, summaries, timeout=None):
+        """一次请求多个币种的决策，返回能成功解析的 {symbol: 决策文本}"""
+        system_prompt = (
+            "你是一个高频量化交易机器人。请分析每个币种的市场数据并分别给出即时交易决策。"
+            "每个币种都必须提供两套止盈止损方案：保守型 (CONS) 和 激进型 (AGGR)。"
+            "你必须严格按照以下格式回复，每个币种一行，不要有任何多余文字："
+            "币种: " + DECISION_FORMAT +
+            "\n策略提示：止盈止损必须设置合理。保守型止盈较近，激进型止盈较远。"
+        )
+        lines = [f"{symbol} | {market_data}" for symbol, market_data in summaries.items()]
+        user_prompt = "币种 | 数据\n" + "\n".join(lines) + f"\n请给出以上 {len(lines)} 个币种的决策。"
+
+        extra = {'timeout': timeout} if timeout else {}
+        try:
+            response = self._create('batch', [
+                {"role": "system", "content": system_prompt},
+                {"role": "user", "content": user_prompt}
+            ], temperature=0.3, **extra)
+            content = response.choices[0].message.content or ""
+        except Exception as e:
+            print(f"Batch decision error: {e}")
+            return {}
+        return self._parse_batch_decisions(content, summaries)
+
+    @staticmethod
+    def _parse_batch_decisions(content, symbols):
+        """逐行解析 '币种: ACTION:...' 格式，只保留请求过且格式合法的币种"""
+        parsed = {}
+        for line in content.splitlines():
+            line = line.strip().lstrip('-*').strip()
+            if ':' not in line:
+                continue
+            head, rest = line.split(':', 1)
+            symbol = head.strip().strip('*[]`').upper()
+            decision = rest.strip()
+            if symbol in symbols and symbol not in parsed and is_valid_decision(decision):
+                parsed[symbol] = decision
+        return parsed
+
+
+class AIRequest:
+    """调度器中的一个 AI 请求，可取消"""
+
+    def __init__(self, kind, symbol, priority, deadline, run, on_done, generation=None):
+        self.kind = kind           # 'chat'、'decision' 或 'batch'
+        self.symbol = symbol
+        self.priority = priority   # 数值越小越优先
+        self.deadline = deadline   # time.monotonic() 截止时间
+        self.generation = generation # 批量请求为 {symbol: 编号}
+        self.cancelled = False
+        self.submitted = time.monotonic()
+        self._run = run
+        self._on_done = on_done
+
+    def cancel(self):
+        self.cancelled = True
+
+    def remaining(self):
+        return self.deadline - time.monotonic()
+
+
+class AIScheduler:
+    """
+    AI 请求调度器:
+    - 最多 K 个请求并行，共用 CryptoAIAdvisor 的同一个 HTTP 客户端
+    - 每个请求带截止时间，超时的请求在排队或流式输出过程中被放弃
+    - 同一币种的新决策请求会使旧的决策请求作废，旧结果不再回调
+    - 对话请求优先于后台交易信号
+    """
+    PRIORITY_CHAT = 0
+    PRIORITY_DECISION = 1
+
+    def __init__(self, advisor, max_parallel=3):
+        self.advisor = advisor
+        self.max_parallel = max_parallel
+        self._queue = queue.PriorityQueue()
+        self._seq = itertools.count()
+        self._generations = {} # symbol -> 最新的决策请求编号
+        self._lock = threading.Lock()
+        self._workers = []
+        self.dropped = 0
+
+    def _ensure_workers(self):
+        if self._workers:
+            return
+        for i in range(self.max_parallel):
+            t = threading.Thread(target=self._worker_loop, name=f"ai-{i}", daemon=True)
+            t.start()
+            self._workers.append(t)
+
+    def _submit(self, request):
+        self._ensure_workers()
+        self._queue.put((request.priority, next(self._seq), request))
+        return request
+
+    def submit_chat(self, symbol, market_data, query, on_delta=None, on_done=None, deadline=120.0):
+        """
+        提交对话请求 (流式)
+        on_delta(kind, text): 在工作线程中逐个回调增量
+        on_done(error): 完成时回调，成功时 error 为 None
+        """
+        def run(request):
+            for kind, text in self.advisor.stream_advice(symbol, market_data, query, timeout=request.remaining()):
+                if request.cancelled or request.remaining() <= 0:
+                    raise TimeoutError("AI 请求已超时或被取消")
+                if on_delta:
+                    on_delta(kind, text)
+            return None
+
+        def done(result, error):
+            if on_done:
+                on_done(error)
+
+        return self._submit(AIRequest('chat', symbol, self.PRIORITY_CHAT, time.monotonic() + deadline, run, done))
+
+    def submit_decision(self, symbol, market_data, state=None, on_done=None, deadline=25.0):
+        """
+        提交交易决策请求，on_done(decision) 只会在该请求仍是该币种最新请求时回调
+        """
+        with self._lock:
+            generation = self._generations.get(symbol, 0) + 1
+            self._generations[symbol] = generation
+
+        def run(request):
+            return self.advisor.get_trade_decision(symbol, market_data, state=state, timeout=request.remaining())
+
+        def done(result, error):
+            if on_done:
+                on_done(result if error is None else f"ACTION:HOLD, REASON:AI Error {error}")
+
+        return self._submit(AIRequest('decision', symbol, self.PRIORITY_DECISION,
+                                      time.monotonic() + deadline, run, done, generation))
+
+    def submit_decisions(self, summaries, states=None, on_done=None, deadline=25.0):
+        """
+        提交批量交易决策请求: 多个币种合并成一次 AI 调用
+        summaries: {symbol: market_data}，states: 可选 {symbol: 数值行情}
+        on_done(symbol, decision) 逐个币种回调，只回调仍是该币种最新请求的币种
+        """
+        with self._lock:
+            generations = {}
+            for symbol in summaries:
+                generations[symbol] = self._generations.get(symbol, 0) + 1
+                self._generations[symbol] = generations[symbol]
+
+        def run(request):
+            return self.advisor.get_trade_decisions(summaries, states=states, timeout=request.remaining())
+
+        def done(result, error):
+            if not on_done:
+                return
+            for symbol in summaries:
+                if not self._is_current(symbol, generations[symbol]):
+                    continue
+                if error is None:
+                    on_done(symbol, result.get(symbol, "ACTION:HOLD, REASON:AI 批量决策缺失该币种"))
+                else:
+                    on_done(symbol, f"ACTION:HOLD, REASON:AI Error {error}")
+
+        return self._submit(AIRequest('batch', None, self.PRIORITY_DECISION,
+                                      time.monotonic() + deadline, run, done, generations))
+
+    def _is_current(self, symbol, generation):
+        with self._lock:
+            return self._generations.get(symbol) == generation
+
+    def _is_stale(self, request):
+        if request.cancelled:
+            return True
+        if isinstance(request.generation, dict):
+            # 批量请求中的币种全部被新请求取代时才作废
+            return not any(self._is_current(s, g) for s, g in request.generation.items())
+        if request.generation is not None:
+            return not self._is_current(request.symbol, request.generation)
+        return False
+
+    def _worker_loop(self):
+        while True:
+            _, _, request = self._queue.get()
+            call_type = 'advice' if request.kind == 'chat' else request.kind
+            try:
+                # 排队期间已作废的请求直接丢弃；仅仅超时的请求仍回调超时错误 (决策请求由 done 转为 HOLD)，调用方不会一直等待
+                if self._is_stale(request) or request.remaining() <= 0:
+                    self.dropped += 1
+                    ai_metrics.increment(f"ai.{call_type}.dropped")
+                    if not self._is_stale(request):
+                        request._on_done(None, "AI 请求排队超时")
+                    continue
+                ai_metrics.record(f"ai.{call_type}.queue_wait", (time.monotonic() - request.submitted) * 1000.0)
+                try:
+                    result, error = request._run(request), None
+                except Exception as e:
+                    result, error = None, str(e)
+                # 执行期间被新的行情数据取代的决策不再回调
+                if self._is_stale(request):
+                    self.dropped += 1
+                    ai_metrics.increment(f"ai.{call_type}.dropped")
+                    continue
+                request._on_done(result, error)
+            except Exception as e:
+                print(f"AI Scheduler Error: {e}")
+            finally:
+                self._queue.task_done()
+
+    def pending_count(self):
+        return self._queue.qsize()
@@ -0,0 +1,115 @@
+import time
+
+
+class TriggerEngine:
+    """
+    事件驱动的 AI 触发器:
+    每个 tick 用本地指标评估廉价条件，只有条件满足时才请求 AI 决策
+    - 价格相对上次触发时移动超过 k × ATR
+    - MA5 与 EMA20 交叉
+    - 当前 K 线成交量超过均量的 N 倍
+    - 持仓价格接近止盈/止损
+    条件需连续满足 debounce_ticks 次才触发，同一币种两次触发之间至少间隔 cooldown 秒
+    """
+
+    def __init__(self, atr_mult=1.5, volume_mult=3.0, near_tp_sl_atr=0.5, cooldown=60.0,
+                 debounce_ticks=2, max_idle=900.0):
+        self.atr_mult = atr_mult
+        self.volume_mult = volume_mult
+        self.near_tp_sl_atr = near_tp_sl_atr # 距离止盈/止损小于该倍数 ATR 时视为接近
+        self.cooldown = cooldown
+        self.debounce_ticks = debounce_ticks
+        self.max_idle = max_idle             # 长时间无触发时仍请求一次，保证信号不过期
+        self._state = {}                     # symbol -> 状态
+        self.fired = 0
+        self.suppressed = 0
+
+    def _symbol_state(self, symbol):
+        state = self._state.get(symbol)
+        if state is None:
+            state = self._state[symbol] = {
+                'anchor_price': None, # 上次触发时的价格
+                'last_fire': float('-inf'),
+                'ma_sign': 0,
+                'pending': 0,         # 持续性条件连续满足的次数
+                'latched': [],        # 交叉等瞬时事件，保留到下一次触发
+            }
+        return state
+
+    def _conditions(self, state, values, positions):
+        reasons = []
+        price = values.get('close')
+        atr = values.get('atr')
+        if price is None:
+            return reasons
+
+        if state['anchor_price'] is not None and atr and atr == atr and atr > 0:
+            move = abs(price - state['anchor_price'])
+            if move >= self.atr_mult * atr:
+                reasons.append(f"价格较上次信号移动 {move / atr:.1f}×ATR")
+
+        volume, volume_ma = values.get('volume'), values.get('volume_ma')
+        if volume_ma and volume_ma == volume_ma and volume >= self.volume_mult * volume_ma:
+            reasons.append(f"成交量放大 {volume / volume_ma:.1f} 倍")
+
+        if atr and atr == atr:
+            for pos in positions or []:
+                for key, label in (('tp', '止盈'), ('sl', '止损')):
+                    target = pos.get(key)
+                    if target and abs(price - target) <= self.near_tp_sl_atr * atr:
+                        reasons.append(f"{pos['side']} 持仓接近{label} {target}")
+        return reasons
+
+    def _check_cross(self, state, values):
+        """MA5/EMA20 交叉是瞬时事件，锁存起来避免被去抖或冷却丢掉"""
+        sma, ema = values.get('sma'), values.get('ema')
+        if sma is None or ema is None or sma != sma or ema != ema or sma == ema:
+            return
+        sign = 1 if sma > ema else -1
+        if state['ma_sign'] and sign != state['ma_sign']:
+            event = "MA5 上穿 EMA20" if sign > 0 else "MA5 下穿 EMA20"
+            if event not in state['latched']:
+                state['latched'].append(event)
+        state['ma_sign'] = sign
+
+    def evaluate(self, symbol, values, positions=None, now=None):
+        """
+        每个 tick 调用一次，返回触发原因列表；不需要请求 AI 时返回空列表
+        values: 指标快照 (IndicatorEngine.snapshot)
+        positions: 该币种的持仓 (用于检测接近止盈/止损)
+        """
+        if not values:
+            return []
+        now = time.time() if now is None else now
+        state = self._symbol_state(symbol)
+
+        self._check_cross(state, values)
+
+        # 持续性条件需连续满足 debounce_ticks 次 (去抖)
+        level = self._conditions(state, values, positions)
+        state['pending'] = state['pending'] + 1 if level else 0
+        reasons = level if state['pending'] >= self.debounce_ticks else []
+        reasons = reasons + state['latched']
+        if state['anchor_price'] is None:
+            reasons.append("首次评估")
+        elif now - state['last_fire'] >= self.max_idle:
+            reasons.append("长时间未更新信号")
+
+        if not reasons:
+            return []
+        if now - state['last_fire'] < self.cooldown:
+            self.suppressed += 1
+            return []
+
+        state['pending'] = 0
+        state['latched'] = []
+        state['last_fire'] = now
+        state['anchor_price'] = values['close']
+        self.fired += 1
+        return reasons
+
+    def reset(self, symbol=None):
+        if symbol is None:
+            self._state.clear()
+        else:
+            self._state.pop(symbol, None)
@@ -0,0 +1,89 @@
+"""
+K 线图渲染基准: 测量不同历史长度下每个 tick (更新最后一根 K 线 + 重绘) 的耗时，
+以及缩放/平移到任意范围时的单帧耗时。
+
+用法:
+    python bench_chart.py --sizes 1000 10000 100000 --ticks 200
+无显示环境时可加 QT_QPA_PLATFORM=offscreen。
+"""
+import argparse
+import sys
+import time
+import numpy as np
+import pyqtgraph as pg
+from PyQt5.QtWidgets import QApplication
+from metrics import LatencyRecorder
+from ui.chart_items import CandlestickItem
+
+
+def make_candles(n, interval=60.0, seed=0):
+    rng = np.random.default_rng(seed)
+    c = 100 + np.cumsum(rng.normal(0, 0.3, n))
+    o = np.concatenate(([100.0], c[:-1]))
+    h = np.maximum(o, c) + rng.random(n) * 0.2
+    l = np.minimum(o, c) - rng.random(n) * 0.2
+    x = 1_700_000_000 + np.arange(n) * interval
+    return x, o, h, l, c
+
+
+def run(sizes, ticks, window, visible):
+    app = QApplication.instance() or QApplication(sys.argv)
+    recorder = LatencyRecorder()
+    for n in sizes:
+        x, o, h, l, c = make_candles(n + ticks // 10 + 1)
+        plot = pg.PlotWidget(axisItems={'bottom': pg.DateAxisItem()})
+        plot.resize(1200, 600)
+        item = CandlestickItem()
+        plot.addItem(item)
+        plot.show()
+
+        # 加载 n 根历史 K 线
+        start = time.perf_counter()
+        item.setData(x[:n], o[:n], h[:n], l[:n], c[:n])
+        recorder.record(f"load.{n}", (time.perf_counter() - start) * 1000.0)
+        plot.setXRange(x[n - visible], x[n - 1], padding=0)
+        plot.setYRange(l[n - visible:n].min(), h[n - visible:n].max())
+        app.processEvents()
+
+        # 模拟实盘: 每个 tick 推送最近 window 根 K 线，最后一根价格变化，每 10 个 tick 收盘一根
+        end = n
+        for i in range(ticks):
+            if i and i % 10 == 0:
+                end += 1
+            live_c = c[end - 1] + np.sin(i) * 0.05
+            lo = max(0, end - window)
+            cc = c[lo:end].copy()
+            cc[-1] = live_c
+            start = time.perf_counter()
+            item.setData(x[lo:end], o[lo:end], np.maximum(h[lo:end], cc), np.minimum(l[lo:end], cc), cc)
+            recorder.record(f"update.{n}", (time.perf_counter() - start) * 1000.0)
+            start = time.perf_counter()
+            plot.grab() # 同步渲染整个视图
+            recorder.record(f"frame.{n}", (time.perf_counter() - start) * 1000.0)
+
+        # 缩放/平移: 随机选取从几百根到全部历史的可见范围
+        rng = np.random.default_rng(1)
+        for i in range(ticks // 4):
+            span = int(np.exp(rng.uniform(np.log(100), np.log(end))))
+            lo = int(rng.integers(0, end - span + 1))
+            start = time.perf_counter()
+            plot.setXRange(x[lo], x[lo + span - 1], padding=0)
+            plot.setYRange(l[lo:lo + span].min(), h[lo:lo + span].max(), padding=0)
+            plot.grab()
+            recorder.record(f"zoom.{n}", (time.perf_counter() - start) * 1000.0)
+        plot.close()
+    return recorder
+
+
+def main():
+    parser = argparse.ArgumentParser(description="K 线图增量渲染基准")
+    parser.add_argument('--sizes', type=int, nargs='+', default=[1000, 10000, 100000, 500000])
+    parser.add_argument('--ticks', type=int, default=200)
+    parser.add_argument('--window', type=int, default=900, help="每个 tick 推送的 K 线根数")
+    parser.add_argument('--visible', type=int, default=300, help="可见的 K 线根数")
+    args = parser.parse_args()
+    print(run(args.sizes, args.ticks, args.window, args.visible).report())
+
+
+if __name__ == "__main__":
+    main()
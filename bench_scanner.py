@@ -0,0 +1,64 @@
+"""
+全市场扫描基准: 用随机行情填满 N 个合约的 1m K 线窗口，测量 miniTicker 批量写入和一次完整扫描的耗时，
+并检查人为制造异动 (拉升 + 放量) 的合约能否排在前面。
+
+用法:
+    python bench_scanner.py --symbols 300 1000 3000 --scans 20
+"""
+import argparse
+import time
+import numpy as np
+from market_scanner import MarketScanner
+from metrics import LatencyRecorder
+
+
+def fill(scanner, n, seed=0):
+    """写入 n 个合约的完整窗口，返回人为制造异动的合约"""
+    rng = np.random.default_rng(seed)
+    w = scanner.window
+    now = int(time.time() * 1000) // 60_000
+    minutes = np.arange(now - w + 1, now + 1)
+    movers = {f"MOVE{i}USDT" for i in range(3)}
+    for i in range(n):
+        symbol = f"MOVE{i}USDT" if i < 3 else f"SYM{i}USDT"
+        r = rng.normal(0, 0.001, w)
+        v = rng.gamma(2.0, 50.0, w)
+        if symbol in movers:
+            r[-10:] += 0.004 # 最后 10 分钟持续拉升
+            v[-5:] *= 8      # 放量
+        c = 100 * np.exp(np.cumsum(r))
+        o = np.concatenate(([100.0], c[:-1]))
+        h, l = np.maximum(o, c) * 1.0005, np.minimum(o, c) * 0.9995
+        for k, m in enumerate(minutes):
+            scanner.apply_kline(symbol, int(m) * 60_000, o[k], h[k], l[k], c[k], v[k])
+    return movers
+
+
+def run(sizes, scans):
+    recorder = LatencyRecorder()
+    for n in sizes:
+        scanner = MarketScanner(min_quote_volume=0)
+        movers = fill(scanner, n)
+        tickers = [{'s': s, 'c': '101.0', 'o': '100.0', 'v': '1000', 'q': '1e8'} for s in scanner._symbols]
+        for _ in range(scans):
+            start = time.perf_counter()
+            scanner.apply_tickers(tickers)
+            recorder.record(f"{n} apply_tickers", (time.perf_counter() - start) * 1000.0)
+            start = time.perf_counter()
+            result = scanner.scan(top_n=10)
+            recorder.record(f"{n} scan", (time.perf_counter() - start) * 1000.0)
+        found = movers & {t['symbol'] for t in result['top'][:5]}
+        print(f"{n} 个合约: 异动合约进入前 5 的数量 {len(found)}/{len(movers)}, 第一名 {result['top'][0]['symbol']}")
+    print(recorder.report())
+
+
+def main():
+    parser = argparse.ArgumentParser(description="全市场扫描基准")
+    parser.add_argument('--symbols', nargs='+', type=int, default=[300, 1000, 3000])
+    parser.add_argument('--scans', type=int, default=20)
+    args = parser.parse_args()
+    run(args.symbols, args.scans)
+
+
+if __name__ == "__main__":
+    main()
@@ -26,16 +26,22 @@ class BinanceDataClient:
             print(f"Binance Client Init Error: {e}")
             self.client = None
 
-    def get_klines(self, symbol, interval=config.KLINE_INTERVAL, limit=config.KLINE_LIMIT):
-        """获取K线数据 (优先尝试期货，失败则尝试现货)"""
+    def get_klines(self, symbol, interval=config.KLINE_INTERVAL, limit=config.KLINE_LIMIT, end_time=None):
+        """
+        获取K线数据 (优先尝试期货，失败则尝试现货)
+        end_time: 可选，只返回开盘时间不晚于该时间 (毫秒) 的 K 线，用于向前翻页加载历史
+        """
         if not self.client: return None
+        params = {'symbol': symbol, 'interval': interval, 'limit': limit}
+        if end_time is not None:
+            params['endTime'] = int(end_time)
         try:
             # 尝试获取期货K线
             try:
-                klines = self.client.futures_klines(symbol=symbol, interval=interval, limit=limit)
+                klines = self.client.futures_klines(**params)
             except:
                 # 失败则尝试现货K线
-                klines = self.client.get_klines(symbol=symbol, interval=interval, limit=limit)
+                klines = self.client.get_klines(**params)
                 
             df = pd.DataFrame(klines, columns=[
                 'timestamp', 'open', 'high', 'low', 'close', 'volume',
@@ -84,6 +90,18 @@ class BinanceDataClient:
             print(f"Error fetching symbols: {e}")
             return list(symbols)
 
+    def get_futures_symbols(self, quote="USDT"):
+        """获取所有交易中的永续合约 (默认 U 本位)"""
+        if not self.client: return []
+        try:
+            info = self.client.futures_exchange_info()
+            return sorted(s['symbol'] for s in info['symbols']
+                          if s['status'] == 'TRADING' and s.get('contractType') == 'PERPETUAL'
+                          and s.get('quoteAsset') == quote)
+        except Exception as e:
+            print(f"Error fetching futures symbols: {e}")
+            return []
+
     def get_symbol_info(self, symbol):
         """获取交易对的精度信息"""
         if not self.client: return None
@@ -14,7 +14,34 @@ def load_config():
         "DEFAULT_SYMBOLS": ["BTCUSDT", "ETHUSDT", "BNBUSDT", "SOLUSDT", "ADAUSDT"],
         "KLINE_INTERVAL": "1m",
         "KLINE_LIMIT": 900,
+        "CHART_HISTORY_LIMIT": 20000,
         "DEFAULT_TRADE_AMOUNT": 10.0,
+        "EXCHANGE_REQUESTS_PER_SECOND": 10.0,
+        "EXCHANGE_REQUEST_BURST": 10,
+        "AI_DECISION_CACHE_TTL": 120,
+        "AI_DECISION_PRICE_STEP": 0.001,
+        "AI_DECISION_VOL_STEP": 0.0025,
+        "AI_BATCH_DEADLINE": 40,
+        "AI_MEMORY_MAX_TOKENS": 2000,
+        "AI_SNAPSHOT_TOKEN_BUDGET": 400,
+        "AI_SNAPSHOT_FRAMES": [["1m", 30], ["5m", 24], ["1h", 12]],
+        "AI_TRIGGER_ATR_MULT": 1.5,
+        "AI_TRIGGER_COOLDOWN": 60,
+        "AI_ALERT_P95_MS": 30000,
+        "AI_ALERT_ERROR_RATE": 0.2,
+        "TASK_POOL_WORKERS": 4,
+        "SCANNER_WINDOW": 90,
+        "SCANNER_TOP_N": 10,
+        "SCANNER_INTERVAL": 5,
+        "SCANNER_MIN_QUOTE_VOLUME": 5000000,
+        "SCANNER_KLINE_STREAMS": True,
+        "SCANNER_STREAMS_PER_SOCKET": 200,
+        "PERF_OVERLAY": False,
+        "PERF_TRACE_EVENTS": 200000,
+        "LOG_MAX_LINES": 2000,
+        "LOG_DIR": "logs",
+        "LOG_FILE_MAX_BYTES": 5 * 1024 * 1024,
+        "LOG_BACKUP_COUNT": 5,
         "PROXY_URL": None
     }
     if os.path.exists(CONFIG_FILE):
@@ -49,7 +76,58 @@ DEEPSEEK_MODEL = _current_config.get("DEEPSEEK_MODEL")
 DEFAULT_SYMBOLS = _current_config.get("DEFAULT_SYMBOLS")
 KLINE_INTERVAL = _current_config.get("KLINE_INTERVAL")
 KLINE_LIMIT = _current_config.get("KLINE_LIMIT")
+# 图表在后台补充加载的历史 K 线根数 (0 表示不加载)
+CHART_HISTORY_LIMIT = _current_config.get("CHART_HISTORY_LIMIT", 20000)
 DEFAULT_TRADE_AMOUNT = _current_config.get("DEFAULT_TRADE_AMOUNT", 10.0)
+# 实盘交易所请求限流 (令牌桶): 按每一次签名 REST 调用计数，而不是按订单意图计数；
+# 一次实盘开仓约 4~6 次调用 (保证金模式、杠杆、市价单、成交查询、止盈、止损，已缓存的步骤不发请求)，账户/挂单同步同样计入
+EXCHANGE_REQUESTS_PER_SECOND = _current_config.get("EXCHANGE_REQUESTS_PER_SECOND", 10.0)
+EXCHANGE_REQUEST_BURST = _current_config.get("EXCHANGE_REQUEST_BURST", 10)
+
+# AI 决策缓存 (有效期秒数，价格/波动率档位宽度)
+AI_DECISION_CACHE_TTL = _current_config.get("AI_DECISION_CACHE_TTL", 120)
+AI_DECISION_PRICE_STEP = _current_config.get("AI_DECISION_PRICE_STEP", 0.001)
+AI_DECISION_VOL_STEP = _current_config.get("AI_DECISION_VOL_STEP", 0.0025)
+# 多币种批量决策请求的截止时间 (秒，包含缺失币种的补发)
+AI_BATCH_DEADLINE = _current_config.get("AI_BATCH_DEADLINE", 40)
+
+# AI 对话记忆的 token 预算 (超出部分在后台压缩为摘要)
+AI_MEMORY_MAX_TOKENS = _current_config.get("AI_MEMORY_MAX_TOKENS", 2000)
+
+# 发送给 AI 的行情快照 (多周期 K 线) 的 token 预算
+AI_SNAPSHOT_TOKEN_BUDGET = _current_config.get("AI_SNAPSHOT_TOKEN_BUDGET", 400)
+# 快照包含的周期和每个周期的 K 线根数，高周期由 1m K 线在本地合成，不需要额外请求
+AI_SNAPSHOT_FRAMES = [tuple(f) for f in _current_config.get("AI_SNAPSHOT_FRAMES", [["1m", 30], ["5m", 24], ["1h", 12]])]
+
+# AI 事件触发 (价格移动的 ATR 倍数，同一币种两次请求的最小间隔秒数)
+AI_TRIGGER_ATR_MULT = _current_config.get("AI_TRIGGER_ATR_MULT", 1.5)
+AI_TRIGGER_COOLDOWN = _current_config.get("AI_TRIGGER_COOLDOWN", 60)
+
+# AI 调用告警阈值 (最近 1 小时 p95 总耗时毫秒数，错误率)
+AI_ALERT_P95_MS = _current_config.get("AI_ALERT_P95_MS", 30000)
+AI_ALERT_ERROR_RATE = _current_config.get("AI_ALERT_ERROR_RATE", 0.2)
+
+# 界面后台任务 (K 线、账户、历史数据) 的常驻工作线程数
+TASK_POOL_WORKERS = _current_config.get("TASK_POOL_WORKERS", 4)
+
+# 全市场扫描: 每个合约保留的 1m K 线根数，显示/发送给 AI 的前 N 名，扫描间隔秒数，参与排名的最低 24h 成交额 (USDT)
+SCANNER_WINDOW = _current_config.get("SCANNER_WINDOW", 90)
+SCANNER_TOP_N = _current_config.get("SCANNER_TOP_N", 10)
+SCANNER_INTERVAL = _current_config.get("SCANNER_INTERVAL", 5)
+SCANNER_MIN_QUOTE_VOLUME = _current_config.get("SCANNER_MIN_QUOTE_VOLUME", 5000000)
+# 是否分批订阅全部合约的 K 线流 (否则只用 miniTicker 合成 K 线)，每个连接的最大流数量
+SCANNER_KLINE_STREAMS = _current_config.get("SCANNER_KLINE_STREAMS", True)
+SCANNER_STREAMS_PER_SOCKET = _current_config.get("SCANNER_STREAMS_PER_SOCKET", 200)
+
+# 界面性能浮层 (启动时是否显示，运行中按 F12 切换) 和 trace 环形缓冲区的事件数上限
+PERF_OVERLAY = _current_config.get("PERF_OVERLAY", False)
+PERF_TRACE_EVENTS = _current_config.get("PERF_TRACE_EVENTS", 200000)
+
+# 日志/对话面板最多显示的行数；完整历史写入 LOG_DIR 下按大小轮转的日志文件 (LOG_DIR 为空则不写文件)
+LOG_MAX_LINES = _current_config.get("LOG_MAX_LINES", 2000)
+LOG_DIR = _current_config.get("LOG_DIR", "logs")
+LOG_FILE_MAX_BYTES = _current_config.get("LOG_FILE_MAX_BYTES", 5 * 1024 * 1024)
+LOG_BACKUP_COUNT = _current_config.get("LOG_BACKUP_COUNT", 5)
 
 # Proxy Configuration
 PROXY_URL = _current_config.get("PROXY_URL")
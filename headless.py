@@ -0,0 +1,215 @@
+"""
+无界面交易守护进程: 在 asyncio 事件循环中运行与图形界面相同的 TradingCore，
+不依赖 Qt 和显示环境，适合在服务器上同时监控多个币种。
+
+行情由一个 WebSocket 组合流推送到共享缓存，每次推送唤醒事件循环，
+只处理有变化的币种 (止盈止损检查 → 触发器 → AI 决策 → 自动开仓)。
+
+用法:
+    python headless.py --symbols BTCUSDT ETHUSDT SOLUSDT
+    python headless.py --symbols BTCUSDT --auto-trade --amount 20 --leverage 5
+    python headless.py --symbols BTCUSDT ETHUSDT --scan
+"""
+import argparse
+import asyncio
+import signal
+import time
+import config
+from binance_client import BinanceDataClient
+from ai_client import CryptoAIAdvisor, AIScheduler
+from ai_triggers import TriggerEngine
+from market_data import MarketDataCache, MarketFeed
+from market_scanner import MarketScanner, UniverseFeed
+from trading_engine import SimulatedTradingEngine, BinanceTradingEngine, OrderExecutor
+from trading_core import TradingCore, parse_decision, build_signal
+
+
+def log(msg):
+    print(f"{time.strftime('%Y-%m-%d %H:%M:%S')} {msg}", flush=True)
+
+
+class TradingDaemon:
+    def __init__(self, symbols, auto_trade=False, real=False, amount=config.DEFAULT_TRADE_AMOUNT,
+                 leverage=1, margin_mode="全仓", aggressive=False, account_interval=10.0, scan=False):
+        self.symbols = list(dict.fromkeys(symbols))
+        self.auto_trade = auto_trade
+        self.amount = amount
+        self.leverage = leverage
+        self.margin_mode = margin_mode
+        self.aggressive = aggressive
+        self.account_interval = account_interval
+
+        self.binance = BinanceDataClient()
+        self.ai = CryptoAIAdvisor()
+        self.cache = MarketDataCache(capacity=config.KLINE_LIMIT)
+        # 可选的全市场扫描，排名前列的合约附加在 AI 决策请求中
+        self.scanner = MarketScanner() if scan else None
+        self.universe_feed = UniverseFeed(self.binance, self.scanner) if scan else None
+        self.feed = MarketFeed(self.binance, self.cache, on_update=self._wakeup,
+                               on_tickers=self.scanner.apply_tickers if scan else None)
+        self.order_executor = OrderExecutor()
+        triggers = TriggerEngine(atr_mult=config.AI_TRIGGER_ATR_MULT, cooldown=config.AI_TRIGGER_COOLDOWN)
+        self.core = TradingCore(AIScheduler(self.ai), self.cache, SimulatedTradingEngine(),
+                                BinanceTradingEngine(self.binance), self.order_executor, triggers, scanner=self.scanner)
+        self.core.set_real_mode(real)
+        self.loop = None
+        self._account_lock = asyncio.Lock() # 同一时间只有一个账户同步在执行 (交易完成和定时同步可能同时触发)
+        self._wake = None
+        self._stop = None
+
+    def _wakeup(self):
+        # 在 WebSocket 线程中调用，只设置事件，实际处理在事件循环中合并进行
+        if self.loop is not None:
+            self.loop.call_soon_threadsafe(self._wake.set)
+
+    def _call_soon(self, fn, *args):
+        """把工作线程中的回调切回事件循环"""
+        self.loop.call_soon_threadsafe(fn, *args)
+
+    def on_market_update(self, symbol):
+        """检查止盈止损并评估触发条件，触发时返回 (symbol, reasons, ind, df)，由调用方合并请求 AI"""
+        price = self.cache.price(symbol)
+        if price is None:
+            return None
+        for m in self.core.check_tp_sl({symbol: price}):
+            log(f"[{symbol}] {m}")
+        reasons, ind = self.core.evaluate(symbol)
+        if not reasons:
+            return None
+        log(f"[{symbol}] AI 触发: {'; '.join(reasons)}")
+        return symbol, reasons, ind, self.cache.frame(symbol)
+
+    def on_decision(self, symbol, res):
+        parts = parse_decision(res)
+        log(f"[{symbol}] AI 信号: {parts.get('ACTION', 'HOLD')} | 理由: {parts.get('REASON', '无')}")
+        trade_signal = build_signal(parts, self.aggressive, self.leverage, self.margin_mode)
+        if trade_signal is None or not self.auto_trade:
+            return
+        price = self.cache.price(symbol)
+        if price is None:
+            return
+        _, msg = self.core.auto_open(symbol, trade_signal, price, self.amount,
+                                     callback=lambda success, msg: self._call_soon(self.on_trade_finished, symbol, msg))
+        log(f"[{symbol}] {msg}")
+
+    def on_trade_finished(self, symbol, msg):
+        log(f"[{symbol}] {msg}")
+        self.loop.create_task(self.refresh_account())
+
+    async def refresh_account(self):
+        async with self._account_lock:
+            prices = {s: p for s, p in ((s, self.cache.price(s)) for s in self.symbols) if p is not None}
+            try:
+                data = await asyncio.to_thread(self.core.account_snapshot, prices)
+            except Exception as e:
+                log(f"账户同步失败: {e}")
+                return None
+            self.core.apply_account(data)
+            return data
+
+    async def account_loop(self):
+        while not self._stop.is_set():
+            data = await self.refresh_account()
+            if data is not None:
+                log(f"账户: 余额 {data['balance']:.2f} USDT | 权益 {data['equity']:.2f} USDT | "
+                    f"持仓 {len(data['positions'])} | AI 触发 {self.core.triggers.fired} 次")
+            try:
+                await asyncio.wait_for(self._stop.wait(), self.account_interval)
+            except asyncio.TimeoutError:
+                pass
+
+    async def scan_loop(self):
+        while not self._stop.is_set():
+            try:
+                await asyncio.wait_for(self._stop.wait(), config.SCANNER_INTERVAL)
+            except asyncio.TimeoutError:
+                pass
+            try:
+                result = await asyncio.to_thread(self.scanner.scan)
+            except Exception as e:
+                log(f"全市场扫描出错: {e}")
+                continue
+            if result and result['top']:
+                top = ", ".join(f"{t['symbol']} {t['momentum']:+.2f}%" for t in result['top'][:5])
+                log(f"全市场扫描 ({result['symbols']} 个合约, {result['elapsed_ms']:.1f} ms): {top}")
+
+    async def market_loop(self):
+        symbols = set(self.symbols)
+        while not self._stop.is_set():
+            await self._wake.wait()
+            self._wake.clear()
+            # 两次唤醒之间的所有推送合并处理，每个币种只处理一次
+            triggered = []
+            for symbol in self.cache.take_dirty() & symbols:
+                try:
+                    item = self.on_market_update(symbol)
+                except Exception as e:
+                    log(f"[{symbol}] 处理行情出错: {e}")
+                    continue
+                if item is not None:
+                    triggered.append(item)
+            # 同一轮触发的币种合并成一次 AI 请求
+            if triggered:
+                try:
+                    self.core.request_decisions(triggered, on_done=lambda s, res: self._call_soon(self.on_decision, s, res))
+                except Exception as e:
+                    log(f"请求 AI 决策出错: {e}")
+            # 推送持续到达时 _wake 一直处于置位状态，主动让出一次，避免饿死其他任务
+            await asyncio.sleep(0)
+
+    async def run(self):
+        self.loop = asyncio.get_running_loop()
+        self._wake = asyncio.Event()
+        self._stop = asyncio.Event()
+        for sig in (signal.SIGINT, signal.SIGTERM):
+            try:
+                self.loop.add_signal_handler(sig, self._stop.set)
+            except (NotImplementedError, RuntimeError):
+                pass # Windows 不支持，依赖 KeyboardInterrupt
+
+        if not self.binance.client:
+            log("系统错误: 无法连接到币安服务器。")
+            return
+        mode = "模拟" if self.core.is_simulated else "实盘"
+        log(f"守护进程启动: {', '.join(self.symbols)} | {mode}交易 | 自动开仓 {'开启' if self.auto_trade else '关闭'}")
+        self.feed.set_symbols(self.symbols)
+        tasks = [asyncio.create_task(self.market_loop()), asyncio.create_task(self.account_loop())]
+        if self.scanner is not None:
+            self.universe_feed.start()
+            tasks.append(asyncio.create_task(self.scan_loop()))
+        try:
+            await self._stop.wait()
+        finally:
+            for task in tasks:
+                task.cancel()
+            self.feed.stop()
+            if self.universe_feed is not None:
+                self.universe_feed.stop()
+            self.order_executor.shutdown(wait=False)
+            log("守护进程已停止")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="无界面 AI 交易守护进程")
+    parser.add_argument('--symbols', nargs='+', default=config.DEFAULT_SYMBOLS)
+    parser.add_argument('--auto-trade', action='store_true', help="按 AI 信号自动开仓")
+    parser.add_argument('--real', action='store_true', help="实盘交易 (默认模拟交易)")
+    parser.add_argument('--amount', type=float, default=config.DEFAULT_TRADE_AMOUNT, help="每次开仓金额 (USDT)")
+    parser.add_argument('--leverage', type=int, default=1)
+    parser.add_argument('--margin-mode', default="全仓", choices=["全仓", "逐仓"])
+    parser.add_argument('--aggressive', action='store_true', help="使用激进型止盈止损 (默认保守型)")
+    parser.add_argument('--account-interval', type=float, default=10.0, help="账户同步间隔秒数")
+    parser.add_argument('--scan', action='store_true', help="开启全市场扫描 (订阅全部合约的 K 线流)")
+    args = parser.parse_args()
+
+    daemon = TradingDaemon([s.upper() for s in args.symbols], auto_trade=args.auto_trade, real=args.real,
+                           amount=args.amount, leverage=args.leverage, margin_mode=args.margin_mode,
+                           aggressive=args.aggressive, account_interval=args.account_interval, scan=args.scan)
+    try:
+        asyncio.run(daemon.run())
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
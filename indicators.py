@@ -0,0 +1,381 @@
+import math
+import threading
+from collections import deque
+import numpy as np
+import pandas as pd
+
+NAN = float('nan')
+_DAY_MS = 86_400_000
+
+
+def to_ms(ts):
+    """pandas Timestamp / datetime64 / 整数毫秒 -> 整数毫秒"""
+    if hasattr(ts, 'value'):
+        return int(ts.value // 1_000_000)
+    if isinstance(ts, np.datetime64):
+        return int(ts.astype('datetime64[ms]').astype('int64'))
+    return int(ts)
+
+
+class _EMA:
+    """指数移动平均，value 为已收盘 K 线的结果，peek 计算包含当前 K 线的临时值"""
+
+    def __init__(self, period=None, alpha=None):
+        self.alpha = alpha if alpha is not None else 2.0 / (period + 1)
+        self.value = None
+
+    def peek(self, x):
+        if self.value is None:
+            return x
+        return self.value + self.alpha * (x - self.value)
+
+    def commit(self, x):
+        self.value = self.peek(x)
+
+
+class _Window:
+    """固定长度窗口，维护和与平方和，用于 SMA 和布林带"""
+
+    def __init__(self, size):
+        self.values = deque(maxlen=size)
+        self.total = 0.0
+        self.total_sq = 0.0
+
+    def push(self, x):
+        if len(self.values) == self.values.maxlen:
+            old = self.values[0]
+            self.total -= old
+            self.total_sq -= old * old
+        self.values.append(x)
+        self.total += x
+        self.total_sq += x * x
+
+    def reset(self, values):
+        self.values.clear()
+        self.values.extend(values)
+        self.total = float(sum(self.values))
+        self.total_sq = float(sum(v * v for v in self.values))
+
+
+class _RollingExtreme:
+    """单调队列维护滑动窗口最大值 (或最小值)，均摊 O(1)"""
+
+    def __init__(self, size, is_max):
+        self.size = size
+        self.is_max = is_max
+        self.items = deque() # (index, value)
+
+    def push(self, index, value):
+        items = self.items
+        if self.is_max:
+            while items and items[-1][1] <= value:
+                items.pop()
+        else:
+            while items and items[-1][1] >= value:
+                items.pop()
+        items.append((index, value))
+        while items[0][0] <= index - self.size:
+            items.popleft()
+
+    def peek(self, index, live_value):
+        # 窗口 = 最近 size-1 根已收盘 K 线 + 当前 K 线
+        best = live_value
+        for i, v in self.items:
+            if i > index - self.size:
+                best = max(best, v) if self.is_max else min(best, v)
+                break
+        return best
+
+
+class IndicatorState:
+    """
+    单个币种的流式指标状态:
+    已收盘 K 线的状态只在换线时提交一次，当前 K 线的更新只基于已提交状态重新计算，
+    因此无论是新 K 线还是当前 K 线价格变化，都是 O(1)
+    """
+
+    def __init__(self, sma_period=5, ema_period=20, rsi_period=14, macd_fast=12, macd_slow=26,
+                 macd_signal=9, atr_period=14, boll_period=20, boll_k=2.0, range_window=900, history=900,
+                 volume_period=20):
+        self._params = dict(sma_period=sma_period, ema_period=ema_period, rsi_period=rsi_period,
+                            macd_fast=macd_fast, macd_slow=macd_slow, macd_signal=macd_signal,
+                            atr_period=atr_period, boll_period=boll_period, boll_k=boll_k,
+                            range_window=range_window, history=history, volume_period=volume_period)
+        self.sma_period = sma_period
+        self.rsi_period = rsi_period
+        self.boll_period = boll_period
+        self.boll_k = boll_k
+        self.range_window = range_window
+        self.volume_period = volume_period
+
+        self.last_ts = None
+        self.index = -1 # 当前 K 线的序号
+        self.live = None # 当前 K 线 (o, h, l, c, v)
+        self.values = {}
+
+        self._sma = _Window(sma_period - 1)
+        self._boll = _Window(boll_period - 1)
+        self._volume = _Window(volume_period) # 只统计已收盘 K 线，便于和当前 K 线比较放量
+        self._ema = _EMA(ema_period)
+        self._macd_fast = _EMA(macd_fast)
+        self._macd_slow = _EMA(macd_slow)
+        self._macd_signal = _EMA(macd_signal)
+        self._rsi_gain = _EMA(alpha=1.0 / rsi_period)
+        self._rsi_loss = _EMA(alpha=1.0 / rsi_period)
+        self._atr = _EMA(alpha=1.0 / atr_period)
+        self._prev_close = None
+        self._vwap_day = None
+        self._vwap_pv = 0.0
+        self._vwap_vol = 0.0
+        self._high = _RollingExtreme(range_window, True)
+        self._low = _RollingExtreme(range_window, False)
+
+        # 供图表使用的指标序列 (与 K 线一一对应)
+        self.series = {'sma': deque(maxlen=history)}
+
+    # ---------- 流式更新 ----------
+
+    def update(self, ts, o, h, l, c, v):
+        """新 K 线或当前 K 线更新；早于当前 K 线的数据会被忽略"""
+        if self.last_ts is not None and ts < self.last_ts:
+            return self.values
+        if self.last_ts is None or ts > self.last_ts:
+            if self.live is not None:
+                self._commit(self.live)
+            self.index += 1
+            self.last_ts = ts
+            self.live = (o, h, l, c, v)
+            self._compute()
+            self.series['sma'].append(self.values['sma'])
+        else:
+            self.live = (o, h, l, c, v)
+            self._compute()
+            self.series['sma'][-1] = self.values['sma']
+        return self.values
+
+    def _commit(self, candle):
+        o, h, l, c, v = candle
+        self._sma.push(c)
+        self._boll.push(c)
+        self._volume.push(v)
+        self._ema.commit(c)
+        self._macd_fast.commit(c)
+        self._macd_slow.commit(c)
+        self._macd_signal.commit(self._macd_fast.value - self._macd_slow.value)
+        if self._prev_close is not None:
+            change = c - self._prev_close
+            self._rsi_gain.commit(max(change, 0.0))
+            self._rsi_loss.commit(max(-change, 0.0))
+        self._atr.commit(self._true_range(h, l))
+        self._prev_close = c
+        day = self.last_ts // _DAY_MS
+        if day != self._vwap_day:
+            self._vwap_day, self._vwap_pv, self._vwap_vol = day, 0.0, 0.0
+        self._vwap_pv += (h + l + c) / 3.0 * v
+        self._vwap_vol += v
+        self._high.push(self.index, h)
+        self._low.push(self.index, l)
+
+    def _true_range(self, h, l):
+        if self._prev_close is None:
+            return h - l
+        return max(h - l, abs(h - self._prev_close), abs(l - self._prev_close))
+
+    def _compute(self):
+        o, h, l, c, v = self.live
+        values = {'close': c}
+
+        n = self.sma_period
+        values['sma'] = (self._sma.total + c) / n if len(self._sma.values) == n - 1 else NAN
+
+        n = self.boll_period
+        if len(self._boll.values) == n - 1:
+            mean = (self._boll.total + c) / n
+            var = max((self._boll.total_sq + c * c) / n - mean * mean, 0.0)
+            std = math.sqrt(var * n / (n - 1)) # 与 pandas rolling std 一致 (样本标准差)
+            values['boll_mid'] = mean
+            values['boll_upper'] = mean + self.boll_k * std
+            values['boll_lower'] = mean - self.boll_k * std
+        else:
+            values['boll_mid'] = values['boll_upper'] = values['boll_lower'] = NAN
+
+        values['ema'] = self._ema.peek(c)
+        macd = self._macd_fast.peek(c) - self._macd_slow.peek(c)
+        signal = self._macd_signal.peek(macd)
+        values['macd'], values['macd_signal'], values['macd_hist'] = macd, signal, macd - signal
+
+        if self._prev_close is not None:
+            change = c - self._prev_close
+            gain = self._rsi_gain.peek(max(change, 0.0))
+            loss = self._rsi_loss.peek(max(-change, 0.0))
+            values['rsi'] = 100.0 if loss == 0 else 100.0 - 100.0 / (1.0 + gain / loss)
+        else:
+            values['rsi'] = NAN
+
+        values['atr'] = self._atr.peek(self._true_range(h, l))
+
+        n = self.volume_period
+        values['volume'] = v
+        values['volume_ma'] = self._volume.total / n if len(self._volume.values) == n else NAN
+
+        pv, vol = self._vwap_pv, self._vwap_vol
+        if self.last_ts // _DAY_MS != self._vwap_day:
+            pv, vol = 0.0, 0.0
+        pv += (h + l + c) / 3.0 * v
+        vol += v
+        values['vwap'] = pv / vol if vol else c
+
+        values['range_high'] = self._high.peek(self.index, h)
+        values['range_low'] = self._low.peek(self.index, l)
+        self.values = values
+
+    # ---------- 批量预热 (向量化) ----------
+
+    def warmup(self, ts, o, h, l, c, v):
+        """
+        用历史 K 线批量初始化，输入为等长 NumPy 数组 (ts 为毫秒)
+        最后一根视为当前未收盘 K 线，其余为已收盘 K 线
+        """
+        count = len(c)
+        self.__init__(**self._params) # 丢弃旧状态
+        if count == 0:
+            return self.values
+
+        closes = pd.Series(c)
+        ema = closes.ewm(alpha=self._ema.alpha, adjust=False).mean().to_numpy()
+        fast = closes.ewm(alpha=self._macd_fast.alpha, adjust=False).mean().to_numpy()
+        slow = closes.ewm(alpha=self._macd_slow.alpha, adjust=False).mean().to_numpy()
+        macd = fast - slow
+        signal = pd.Series(macd).ewm(alpha=self._macd_signal.alpha, adjust=False).mean().to_numpy()
+        prev_close = np.concatenate(([c[0]], c[:-1]))
+        tr = np.maximum.reduce([h - l, np.abs(h - prev_close), np.abs(l - prev_close)])
+        tr[0] = h[0] - l[0]
+        atr = pd.Series(tr).ewm(alpha=self._atr.alpha, adjust=False).mean().to_numpy()
+        change = np.diff(c)
+        gain = pd.Series(np.maximum(change, 0.0)).ewm(alpha=self._rsi_gain.alpha, adjust=False).mean().to_numpy()
+        loss = pd.Series(np.maximum(-change, 0.0)).ewm(alpha=self._rsi_loss.alpha, adjust=False).mean().to_numpy()
+
+        # 提交到倒数第二根 (最后一根已收盘) K 线
+        last = count - 2
+        if last >= 0:
+            self._ema.value = float(ema[last])
+            self._macd_fast.value = float(fast[last])
+            self._macd_slow.value = float(slow[last])
+            self._macd_signal.value = float(signal[last])
+            self._atr.value = float(atr[last])
+            if last >= 1:
+                self._rsi_gain.value = float(gain[last - 1])
+                self._rsi_loss.value = float(loss[last - 1])
+            self._prev_close = float(c[last])
+            self._sma.reset(c[max(0, last - self.sma_period + 2):last + 1].tolist())
+            self._boll.reset(c[max(0, last - self.boll_period + 2):last + 1].tolist())
+            self._volume.reset(v[max(0, last - self.volume_period + 1):last + 1].tolist())
+
+            day = ts[last] // _DAY_MS
+            same_day = ts[:last + 1] // _DAY_MS == day
+            typical = (h[:last + 1] + l[:last + 1] + c[:last + 1]) / 3.0
+            self._vwap_day = int(day)
+            self._vwap_pv = float(np.sum(typical[same_day] * v[:last + 1][same_day]))
+            self._vwap_vol = float(np.sum(v[:last + 1][same_day]))
+
+            start = max(0, last - self.range_window + 2)
+            for i in range(start, last + 1):
+                self._high.push(i, float(h[i]))
+                self._low.push(i, float(l[i]))
+
+        self.index = count - 1
+        self.last_ts = int(ts[-1])
+        self.live = (float(o[-1]), float(h[-1]), float(l[-1]), float(c[-1]), float(v[-1]))
+        self._compute()
+
+        # 图表序列: 向量化的滚动均值
+        sma = closes.rolling(self.sma_period).mean().to_numpy()
+        self.series['sma'].clear()
+        self.series['sma'].extend(sma[-self.series['sma'].maxlen:].tolist())
+        self.series['sma'][-1] = self.values['sma']
+        return self.values
+
+
+class IndicatorEngine:
+    """按币种管理指标状态，供图表和 AI 提示词共同读取"""
+
+    def __init__(self, **params):
+        self.params = params
+        self._states = {}
+        self._lock = threading.Lock()
+
+    def _state(self, symbol):
+        state = self._states.get(symbol)
+        if state is None:
+            state = self._states[symbol] = IndicatorState(**self.params)
+        return state
+
+    def update(self, symbol, ts, o, h, l, c, v):
+        """单根 K 线的增量更新 (例如 WebSocket 推送)"""
+        with self._lock:
+            return dict(self._state(symbol).update(ts, o, h, l, c, v))
+
+    def warmup(self, symbol, ts, o, h, l, c, v):
+        with self._lock:
+            return dict(self._state(symbol).warmup(ts, o, h, l, c, v))
+
+    def update_from_frame(self, symbol, df):
+        """
+        用 REST 返回的 K 线 DataFrame 更新指标:
+        已有状态时只处理末尾的新增/更新 K 线，否则 (首次或数据断档) 批量预热
+        """
+        if df is None or len(df) == 0:
+            return {}
+        with self._lock:
+            state = self._states.get(symbol)
+            if state is not None and state.last_ts is not None and to_ms(df['timestamp'].iat[0]) <= state.last_ts:
+                # 从末尾向前找到所有不早于当前 K 线的行
+                start = len(df) - 1
+                while start > 0 and to_ms(df['timestamp'].iat[start - 1]) >= state.last_ts:
+                    start -= 1
+                cols = [df[name].iat for name in ('timestamp', 'open', 'high', 'low', 'close', 'volume')]
+                for i in range(start, len(df)):
+                    state.update(to_ms(cols[0][i]), float(cols[1][i]), float(cols[2][i]),
+                                 float(cols[3][i]), float(cols[4][i]), float(cols[5][i]))
+                return dict(state.values)
+
+            ts = df['timestamp'].to_numpy()
+            if np.issubdtype(ts.dtype, np.datetime64):
+                ts = ts.astype('datetime64[ms]').astype('int64')
+            state = self._state(symbol)
+            return dict(state.warmup(
+                ts.astype('int64'),
+                *(df[name].to_numpy(dtype=float) for name in ('open', 'high', 'low', 'close', 'volume'))
+            ))
+
+    def snapshot(self, symbol):
+        """当前指标值 {'close', 'sma', 'ema', 'rsi', 'macd', ..., 'range_high', 'range_low'}"""
+        with self._lock:
+            state = self._states.get(symbol)
+            return dict(state.values) if state else {}
+
+    def series(self, symbol, name='sma'):
+        with self._lock:
+            state = self._states.get(symbol)
+            return np.fromiter(state.series[name], dtype=float) if state else np.array([])
+
+    def reset(self, symbol=None):
+        with self._lock:
+            if symbol is None:
+                self._states.clear()
+            else:
+                self._states.pop(symbol, None)
+
+
+def format_indicators(values):
+    """把指标快照格式化为提示词中的一行文本"""
+    if not values:
+        return ""
+
+    def f(key):
+        val = values.get(key, NAN)
+        return "NA" if val != val else f"{val:.6g}"
+
+    return (f"MA5: {f('sma')}, EMA20: {f('ema')}, RSI14: {f('rsi')}, "
+            f"MACD: {f('macd')}/{f('macd_signal')}/{f('macd_hist')}, ATR14: {f('atr')}, "
+            f"布林带: {f('boll_lower')}~{f('boll_upper')}, VWAP: {f('vwap')}")
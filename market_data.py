@@ -0,0 +1,314 @@
+import threading
+import numpy as np
+import pandas as pd
+import config
+from indicators import IndicatorEngine
+from timeframes import aggregate, interval_ms
+
+
+class KlineBuffer:
+    """固定容量的 K 线缓冲区 (预分配两倍容量，写满时整体前移一次)，追加和更新最后一根均为 O(1)"""
+    FIELDS = ('ts', 'open', 'high', 'low', 'close', 'volume')
+
+    def __init__(self, capacity):
+        self.capacity = capacity
+        self._data = np.zeros((len(self.FIELDS), capacity * 2))
+        self._start = 0
+        self._end = 0
+
+    def __len__(self):
+        return self._end - self._start
+
+    @property
+    def last_ts(self):
+        return int(self._data[0, self._end - 1]) if self._end > self._start else None
+
+    def load(self, columns):
+        """用一整段 K 线替换缓冲区内容 (只保留最后 capacity 根)"""
+        count = min(len(columns[0]), self.capacity)
+        for row, col in enumerate(columns):
+            self._data[row, :count] = col[len(col) - count:]
+        self._start, self._end = 0, count
+
+    def update(self, ts, o, h, l, c, v):
+        """推送一根 K 线: 与最后一根开盘时间相同则更新，更晚则追加，更早则忽略"""
+        last = self.last_ts
+        if last is not None and ts < last:
+            return
+        if last is None or ts > last:
+            if self._end == self._data.shape[1]:
+                keep = self.capacity - 1
+                self._data[:, :keep] = self._data[:, self._end - keep:self._end]
+                self._start, self._end = 0, keep
+            self._end += 1
+            if self._end - self._start > self.capacity:
+                self._start += 1
+        self._data[:, self._end - 1] = (ts, o, h, l, c, v)
+
+    def arrays(self):
+        """返回 (ts, open, high, low, close, volume) 的副本"""
+        return tuple(self._data[:, self._start:self._end].copy())
+
+
+class TimeframeAggregator:
+    """
+    由基础周期 (如 1m) K 线合成更高周期的 K 线:
+    - load(): 向量化批量聚合一段基础 K 线 (REST 历史)，早于这段数据的已有高周期 K 线保留
+    - update(): 每次基础 K 线推送 O(1) 更新当前高周期 K 线，跨过周期边界时开始新的一根
+    高周期 K 线单独保存 capacity 根，长时间运行后可覆盖远超基础缓冲区的时间范围
+    """
+
+    def __init__(self, period_ms, capacity):
+        self.period = period_ms
+        self.bars = KlineBuffer(capacity)
+        self._closed = None  # 当前周期内已收盘的基础 K 线合并结果 (open, high, low, volume)
+        self._last = None    # 最后一根 (可能未收盘的) 基础 K 线 (ts, open, high, low, close, volume)
+
+    def load(self, ts, o, h, l, c, v):
+        if len(ts) == 0:
+            return
+        agg = aggregate(ts, self.period, o, h, l, c, v)
+        first = agg[0][0]
+        partial = None # 这段数据的第一根高周期 K 线不完整时，已有的同一根 K 线 (ts, o, h, l, c, v)
+        if len(self.bars):
+            old = self.bars.arrays()
+            keep = old[0] <= first if ts[0] != first else old[0] < first
+            if keep.any() and old[0][keep][-1] == first:
+                partial = tuple(a[keep][-1] for a in old)
+                agg = tuple(a[1:] for a in agg)
+            agg = tuple(np.concatenate((a[keep], b)) for a, b in zip(old, agg))
+        self.bars.load(agg)
+
+        # 重建当前周期的增量状态
+        n = len(ts) - 1
+        bucket = (ts[n] // self.period) * self.period
+        start = int(np.searchsorted(ts, bucket))
+        closed = (o[start], h[start:n].max(), l[start:n].min(), v[start:n].sum()) if start < n else None
+        if partial is not None and partial[0] == bucket:
+            # 这段数据只覆盖当前周期的后一部分: 开盘价和高低点沿用已有的 K 线 (成交量只统计这段数据)
+            closed = (partial[1], max(partial[2], closed[1]), min(partial[3], closed[2]), closed[3]) \
+                if closed is not None else (partial[1], partial[2], partial[3], 0.0)
+        self._closed = closed
+        self._last = (ts[n], o[n], h[n], l[n], c[n], v[n])
+        if partial is not None and partial[0] == bucket:
+            self.update(*self._last)
+
+    def update(self, ts, o, h, l, c, v):
+        last = self._last
+        if last is not None:
+            if ts < last[0]:
+                return
+            if ts > last[0]:
+                # 上一根基础 K 线已收盘: 同一周期内并入已收盘部分，跨周期时重新开始
+                if last[0] // self.period == ts // self.period:
+                    closed = self._closed
+                    self._closed = (last[1], last[2], last[3], last[5]) if closed is None else \
+                        (closed[0], max(closed[1], last[2]), min(closed[2], last[3]), closed[3] + last[5])
+                else:
+                    self._closed = None
+        self._last = (ts, o, h, l, c, v)
+        closed = self._closed
+        if closed is not None:
+            o, h, l, v = closed[0], max(closed[1], h), min(closed[2], l), closed[3] + v
+        self.bars.update((ts // self.period) * self.period, o, h, l, c, v)
+
+
+class MarketDataCache:
+    """
+    多币种共享的行情缓存: K 线、24 小时行情和指标
+    由 REST 结果或 WebSocket 推送写入 (任意线程)，界面定时取出有变化的币种批量刷新
+    更高周期的 K 线由基础周期 (interval) 在本地合成，首次读取某个周期时创建，之后随推送增量更新
+    """
+
+    def __init__(self, capacity=config.KLINE_LIMIT, interval=config.KLINE_INTERVAL):
+        self.capacity = capacity
+        self.interval = interval
+        self.indicators = IndicatorEngine(history=capacity, range_window=capacity)
+        self._klines = {}  # symbol -> KlineBuffer
+        self._timeframes = {} # symbol -> {周期: TimeframeAggregator}
+        self._tickers = {} # symbol -> {'price', 'open', 'change_pct', 'quote_volume'}
+        self._dirty = set()
+        self._lock = threading.Lock()
+
+    def _buffer(self, symbol):
+        buffer = self._klines.get(symbol)
+        if buffer is None:
+            buffer = self._klines[symbol] = KlineBuffer(self.capacity)
+        return buffer
+
+    def has_klines(self, symbol):
+        with self._lock:
+            return len(self._klines.get(symbol, ())) > 0
+
+    def load_frame(self, symbol, df):
+        """写入 REST 返回的 K 线 DataFrame，返回最新指标"""
+        if df is None or len(df) == 0:
+            return {}
+        ts = df['timestamp'].to_numpy()
+        if np.issubdtype(ts.dtype, np.datetime64):
+            ts = ts.astype('datetime64[ms]').astype('int64')
+        columns = [ts] + [df[name].to_numpy(dtype=float) for name in KlineBuffer.FIELDS[1:]]
+        values = self.indicators.update_from_frame(symbol, df)
+        with self._lock:
+            self._buffer(symbol).load(columns)
+            for aggregator in self._timeframes.get(symbol, {}).values():
+                aggregator.load(*columns)
+            self._dirty.add(symbol)
+        return values
+
+    def apply_kline(self, symbol, ts, o, h, l, c, v):
+        """写入一根推送的 K 线 (未收盘的 K 线会被后续推送覆盖)"""
+        self.indicators.update(symbol, ts, o, h, l, c, v)
+        with self._lock:
+            self._buffer(symbol).update(ts, o, h, l, c, v)
+            for aggregator in self._timeframes.get(symbol, {}).values():
+                aggregator.update(ts, o, h, l, c, v)
+            ticker = self._tickers.get(symbol)
+            if ticker is not None:
+                ticker['price'] = c
+            self._dirty.add(symbol)
+
+    def apply_ticker(self, symbol, price, open_price, quote_volume=0.0):
+        with self._lock:
+            self._tickers[symbol] = {
+                'price': price,
+                'open': open_price,
+                'change_pct': (price - open_price) / open_price * 100 if open_price else 0.0,
+                'quote_volume': quote_volume,
+            }
+            if symbol in self._klines:
+                self._dirty.add(symbol)
+
+    def klines(self, symbol, interval=None):
+        """
+        (ts, open, high, low, close, volume) 数组副本；没有数据时返回 None
+        interval 为更高周期 (如 '15m'、'4h') 时返回本地合成的 K 线，不需要额外的网络请求
+        """
+        with self._lock:
+            buffer = self._klines.get(symbol)
+            if buffer is None or not len(buffer):
+                return None
+            if interval is None or interval == self.interval:
+                return buffer.arrays()
+            aggregators = self._timeframes.setdefault(symbol, {})
+            aggregator = aggregators.get(interval)
+            if aggregator is None:
+                aggregator = self._timeframe(interval)
+                aggregator.load(*buffer.arrays())
+                aggregators[interval] = aggregator
+            return aggregator.bars.arrays()
+
+    def _timeframe(self, interval):
+        period, base = interval_ms(interval), interval_ms(self.interval)
+        if period < base or period % base:
+            raise ValueError(f"无法由 {self.interval} K 线合成 {interval} K 线")
+        return TimeframeAggregator(period, self.capacity)
+
+    def frame(self, symbol, interval=None):
+        """缓存中的 K 线转换为与 BinanceDataClient.get_klines 相同列名的 DataFrame；没有数据时返回 None"""
+        arrays = self.klines(symbol, interval)
+        if arrays is None:
+            return None
+        df = pd.DataFrame(dict(zip(KlineBuffer.FIELDS, arrays)))
+        df['timestamp'] = pd.to_datetime(df.pop('ts').astype('int64'), unit='ms')
+        df.attrs['symbol'] = symbol
+        return df[['timestamp', 'open', 'high', 'low', 'close', 'volume']]
+
+    def price(self, symbol):
+        """最新价格: 优先取推送的行情，其次取最后一根 K 线的收盘价；都没有时返回 None"""
+        with self._lock:
+            ticker = self._tickers.get(symbol)
+            if ticker is not None:
+                return ticker['price']
+            buffer = self._klines.get(symbol)
+            return float(buffer._data[4, buffer._end - 1]) if buffer is not None and len(buffer) else None
+
+    def ticker(self, symbol):
+        with self._lock:
+            ticker = self._tickers.get(symbol)
+            return dict(ticker) if ticker else None
+
+    def take_dirty(self):
+        """取出并清空自上次调用以来有变化的币种集合"""
+        with self._lock:
+            dirty, self._dirty = self._dirty, set()
+            return dirty
+
+
+class MarketFeed:
+    """
+    单一 WebSocket 行情源: 一个合约组合流同时订阅全市场 !miniTicker@arr 和各币种的 K 线流，
+    推送数据写入 MarketDataCache。新增的币种先用一次 REST 请求补齐历史 K 线，之后只依赖推送
+    on_update(): 每次写入缓存后在 WebSocket/加载线程中调用 (用于唤醒其他事件循环)
+    on_tickers(tickers): 收到全市场 miniTicker 推送时以原始字典列表调用 (如转发给 MarketScanner)
+    """
+
+    def __init__(self, binance_client, cache, interval=config.KLINE_INTERVAL, on_update=None, on_tickers=None):
+        self.binance = binance_client
+        self.cache = cache
+        self.interval = interval
+        self.on_update = on_update
+        self.on_tickers = on_tickers
+        self.symbols = []
+        self._twm = None
+        self._socket = None
+        self._lock = threading.Lock()
+
+    def set_symbols(self, symbols):
+        """设置需要 K 线推送的币种，变化时重新订阅"""
+        symbols = list(dict.fromkeys(symbols))
+        with self._lock:
+            if symbols == self.symbols:
+                return
+            self.symbols = symbols
+        threading.Thread(target=self._resubscribe, args=(symbols,), daemon=True).start()
+
+    def _resubscribe(self, symbols):
+        for symbol in symbols:
+            if not self.cache.has_klines(symbol):
+                df = self.binance.get_klines(symbol, interval=self.interval)
+                if df is not None:
+                    self.cache.load_frame(symbol, df)
+                    if self.on_update:
+                        self.on_update()
+        with self._lock:
+            if symbols != self.symbols:
+                return # 期间又被修改，由最新一次调用负责订阅
+            try:
+                if self._twm is None:
+                    from binance import ThreadedWebsocketManager
+                    self._twm = ThreadedWebsocketManager(https_proxy=config.PROXY_URL)
+                    self._twm.start()
+                if self._socket is not None:
+                    self._twm.stop_socket(self._socket)
+                streams = ['!miniTicker@arr'] + [f"{s.lower()}@kline_{self.interval}" for s in symbols]
+                self._socket = self._twm.start_futures_multiplex_socket(callback=self._on_message, streams=streams)
+            except Exception as e:
+                print(f"Market feed error: {e}")
+
+    def _on_message(self, msg):
+        try:
+            data = msg.get('data', msg) if isinstance(msg, dict) else msg
+            if isinstance(data, list):
+                for t in data:
+                    self.cache.apply_ticker(t['s'], float(t['c']), float(t['o']), float(t.get('q', 0.0)))
+                if self.on_tickers:
+                    self.on_tickers(data)
+            elif data.get('e') == 'kline':
+                k = data['k']
+                self.cache.apply_kline(data['s'], int(k['t']), float(k['o']), float(k['h']),
+                                       float(k['l']), float(k['c']), float(k['v']))
+            elif data.get('e') == 'error':
+                print(f"Market feed error: {data.get('m')}")
+                return
+            if self.on_update:
+                self.on_update()
+        except Exception as e:
+            print(f"Market feed message error: {e}")
+
+    def stop(self):
+        with self._lock:
+            if self._twm is not None:
+                self._twm.stop()
+                self._twm = None
+                self._socket = None
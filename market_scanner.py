@@ -0,0 +1,288 @@
+import threading
+import time
+import warnings
+import numpy as np
+import config
+
+
+class MarketScanner:
+    """
+    全市场扫描: 为所有合约维护最近 window 分钟的 1m OHLCV，定期向量化计算排名指标
+    - 数据来源: 全市场 !miniTicker@arr (每秒推送，价格采样合成 1m K 线，成交量取 24h 成交量的增量)
+      以及分批订阅的 K 线流 (有 K 线推送的币种以 K 线为准)
+    - 所有币种的 K 线存放在按分钟对齐的二维环形数组中 (行: 币种，列: 分钟 % window)，
+      扫描时一次性复制并计算，耗时与币种数量近似线性，几百个合约只需几毫秒
+    scan() 可在任意线程中调用
+    """
+    BAR_MS = 60_000
+    FIELDS = ('open', 'high', 'low', 'close', 'volume')
+
+    def __init__(self, window=config.SCANNER_WINDOW, momentum_bars=15, short_bars=15, long_bars=60,
+                 recent_bars=5, min_bars=20, min_quote_volume=config.SCANNER_MIN_QUOTE_VOLUME):
+        self.window = window
+        self.momentum_bars = momentum_bars  # 动量: 最近 N 分钟涨跌幅
+        self.short_bars = short_bars        # 波动扩张: 短窗口/长窗口的 1m 收益率标准差之比
+        self.long_bars = long_bars
+        self.recent_bars = recent_bars      # 成交量 z 值: 最近 N 分钟均量相对之前长窗口的偏离
+        self.min_bars = min_bars            # 有效 K 线少于该数量的币种不参与排名
+        self.min_quote_volume = min_quote_volume # 24h 成交额 (USDT) 低于该值的币种不参与排名
+        self.universe = None                # 可选: 限定参与排名的币种集合
+        self.last_scan = None               # 最近一次 scan() 的结果
+        self._index = {}                    # symbol -> 行号
+        self._symbols = []
+        self._bars = np.full((len(self.FIELDS), 64, window), np.nan)
+        self._kline_fed = np.zeros(64, dtype=bool)   # 该币种是否有 K 线推送
+        self._volume_24h = np.full(64, np.nan)       # 上一次推送的 24h 成交量 (计算增量用)
+        self._quote_volume = np.zeros(64)
+        self._change_pct = np.zeros(64)
+        self._head = None                   # 环形数组中最新的分钟
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._symbols)
+
+    def set_universe(self, symbols):
+        with self._lock:
+            self.universe = set(symbols) if symbols else None
+
+    def _row(self, symbol):
+        row = self._index.get(symbol)
+        if row is None:
+            row = self._index[symbol] = len(self._symbols)
+            self._symbols.append(symbol)
+            if row == self._bars.shape[1]:
+                grow = row
+                self._bars = np.concatenate((self._bars, np.full((len(self.FIELDS), grow, self.window), np.nan)), axis=1)
+                self._kline_fed = np.concatenate((self._kline_fed, np.zeros(grow, dtype=bool)))
+                self._volume_24h = np.concatenate((self._volume_24h, np.full(grow, np.nan)))
+                self._quote_volume = np.concatenate((self._quote_volume, np.zeros(grow)))
+                self._change_pct = np.concatenate((self._change_pct, np.zeros(grow)))
+        return row
+
+    def _column(self, minute):
+        """返回该分钟在环形数组中的列；早于窗口的返回 None，更晚的分钟推进窗口并清空过期的列"""
+        if self._head is None:
+            self._head = minute
+        elif minute > self._head:
+            for m in range(max(self._head + 1, minute - self.window + 1), minute + 1):
+                self._bars[:, :, m % self.window] = np.nan
+            self._head = minute
+        elif minute <= self._head - self.window:
+            return None
+        return minute % self.window
+
+    def apply_tickers(self, tickers, now_ms=None):
+        """写入一批 miniTicker 推送 (原始字典列表: s 币种, c 最新价, o 24h 开盘价, v 24h 成交量, q 24h 成交额, E 事件时间)"""
+        with self._lock:
+            for t in tickers:
+                try:
+                    row = self._row(t['s'])
+                    price, open_price = float(t['c']), float(t['o'])
+                    volume = float(t.get('v', 0.0))
+                    ts = int(t.get('E') or now_ms or time.time() * 1000)
+                except (KeyError, TypeError, ValueError):
+                    continue
+                self._quote_volume[row] = float(t.get('q', 0.0))
+                self._change_pct[row] = (price - open_price) / open_price * 100 if open_price else 0.0
+                prev_volume, self._volume_24h[row] = self._volume_24h[row], volume
+                if self._kline_fed[row]:
+                    continue
+                col = self._column(ts // self.BAR_MS)
+                if col is None:
+                    continue
+                bars = self._bars[:, row]
+                if np.isnan(bars[3, col]):
+                    bars[:, col] = (price, price, price, price, 0.0)
+                else:
+                    bars[1, col] = max(bars[1, col], price)
+                    bars[2, col] = min(bars[2, col], price)
+                    bars[3, col] = price
+                # 24h 滚动成交量的增量近似为本次新增的成交量 (滚出窗口的部分可能使其为负，按 0 计)
+                if not np.isnan(prev_volume) and volume > prev_volume:
+                    bars[4, col] += volume - prev_volume
+
+    def apply_kline(self, symbol, ts, o, h, l, c, v):
+        """写入一根 1m K 线 (推送或 REST 历史)；之后该币种的当前 K 线不再由 miniTicker 合成"""
+        with self._lock:
+            row = self._row(symbol)
+            self._kline_fed[row] = True
+            col = self._column(int(ts) // self.BAR_MS)
+            if col is not None:
+                self._bars[:, row, col] = (o, h, l, c, v)
+
+    def load_klines(self, symbol, df):
+        """用 REST 返回的 1m K 线补齐历史 (与 BinanceDataClient.get_klines 的列名相同)"""
+        if df is None or len(df) == 0:
+            return
+        ts = df['timestamp'].to_numpy()
+        if np.issubdtype(ts.dtype, np.datetime64):
+            ts = ts.astype('datetime64[ms]').astype('int64')
+        cols = [df[name].to_numpy(dtype=float) for name in self.FIELDS]
+        with self._lock:
+            row = self._row(symbol)
+            for i, minute in enumerate(ts // self.BAR_MS):
+                col = self._column(int(minute))
+                if col is not None:
+                    self._bars[:, row, col] = [a[i] for a in cols]
+
+    def _snapshot(self):
+        """复制当前状态 (K 线按时间从旧到新排列)"""
+        with self._lock:
+            n = len(self._symbols)
+            if n == 0 or self._head is None:
+                return None
+            order = np.arange(self._head - self.window + 1, self._head + 1) % self.window
+            universe = self.universe
+            eligible = np.array([universe is None or s in universe for s in self._symbols])
+            return (list(self._symbols), self._bars[:, :n][:, :, order], self._quote_volume[:n].copy(),
+                    self._change_pct[:n].copy(), eligible)
+
+    @staticmethod
+    def _robust_z(x):
+        """按横截面中位数和 MAD 标准化，截断到 ±5"""
+        med = np.nanmedian(x)
+        mad = np.nanmedian(np.abs(x - med)) * 1.4826
+        return np.clip((x - med) / (mad if mad > 0 else 1.0), -5, 5)
+
+    def compute(self, bars):
+        """
+        bars: (5, 币种数, 分钟数) 的 OHLCV 数组 (按时间从旧到新，缺失为 NaN)
+        返回 {'close', 'momentum', 'vol_expansion', 'volume_z', 'score', 'bars'}，每项为按币种的数组
+        """
+        c, v = bars[3], bars[4]
+        n, w = c.shape
+        valid = ~np.isnan(c)
+        # 缺失的分钟沿用上一根收盘价 (向量化前向填充)
+        idx = np.where(valid, np.arange(w), 0)
+        np.maximum.accumulate(idx, axis=1, out=idx)
+        close = c[np.arange(n)[:, None], idx]
+        close[~np.maximum.accumulate(valid, axis=1)] = np.nan
+
+        with warnings.catch_warnings():
+            warnings.simplefilter("ignore", RuntimeWarning)
+            momentum = close[:, -1] / close[:, -1 - min(self.momentum_bars, w - 1)] - 1
+            returns = np.diff(np.log(close), axis=1)
+            expansion = np.nanstd(returns[:, -self.short_bars:], axis=1) / np.nanstd(returns[:, -self.long_bars:], axis=1)
+            volume = np.where(valid, v, np.nan)
+            base = volume[:, -self.long_bars - self.recent_bars:-self.recent_bars]
+            volume_z = (np.nanmean(volume[:, -self.recent_bars:], axis=1) - np.nanmean(base, axis=1)) / np.nanstd(base, axis=1)
+            counts = valid[:, -self.long_bars:].sum(axis=1)
+            # 综合得分: 动量绝对值 (多空都关注)、波动扩张、放量各自横截面标准化后相加
+            ok = counts >= self.min_bars
+            metrics = [np.where(ok & np.isfinite(m), m, np.nan) for m in (np.abs(momentum), expansion, volume_z)]
+            score = np.nansum([self._robust_z(m) for m in metrics], axis=0)
+        score[~ok | np.all([np.isnan(m) for m in metrics], axis=0)] = np.nan
+        return {'close': close[:, -1], 'momentum': momentum, 'vol_expansion': expansion, 'volume_z': volume_z,
+                'score': score, 'bars': counts}
+
+    def scan(self, top_n=config.SCANNER_TOP_N):
+        """
+        计算全市场排名，返回 {'time', 'symbols' (参与排名的币种数), 'top': [...], 'ranks': {symbol: 名次}, 'elapsed_ms'}
+        top 中每项为 {'symbol', 'score', 'momentum' (%), 'vol_expansion', 'volume_z', 'price', 'change_pct', 'quote_volume'}
+        """
+        start = time.perf_counter()
+        snapshot = self._snapshot()
+        if snapshot is None:
+            return None
+        symbols, bars, quote_volume, change_pct, eligible = snapshot
+        m = self.compute(bars)
+        score = np.where(eligible & (quote_volume >= self.min_quote_volume), m['score'], np.nan)
+        ranked = np.flatnonzero(~np.isnan(score))
+        ranked = ranked[np.argsort(-score[ranked], kind='stable')]
+        top = [{
+            'symbol': symbols[i],
+            'score': float(score[i]),
+            'momentum': float(m['momentum'][i] * 100),
+            'vol_expansion': float(m['vol_expansion'][i]),
+            'volume_z': float(m['volume_z'][i]),
+            'price': float(m['close'][i]),
+            'change_pct': float(change_pct[i]),
+            'quote_volume': float(quote_volume[i]),
+        } for i in ranked[:top_n]]
+        result = {
+            'time': time.time(),
+            'symbols': len(ranked),
+            'top': top,
+            'ranks': {symbols[i]: rank + 1 for rank, i in enumerate(ranked)},
+            'elapsed_ms': (time.perf_counter() - start) * 1000.0,
+        }
+        self.last_scan = result
+        return result
+
+    def summary(self, symbol=None, count=5):
+        """给 AI 的一行扫描摘要: 前 count 名 (动量%/波动扩张倍数/成交量 z 值) 以及 symbol 的名次"""
+        scan = self.last_scan
+        if not scan or not scan['top']:
+            return ""
+        items = ", ".join(f"{t['symbol']} {t['momentum']:+.2f}%/{t['vol_expansion']:.1f}x/{t['volume_z']:+.1f}σ"
+                          for t in scan['top'][:count])
+        text = f"全市场扫描 ({scan['symbols']} 个合约，{self.momentum_bars} 分钟动量/波动扩张/量能) 前 {count}: {items}"
+        if symbol is not None:
+            rank = scan['ranks'].get(symbol)
+            text += f"；{symbol} 排名 {rank}" if rank else f"；{symbol} 未进入排名"
+        return text
+
+
+class UniverseFeed:
+    """
+    全市场 K 线推送: 获取所有交易中的 U 本位合约，先按节奏用 REST 补齐最近的 1m 历史，
+    再按每个连接最多 batch_size 个流分批订阅 K 线流，推送写入 MarketScanner
+    (全市场 miniTicker 由 MarketFeed 转发，不在这里重复订阅)
+    """
+
+    def __init__(self, binance_client, scanner, batch_size=config.SCANNER_STREAMS_PER_SOCKET, seed_delay=0.2):
+        self.binance = binance_client
+        self.scanner = scanner
+        self.batch_size = batch_size
+        self.seed_delay = seed_delay # 两次 REST 请求的间隔秒数 (限制请求权重)
+        self._twm = None
+        self._sockets = []
+        self._stopped = threading.Event()
+        self._lock = threading.Lock()
+
+    def start(self, klines=config.SCANNER_KLINE_STREAMS):
+        threading.Thread(target=self._run, args=(klines,), daemon=True).start()
+
+    def _run(self, klines):
+        symbols = self.binance.get_futures_symbols()
+        if not symbols or self._stopped.is_set():
+            return
+        self.scanner.set_universe(symbols)
+        if klines:
+            self._subscribe(symbols)
+        for symbol in symbols:
+            if self._stopped.wait(self.seed_delay):
+                return
+            self.scanner.load_klines(symbol, self.binance.get_klines(symbol, limit=self.scanner.window))
+
+    def _subscribe(self, symbols):
+        with self._lock:
+            try:
+                from binance import ThreadedWebsocketManager
+                self._twm = ThreadedWebsocketManager(https_proxy=config.PROXY_URL)
+                self._twm.start()
+                for i in range(0, len(symbols), self.batch_size):
+                    streams = [f"{s.lower()}@kline_1m" for s in symbols[i:i + self.batch_size]]
+                    self._sockets.append(self._twm.start_futures_multiplex_socket(callback=self._on_message, streams=streams))
+            except Exception as e:
+                print(f"Universe feed error: {e}")
+
+    def _on_message(self, msg):
+        try:
+            data = msg.get('data', msg) if isinstance(msg, dict) else msg
+            if data.get('e') == 'kline':
+                k = data['k']
+                self.scanner.apply_kline(data['s'], int(k['t']), float(k['o']), float(k['h']),
+                                         float(k['l']), float(k['c']), float(k['v']))
+            elif data.get('e') == 'error':
+                print(f"Universe feed error: {data.get('m')}")
+        except Exception as e:
+            print(f"Universe feed message error: {e}")
+
+    def stop(self):
+        self._stopped.set()
+        with self._lock:
+            if self._twm is not None:
+                self._twm.stop()
+                self._twm = None
+                self._sockets = []
@@ -0,0 +1,66 @@
+import numpy as np
+from ai_client import estimate_tokens
+from indicators import format_indicators
+from timeframes import aggregate, interval_ms
+
+# 默认时间周期: (K 线周期, 最多保留的根数)
+DEFAULT_FRAMES = (('1m', 30), ('5m', 24), ('1h', 12))
+
+
+def _encode_frame(interval, o, h, l, c, v, base):
+    """
+    差分编码一个周期的 K 线，每根为 '收盘变动:上影距:下影距:量比'
+    价格单位为基准价的 bp (0.01%)，量比为相对该周期平均成交量的 10 倍取整
+    """
+    scale = 1e4 / base
+    prev = np.concatenate(([o[0]], c[:-1]))
+    dc = np.rint((c - prev) * scale).astype(int)
+    up = np.rint((h - np.maximum(o, c)) * scale).astype(int)
+    down = np.rint((np.minimum(o, c) - l) * scale).astype(int)
+    mean_v = v.mean() if len(v) and v.mean() > 0 else 1.0
+    vr = np.rint(v / mean_v * 10).astype(int)
+    candles = " ".join(f"{a:+d}:{b}:{d}:{e}" for a, b, d, e in zip(dc, up, down, vr))
+    return f"{interval}×{len(c)} 起点{o[0]:.6g}: {candles}"
+
+
+def encode_market_snapshot(df, indicators=None, token_budget=400, frames=DEFAULT_FRAMES, klines=None):
+    """
+    生成给 AI 的紧凑行情快照:
+    多周期降采样 + 差分编码 + 指标状态，超出 token 预算时从最长的周期开始减少根数
+    klines: 可选的 klines(interval) -> (ts, open, high, low, close, volume) 或 None (如 MarketDataCache 中本地合成的高周期 K 线，
+    历史可长于 df)；未提供或返回 None 时由 df 聚合
+    """
+    if df is None or len(df) == 0:
+        return ""
+    ts = df['timestamp'].to_numpy()
+    if np.issubdtype(ts.dtype, np.datetime64):
+        ts = ts.astype('datetime64[ms]').astype('int64')
+    cols = [df[name].to_numpy(dtype=float) for name in ('open', 'high', 'low', 'close', 'volume')]
+    base = float(cols[3][-1])
+
+    sampled = []
+    for interval, count in frames:
+        arrays = klines(interval) if klines is not None else None
+        if arrays is None:
+            arrays = aggregate(ts, interval_ms(interval), *cols)
+        _, o, h, l, c, v = arrays
+        sampled.append([interval, min(count, len(c)), (o, h, l, c, v)])
+
+    header = f"基准价 {base:.6g} (最新收盘)，价格单位 bp=0.01% 基准价；每根K线: 收盘变动:上影距:下影距:量比(均量=10)"
+    ind_line = f"指标: {format_indicators(indicators)}" if indicators else ""
+
+    while True:
+        lines = [header]
+        for interval, count, arrays in sampled:
+            if count > 0:
+                lines.append(_encode_frame(interval, *(a[-count:] for a in arrays), base))
+        if ind_line:
+            lines.append(ind_line)
+        text = "\n".join(lines)
+        if estimate_tokens(text) <= token_budget:
+            return text
+        # 超出预算: 从根数最多的周期减少 20%
+        frame = max(sampled, key=lambda s: s[1])
+        if frame[1] <= 3:
+            return text
+        frame[1] = max(3, int(frame[1] * 0.8))
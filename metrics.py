@@ -0,0 +1,208 @@
+import json
+import math
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+
+# 直方图桶边界 (毫秒)：0.01ms ~ 约 120s，每桶增长 10%，误差不超过 10%
+_BUCKET_GROWTH = 1.1
+_BUCKET_BOUNDS = [0.01 * _BUCKET_GROWTH ** i for i in range(172)]
+
+
+class LatencyHistogram:
+    """对数分桶的延迟直方图，记录为 O(log 桶数)，内存固定"""
+
+    def __init__(self):
+        self.counts = [0] * (len(_BUCKET_BOUNDS) + 1)
+        self.count = 0
+        self.total = 0.0
+        self.min = math.inf
+        self.max = 0.0
+
+    def record(self, ms):
+        self.counts[bisect_left(_BUCKET_BOUNDS, ms)] += 1
+        self.count += 1
+        self.total += ms
+        if ms < self.min: self.min = ms
+        if ms > self.max: self.max = ms
+
+    def percentile(self, q):
+        """返回第 q 百分位 (0-100) 所在桶的上界，并限制在 [min, max] 内"""
+        if self.count == 0:
+            return 0.0
+        target = max(1, math.ceil(self.count * q / 100.0))
+        seen = 0
+        for i, c in enumerate(self.counts):
+            seen += c
+            if seen >= target:
+                upper = _BUCKET_BOUNDS[i] if i < len(_BUCKET_BOUNDS) else self.max
+                return min(max(upper, self.min), self.max)
+        return self.max
+
+    def summary(self):
+        return {
+            'count': self.count,
+            'mean_ms': self.total / self.count if self.count else 0.0,
+            'min_ms': self.min if self.count else 0.0,
+            'max_ms': self.max,
+            'p50_ms': self.percentile(50),
+            'p95_ms': self.percentile(95),
+            'p99_ms': self.percentile(99),
+        }
+
+
+class RollingHistogram:
+    """
+    滚动时间窗口的直方图: 窗口被分成若干时间片，每片一个 LatencyHistogram，
+    过期的时间片整体丢弃，统计时合并仍在窗口内的时间片
+    """
+
+    def __init__(self, window=3600.0, slots=12):
+        self.slot_seconds = window / slots
+        self.slots = slots
+        self._slots = {} # 时间片编号 -> LatencyHistogram
+
+    def record(self, ms):
+        slot = int(time.time() // self.slot_seconds)
+        hist = self._slots.get(slot)
+        if hist is None:
+            hist = self._slots[slot] = LatencyHistogram()
+            for old in [s for s in self._slots if s <= slot - self.slots]:
+                del self._slots[old]
+        hist.record(ms)
+
+    def summary(self):
+        oldest = int(time.time() // self.slot_seconds) - self.slots + 1
+        merged = LatencyHistogram()
+        for slot, hist in self._slots.items():
+            if slot < oldest or hist.count == 0:
+                continue
+            merged.counts = [a + b for a, b in zip(merged.counts, hist.counts)]
+            merged.count += hist.count
+            merged.total += hist.total
+            merged.min = min(merged.min, hist.min)
+            merged.max = max(merged.max, hist.max)
+        return merged.summary()
+
+
+class RollingCounter:
+    """滚动时间窗口的计数器，时间片划分与 RollingHistogram 相同"""
+
+    def __init__(self, window=3600.0, slots=12):
+        self.slot_seconds = window / slots
+        self.slots = slots
+        self._slots = {} # 时间片编号 -> 计数
+
+    def add(self, value=1):
+        slot = int(time.time() // self.slot_seconds)
+        if slot not in self._slots:
+            for old in [s for s in self._slots if s <= slot - self.slots]:
+                del self._slots[old]
+        self._slots[slot] = self._slots.get(slot, 0) + value
+
+    def total(self):
+        oldest = int(time.time() // self.slot_seconds) - self.slots + 1
+        return sum(v for slot, v in self._slots.items() if slot >= oldest)
+
+
+class LatencyRecorder:
+    """
+    按操作名称聚合耗时的记录器，可在任意线程中使用
+    rolling_window: 设置后耗时只统计最近 rolling_window 秒内的数据，计数器另外保留窗口内的计数 (window_counters)
+    """
+
+    def __init__(self, enabled=True, rolling_window=None):
+        self.enabled = enabled
+        self.rolling_window = rolling_window
+        self._histograms = {}
+        self._counters = {}
+        self._rolling_counters = {} # 仅在设置 rolling_window 时使用
+        self._lock = threading.Lock()
+
+    def record(self, name, ms):
+        if not self.enabled:
+            return
+        with self._lock:
+            hist = self._histograms.get(name)
+            if hist is None:
+                hist = self._histograms[name] = (RollingHistogram(self.rolling_window)
+                                                 if self.rolling_window else LatencyHistogram())
+            hist.record(ms)
+
+    def increment(self, name, value=1):
+        """累加计数器 (如 token 数、错误次数)"""
+        if not self.enabled:
+            return
+        with self._lock:
+            self._counters[name] = self._counters.get(name, 0) + value
+            if self.rolling_window:
+                counter = self._rolling_counters.get(name)
+                if counter is None:
+                    counter = self._rolling_counters[name] = RollingCounter(self.rolling_window)
+                counter.add(value)
+
+    def counters(self):
+        """累计计数 (自启动或上次 reset 以来)"""
+        with self._lock:
+            return dict(sorted(self._counters.items()))
+
+    def window_counters(self):
+        """最近 rolling_window 秒内的计数；未设置窗口时与 counters() 相同"""
+        if not self.rolling_window:
+            return self.counters()
+        with self._lock:
+            return {name: counter.total() for name, counter in sorted(self._rolling_counters.items())}
+
+    def summary(self, name):
+        with self._lock:
+            hist = self._histograms.get(name)
+            return hist.summary() if hist else None
+
+    @contextmanager
+    def span(self, name):
+        """计时上下文: with latency.span('exchange.futures_create_order'): ..."""
+        if not self.enabled:
+            yield
+            return
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(name, (time.perf_counter() - start) * 1000.0)
+
+    def reset(self):
+        with self._lock:
+            self._histograms.clear()
+            self._counters.clear()
+            self._rolling_counters.clear()
+
+    def dump(self):
+        """机器可读的统计结果: {操作名: {count, mean_ms, p50_ms, ...}}"""
+        with self._lock:
+            return {name: hist.summary() for name, hist in sorted(self._histograms.items())}
+
+    def export_json(self, path):
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump({'latency': self.dump(), 'counters': self.counters()}, f, indent=4, ensure_ascii=False)
+
+    def report(self):
+        """生成文本报告，按总耗时从高到低排序"""
+        stats = self.dump()
+        if not stats:
+            return "暂无耗时数据"
+        lines = [f"{'操作':<40}{'次数':>8}{'p50(ms)':>10}{'p95(ms)':>10}{'p99(ms)':>10}{'max(ms)':>10}"]
+        for name, s in sorted(stats.items(), key=lambda kv: kv[1]['mean_ms'] * kv[1]['count'], reverse=True):
+            lines.append(f"{name:<40}{s['count']:>8}{s['p50_ms']:>10.2f}{s['p95_ms']:>10.2f}{s['p99_ms']:>10.2f}{s['max_ms']:>10.2f}")
+        counters = self.counters()
+        if counters:
+            lines.append("")
+            lines.extend(f"{name:<40}{value:>8}" for name, value in counters.items())
+        return "\n".join(lines)
+
+
+# 全局默认记录器 (交易下单路径使用)
+latency = LatencyRecorder()
+
+# AI 调用统计 (最近 1 小时滚动窗口)
+ai_metrics = LatencyRecorder(rolling_window=3600)
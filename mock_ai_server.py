@@ -0,0 +1,154 @@
+"""
+本地 OpenAI 兼容模拟服务器，用于在没有真实 API Key 的情况下调试流式输出 (对话、单币种决策、批量决策)。
+测试中通过 start_server() 在后台线程启动，见 test_ai_client.py。
+
+用法:
+    python mock_ai_server.py --port 8765
+然后在设置中将 AI Base URL 设为 http://127.0.0.1:8765/v1 (API Key 任意填写)。
+"""
+import argparse
+import json
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# 预设回复: (思考过程, 回答)
+CANNED_ADVICE = (
+    "先看价格相对 MA5 的位置，再结合近期波动判断趋势强弱。",
+    "当前价格在均线附近震荡，建议轻仓观望，等待方向明确后再入场。请注意加密货币投资具有高风险。"
+)
+CANNED_DECISION = (
+    "价格站上 MA5，短线偏多。",
+    "ACTION:HOLD, TP_CONS:NONE, SL_CONS:NONE, TP_AGGR:NONE, SL_AGGR:NONE, LEVERAGE:5, MARGIN_MODE:全仓, REASON:模拟服务器固定回复"
+)
+
+
+def _batch_answer(messages, omit=()):
+    """批量决策回复: 用户消息中 '币种 | 数据' 表格的每个币种一行 '币种: 决策'，omit 中的币种不回复 (模拟缺失)"""
+    user = messages[-1].get('content', '') if messages else ''
+    symbols = [line.split('|', 1)[0].strip() for line in user.splitlines()[1:] if '|' in line]
+    return "\n".join(f"{symbol}: {CANNED_DECISION[1]}" for symbol in symbols if symbol not in omit)
+
+
+def _split(text, size):
+    return [text[i:i + size] for i in range(0, len(text), size)] or [""]
+
+
+def _usage(reasoning, answer):
+    completion = len(reasoning) + len(answer)
+    return {'prompt_tokens': 100, 'completion_tokens': completion, 'total_tokens': 100 + completion}
+
+
+class MockAIHandler(BaseHTTPRequestHandler):
+    # 每个增量之间的间隔 (秒) 与每个增量的字符数，可通过 start_server 修改
+    chunk_delay = 0.02
+    chunk_size = 4
+    batch_omit = () # 批量决策回复中故意省略的币种
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_POST(self):
+        if not self.path.rstrip('/').endswith('/chat/completions'):
+            self.send_error(404)
+            return
+        length = int(self.headers.get('Content-Length', 0))
+        body = json.loads(self.rfile.read(length) or b"{}")
+        messages = body.get('messages', [])
+        system = messages[0].get('content', '') if messages else ''
+        if "每个币种一行" in system:
+            reasoning, answer = CANNED_DECISION[0], _batch_answer(messages, self.batch_omit)
+        else:
+            reasoning, answer = CANNED_DECISION if "交易决策" in system else CANNED_ADVICE
+        model = body.get('model', 'mock-model')
+
+        if body.get('stream'):
+            include_usage = (body.get('stream_options') or {}).get('include_usage', False)
+            self._stream(model, reasoning, answer, include_usage)
+        else:
+            self._complete(model, reasoning, answer)
+
+    def _complete(self, model, reasoning, answer):
+        payload = {
+            'id': f"chatcmpl-{uuid.uuid4().hex[:12]}",
+            'object': 'chat.completion',
+            'created': int(time.time()),
+            'model': model,
+            'choices': [{
+                'index': 0,
+                'message': {'role': 'assistant', 'content': answer, 'reasoning_content': reasoning},
+                'finish_reason': 'stop'
+            }],
+            'usage': _usage(reasoning, answer)
+        }
+        data = json.dumps(payload, ensure_ascii=False).encode('utf-8')
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _stream(self, model, reasoning, answer, include_usage=False):
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/event-stream')
+        self.send_header('Cache-Control', 'no-cache')
+        self.end_headers()
+        chunk_id = f"chatcmpl-{uuid.uuid4().hex[:12]}"
+
+        def send(delta, finish_reason=None):
+            event = {
+                'id': chunk_id,
+                'object': 'chat.completion.chunk',
+                'created': int(time.time()),
+                'model': model,
+                'choices': [{'index': 0, 'delta': delta, 'finish_reason': finish_reason}]
+            }
+            self.wfile.write(f"data: {json.dumps(event, ensure_ascii=False)}\n\n".encode('utf-8'))
+            self.wfile.flush()
+
+        send({'role': 'assistant', 'content': ''})
+        for piece in _split(reasoning, self.chunk_size):
+            time.sleep(self.chunk_delay)
+            send({'reasoning_content': piece})
+        for piece in _split(answer, self.chunk_size):
+            time.sleep(self.chunk_delay)
+            send({'content': piece})
+        send({}, finish_reason='stop')
+        if include_usage:
+            # 与 OpenAI 一致: 用量放在最后一个 choices 为空的数据块中
+            event = {'id': chunk_id, 'object': 'chat.completion.chunk', 'created': int(time.time()),
+                     'model': model, 'choices': [], 'usage': _usage(reasoning, answer)}
+            self.wfile.write(f"data: {json.dumps(event, ensure_ascii=False)}\n\n".encode('utf-8'))
+        self.wfile.write(b"data: [DONE]\n\n")
+        self.wfile.flush()
+
+
+def start_server(host="127.0.0.1", port=0, chunk_delay=None):
+    """在后台线程启动模拟服务器，返回 (server, base_url)；port=0 时自动分配端口"""
+    if chunk_delay is not None:
+        MockAIHandler.chunk_delay = chunk_delay
+    server = ThreadingHTTPServer((host, port), MockAIHandler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    return server, f"http://{host}:{server.server_address[1]}/v1"
+
+
+def main():
+    parser = argparse.ArgumentParser(description="本地 OpenAI 兼容模拟服务器 (流式返回预设回复)")
+    parser.add_argument('--host', default="127.0.0.1")
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--delay', type=float, default=MockAIHandler.chunk_delay, help="增量间隔 (秒)")
+    args = parser.parse_args()
+
+    MockAIHandler.chunk_delay = args.delay
+    server = ThreadingHTTPServer((args.host, args.port), MockAIHandler)
+    print(f"模拟 AI 服务已启动: http://{args.host}:{args.port}/v1")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
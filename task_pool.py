@@ -0,0 +1,149 @@
+import threading
+import time
+from collections import deque
+from metrics import latency
+
+
+class Task:
+    """
+    提交到 TaskPool 的任务: kind 为任务类型 (用于统计)，key 为合并键
+    任务函数以 fn(task, *args, **kwargs) 调用，长任务可检查 task.cancelled 提前结束，
+    并可通过 task.progress(*values) 分批回传中间结果
+    """
+
+    def __init__(self, pool, kind, key, fn, args, kwargs, on_done, on_progress):
+        self.pool = pool
+        self.kind = kind
+        self.key = key
+        self.fn = fn
+        self.args = args
+        self.kwargs = kwargs
+        self.on_done = on_done
+        self.on_progress = on_progress
+        self.cancelled = False
+        self.rejected = False # 任务池已关闭，任务未被接收
+        self.started = False
+        self.submitted = time.monotonic()
+
+    def cancel(self):
+        """取消任务: 未开始的任务不再执行，已开始的任务结果被丢弃"""
+        self.cancelled = True
+
+    def progress(self, *values):
+        if self.on_progress and not self.cancelled:
+            self.pool._deliver(self, self.on_progress, *values)
+
+
+class TaskPool:
+    """
+    固定数量的常驻工作线程，替代每次刷新都新建 QThread:
+    - 同一 key 的任务在排队或执行中时，重复提交直接返回已有任务 (合并重复刷新)；
+      replace=True 时改为取消旧任务并提交新任务 (如切换币种)
+    - 回调通过 dispatch 投递 (界面中为跨线程信号，回到 UI 线程执行)，投递时已取消的任务不回调
+    - 并发数固定为 workers，队列积压时任务排队而不是新开线程
+    """
+
+    def __init__(self, workers=4, dispatch=None, name="task"):
+        self._dispatch = dispatch # dispatch(fn): 在目标线程中执行无参函数 fn，默认直接在工作线程中执行
+        self._queue = deque()
+        self._active = {}         # key -> 排队或执行中的任务
+        self._cond = threading.Condition()
+        self._closed = False
+        self._threads = [threading.Thread(target=self._worker_loop, name=f"{name}-{i}", daemon=True)
+                         for i in range(workers)]
+        for t in self._threads:
+            t.start()
+
+    def submit(self, kind, fn, *args, key=None, replace=False, on_done=None, on_progress=None, **kwargs):
+        """
+        提交任务，返回 Task
+        on_done(result, error): 完成后回调，成功时 error 为 None
+        on_progress(*values): 任务调用 task.progress(*values) 时回调
+        任务池关闭后提交的任务不会执行也不会回调，返回的 Task 已取消且 rejected 为 True
+        """
+        with self._cond:
+            if self._closed:
+                task = Task(self, kind, key, fn, args, kwargs, on_done, on_progress)
+                task.rejected = True
+                task.cancel()
+                return task
+            existing = self._active.get(key) if key is not None else None
+            if existing is not None and not existing.cancelled:
+                if not replace:
+                    return existing
+                existing.cancel()
+                if not existing.started:
+                    self._queue.remove(existing)
+            task = Task(self, kind, key, fn, args, kwargs, on_done, on_progress)
+            if key is not None:
+                self._active[key] = task
+            self._queue.append(task)
+            self._cond.notify()
+        return task
+
+    def cancel(self, key):
+        with self._cond:
+            task = self._active.pop(key, None)
+            if task is not None:
+                task.cancel()
+                if not task.started:
+                    self._queue.remove(task)
+
+    def active(self, key):
+        """返回该 key 下排队或执行中的任务，没有时返回 None"""
+        with self._cond:
+            return self._active.get(key)
+
+    def pending_count(self):
+        with self._cond:
+            return len(self._queue)
+
+    def shutdown(self):
+        """停止接收新任务，取消所有排队中和带 key 的执行中任务 (其结果不再回调)"""
+        with self._cond:
+            self._closed = True
+            for task in list(self._queue) + list(self._active.values()):
+                task.cancel()
+            self._queue.clear()
+            self._active.clear()
+            self._cond.notify_all()
+
+    def _deliver(self, task, callback, *args):
+        def run():
+            if not task.cancelled:
+                callback(*args)
+        if self._dispatch:
+            self._dispatch(run)
+        else:
+            run()
+
+    def _worker_loop(self):
+        while True:
+            with self._cond:
+                while not self._queue and not self._closed:
+                    self._cond.wait()
+                if self._closed:
+                    return
+                task = self._queue.popleft()
+                # 排队期间通过 Task.cancel() 取消的任务仍留在队列中，取出后直接跳过
+                if task.cancelled:
+                    if task.key is not None and self._active.get(task.key) is task:
+                        del self._active[task.key]
+                    continue
+                task.started = True
+
+            start = time.monotonic()
+            latency.record(f"task.{task.kind}.queue_wait", (start - task.submitted) * 1000.0)
+            result, error = None, None
+            try:
+                result = task.fn(task, *task.args, **task.kwargs)
+            except Exception as e:
+                error = e
+                print(f"Task {task.kind} error: {e}")
+            latency.record(f"task.{task.kind}", (time.monotonic() - start) * 1000.0)
+
+            with self._cond:
+                if task.key is not None and self._active.get(task.key) is task:
+                    del self._active[task.key]
+            if task.on_done:
+                self._deliver(task, task.on_done, result, error)
@@ -0,0 +1,87 @@
+"""
+CryptoAIAdvisor / AIScheduler 对接本地模拟服务器 (mock_ai_server.py) 的测试: 流式增量、token 用量、决策缓存、批量决策
+
+用法:
+    python -m pytest -q test_ai_client.py
+"""
+import threading
+import pytest
+import config
+from ai_client import CryptoAIAdvisor, AIScheduler, is_valid_decision
+from metrics import LatencyRecorder
+from mock_ai_server import CANNED_ADVICE, CANNED_DECISION, MockAIHandler, start_server
+
+
+@pytest.fixture(scope="module")
+def base_url():
+    server, url = start_server(chunk_delay=0)
+    yield url
+    server.shutdown()
+
+
+@pytest.fixture
+def advisor(base_url, monkeypatch):
+    monkeypatch.setattr(config, "DEEPSEEK_BASE_URL", base_url)
+    monkeypatch.setattr(config, "DEEPSEEK_API_KEY", "test")
+    ai = CryptoAIAdvisor()
+    ai.metrics = LatencyRecorder(rolling_window=3600) # 每个测试单独统计
+    return ai
+
+
+def wait_for(event):
+    assert event.wait(10), "AI 调度器回调超时"
+
+
+def test_chat_streams_reasoning_then_content(advisor):
+    deltas, errors, done = [], [], threading.Event()
+    def on_done(error):
+        errors.append(error)
+        done.set()
+    AIScheduler(advisor).submit_chat("BTCUSDT", "当前价格: 100", "怎么看?",
+                                     on_delta=lambda kind, text: deltas.append((kind, text)), on_done=on_done)
+    wait_for(done)
+
+    assert errors == [None]
+    kinds = [kind for kind, _ in deltas]
+    assert kinds == sorted(kinds, key=lambda k: k != 'reasoning') # 思考过程全部在回答之前
+    assert "".join(t for k, t in deltas if k == 'reasoning') == CANNED_ADVICE[0]
+    assert "".join(t for k, t in deltas if k == 'content') == CANNED_ADVICE[1]
+
+
+def test_usage_is_recorded(advisor):
+    advisor.get_trade_decision("BTCUSDT", "当前价格: 100")
+    counters = advisor.metrics.counters()
+    assert counters["ai.decision.calls"] == 1
+    assert counters["ai.decision.prompt_tokens"] == 100
+    assert counters["ai.decision.completion_tokens"] == len(CANNED_DECISION[0]) + len(CANNED_DECISION[1])
+    assert advisor.telemetry()["decision"]["latency"]["count"] == 1
+
+
+def test_similar_market_state_hits_decision_cache(advisor):
+    state = {'price': 100.12, 'ma5': 99.5, 'volatility': 0.8} # 100.12 与 100.13 落在同一价格档位
+    first = advisor.get_trade_decision("BTCUSDT", "当前价格: 100.12", state=state)
+    second = advisor.get_trade_decision("BTCUSDT", "当前价格: 100.13", state=dict(state, price=100.13))
+
+    assert is_valid_decision(first) and second == first
+    counters = advisor.metrics.counters()
+    assert counters["ai.decision.calls"] == 1
+    assert counters["ai.decision.cache_hits"] == 1
+
+
+def test_batch_decision_through_scheduler(advisor, monkeypatch):
+    # 模拟回复中缺失一个币种，缺失的币种应合并补发一次
+    monkeypatch.setattr(MockAIHandler, "batch_omit", ("SOLUSDT",))
+    symbols = ["BTCUSDT", "ETHUSDT", "SOLUSDT"]
+    results, done = {}, threading.Event()
+    def on_done(symbol, decision):
+        results[symbol] = decision
+        if len(results) == len(symbols):
+            done.set()
+    AIScheduler(advisor).submit_decisions({s: f"{s} 当前价格: 100" for s in symbols}, on_done=on_done)
+    wait_for(done)
+
+    assert sorted(results) == sorted(symbols)
+    assert all(decision == CANNED_DECISION[1] for decision in results.values())
+    counters = advisor.metrics.counters()
+    assert counters["ai.batch.calls"] == 1
+    assert counters["ai.decision.calls"] == 1 # 只缺一个币种时走单币种请求
@@ -0,0 +1,30 @@
+import numpy as np
+
+# 币安 K 线周期 -> 毫秒 (按 UTC 时间边界对齐；不含按周一对齐的 1w 和按自然月的 1M)
+INTERVAL_MS = {
+    '1m': 60_000, '3m': 180_000, '5m': 300_000, '15m': 900_000, '30m': 1_800_000,
+    '1h': 3_600_000, '2h': 7_200_000, '4h': 14_400_000, '6h': 21_600_000,
+    '8h': 28_800_000, '12h': 43_200_000, '1d': 86_400_000,
+}
+
+
+def interval_ms(interval):
+    try:
+        return INTERVAL_MS[interval]
+    except KeyError:
+        raise ValueError(f"不支持的 K 线周期: {interval}")
+
+
+def aggregate(ts, period, o, h, l, c, v=None):
+    """
+    按时间边界把按时间排序的 K 线向量化聚合为 period 周期的 K 线 (ts 与 period 单位相同，毫秒或秒均可)
+    返回 (开盘时间, open, high, low, close[, volume])；第一根可能只包含该周期的一部分
+    """
+    if len(ts) == 0:
+        return (ts, o, h, l, c) if v is None else (ts, o, h, l, c, v)
+    keys = np.floor_divide(ts, period)
+    starts = np.concatenate(([0], np.flatnonzero(np.diff(keys)) + 1))
+    ends = np.concatenate((starts[1:] - 1, [len(ts) - 1]))
+    bars = (keys[starts] * period, o[starts], np.maximum.reduceat(h, starts),
+            np.minimum.reduceat(l, starts), c[ends])
+    return bars if v is None else bars + (np.add.reduceat(v, starts),)
@@ -0,0 +1,174 @@
+import config
+from market_snapshot import encode_market_snapshot
+
+
+def parse_decision(res):
+    """解析 AI 决策文本 ACTION:LONG/SHORT/HOLD, TP_CONS:price, SL_CONS:price, ..., REASON:text，返回字段字典"""
+    parts = {}
+    for part in res.split(','):
+        if ':' in part:
+            name, value = part.split(':', 1)
+            parts[name.strip()] = value.strip()
+    return parts
+
+
+def _price(value):
+    return float(value) if value not in (None, '', 'NONE') else None
+
+
+def build_signal(parts, aggressive=False, leverage=1, margin_mode="全仓"):
+    """由决策字段构建交易信号 (按策略选择止盈止损)；HOLD 或无效动作时返回 None"""
+    action = parts.get('ACTION', 'HOLD')
+    if action not in ('LONG', 'SHORT'):
+        return None
+    suffix = 'AGGR' if aggressive else 'CONS'
+    return {
+        'side': action,
+        'tp': _price(parts.get(f'TP_{suffix}')),
+        'sl': _price(parts.get(f'SL_{suffix}')),
+        'tp_cons': _price(parts.get('TP_CONS')),
+        'sl_cons': _price(parts.get('SL_CONS')),
+        'tp_aggr': _price(parts.get('TP_AGGR')),
+        'sl_aggr': _price(parts.get('SL_AGGR')),
+        'leverage': leverage,
+        'margin_mode': margin_mode,
+    }
+
+
+class TradingCore:
+    """
+    行情 → 触发器 → AI 决策 → 下单 的编排逻辑，不依赖 Qt
+    图形界面 (ui/main_window.py) 和无界面守护进程 (headless.py) 共用同一套逻辑；
+    AI 和订单的回调在工作线程中执行，由调用方切回自己的事件循环
+    """
+
+    def __init__(self, scheduler, cache, sim_engine, real_engine, order_executor, triggers, scanner=None):
+        self.scheduler = scheduler
+        self.cache = cache
+        self.scanner = scanner    # 可选的 MarketScanner，扫描结果附加在发送给 AI 的行情中
+        self.sim_trading = sim_engine
+        self.real_trading = real_engine
+        self.trading = sim_engine # 默认使用模拟交易
+        self.order_executor = order_executor
+        self.triggers = triggers
+        self.positions = None     # 最近一次同步的持仓；None 表示尚未同步
+        self.account = None       # 最近一次同步的账户快照 {'balance', 'equity', 'positions'}
+
+    @property
+    def is_simulated(self):
+        return self.trading is self.sim_trading
+
+    def set_real_mode(self, real):
+        self.trading = self.real_trading if real else self.sim_trading
+        self.positions = None
+        self.account = None
+
+    def positions_for(self, symbol):
+        return [p for p in self.positions or [] if p['symbol'] == symbol]
+
+    def account_snapshot(self, current_prices):
+        """读取余额、权益和持仓 (实盘模式会访问交易所，应在工作线程中调用)"""
+        return {
+            'balance': self.trading.balance,
+            'equity': self.trading.get_total_equity(current_prices),
+            'positions': self.trading.positions
+        }
+
+    def apply_account(self, data):
+        """记录后台同步得到的账户快照，之后的读取都使用内存中的数据"""
+        self.account = data
+        self.positions = data['positions']
+
+    def check_tp_sl(self, current_prices):
+        """本地检查止盈止损 (仅模拟模式需要，实盘由交易所处理)"""
+        return self.trading.check_tp_sl(current_prices) if self.is_simulated else []
+
+    def evaluate(self, symbol):
+        """用本地指标评估触发条件，返回 (触发原因列表, 指标快照)；原因为空时不需要请求 AI"""
+        ind = self.cache.indicators.snapshot(symbol)
+        return self.triggers.evaluate(symbol, ind, self.positions_for(symbol)), ind
+
+    def market_snapshot(self, symbol, df, ind):
+        """给 AI 的多周期行情快照，高周期 K 线取自缓存中本地合成的数据"""
+        return encode_market_snapshot(df, ind, token_budget=config.AI_SNAPSHOT_TOKEN_BUDGET,
+                                      frames=config.AI_SNAPSHOT_FRAMES,
+                                      klines=lambda interval: self.cache.klines(symbol, interval))
+
+    def scanner_summary(self, symbol):
+        return self.scanner.summary(symbol) if self.scanner is not None else ""
+
+    def request_decision(self, symbol, reasons, ind, df, on_done):
+        """
+        通过 AI 调度器异步获取决策，on_done(res) 在工作线程中回调
+        数值行情用于决策缓存，行情变化不大时直接复用上一次的决策；同一币种的新请求会使旧请求作废
+        """
+        summary, state = self._decision_input(symbol, reasons, ind, df)
+        return self.scheduler.submit_decision(symbol, summary, state=state, on_done=on_done)
+
+    def request_decisions(self, items, on_done):
+        """
+        同一轮触发的多个币种合并成一次批量 AI 请求，items: [(symbol, reasons, ind, df)]
+        on_done(symbol, res) 在工作线程中逐个币种回调；只有一个币种时走单币种请求
+        """
+        if len(items) == 1:
+            symbol, reasons, ind, df = items[0]
+            return self.request_decision(symbol, reasons, ind, df, on_done=lambda res: on_done(symbol, res))
+        summaries, states = {}, {}
+        for symbol, reasons, ind, df in items:
+            summaries[symbol], states[symbol] = self._decision_input(symbol, reasons, ind, df)
+        return self.scheduler.submit_decisions(summaries, states=states, on_done=on_done,
+                                               deadline=config.AI_BATCH_DEADLINE)
+
+    def _decision_input(self, symbol, reasons, ind, df):
+        """返回 (给 AI 的行情摘要, 用于决策缓存的数值行情)"""
+        price = ind['close']
+        volatility = ind['range_high'] - ind['range_low']
+        summary = (f"触发原因: {'; '.join(reasons)}\n当前价格: {price}, 波动率: {volatility:.6f}\n"
+                   f"{self.market_snapshot(symbol, df, ind)}")
+        scan = self.scanner_summary(symbol)
+        if scan:
+            summary += f"\n{scan}"
+        state = {'price': float(price), 'ma5': float(ind['sma']), 'volatility': float(volatility)}
+        return summary, state
+
+    def auto_open(self, symbol, signal, price, amount, callback=None, fetch_price=None):
+        """
+        按 AI 信号自动开仓: 账户数据未同步或该币种已有持仓时跳过 (防止重复开仓)
+        通过订单队列执行，同一币种同方向的未执行订单会被合并；返回 (是否已提交, 消息)
+        """
+        if self.positions is None:
+            return False, "AI 系统: 正在等待账户数据同步，暂不执行自动开仓。"
+        if self.positions_for(symbol):
+            return False, f"AI 系统: {symbol} 已有持仓，跳过自动开仓以防止重仓。"
+        self.open_position(symbol, signal['side'], price, amount, leverage=signal['leverage'],
+                           margin_mode=signal['margin_mode'], tp=signal['tp'], sl=signal['sl'],
+                           owner="AI", key=('AI', signal['side']), callback=callback, fetch_price=fetch_price)
+        return True, f"AI 系统: 正在为 {symbol} 执行自动开仓..."
+
+    @staticmethod
+    def _resolve_price(symbol, price, fetch_price):
+        if price is None and fetch_price is not None:
+            price = fetch_price(symbol)
+        if price is None:
+            raise RuntimeError(f"无法获取 {symbol} 的价格")
+        return price
+
+    def open_position(self, symbol, side, price, amount, callback=None, key=None, fetch_price=None, **kwargs):
+        """
+        通过订单队列开仓，callback(success, msg) 在工作线程中回调
+        price 为 None 时在订单线程中调用 fetch_price(symbol) 获取，调用方线程不做任何网络请求
+        """
+        engine = self.trading
+        def run():
+            return engine.open_position(symbol, side, self._resolve_price(symbol, price, fetch_price), amount, **kwargs)
+        return self.order_executor.submit(symbol, run, callback=callback, key=key)
+
+    def close_position(self, pos, price, callback=None, fetch_price=None):
+        """通过订单队列平仓 (实盘平仓需要查询持仓模式并下单)；同一持仓重复点击只执行一次"""
+        engine = self.trading
+        def run():
+            close_price = self._resolve_price(pos['symbol'], price, fetch_price)
+            if engine is self.sim_trading:
+                return engine.close_position(pos['id'], close_price)
+            return engine.close_position(pos['symbol'], pos['side'], pos['amount'], close_price)
+        return self.order_executor.submit(pos['symbol'], run, callback=callback, key=('close', pos['id']))
@@ -1,6 +1,11 @@
 import uuid
 import time
+import threading
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
 from binance.enums import *
+from metrics import latency
+import config
 
 class SimulatedTradingEngine:
     # ... (existing code)
@@ -8,6 +13,7 @@ class SimulatedTradingEngine:
         self.balance = initial_balance
         self.positions = [] # List of dicts: {'id', 'symbol', 'side', 'amount', 'entry_price', 'tp', 'sl', 'margin'}
         self.trade_history = []
+        self._lock = threading.RLock() # 订单队列会在多个线程中并发开平仓
 
     def open_position(self, symbol, side, price, amount_usdt, leverage=1, margin_mode="全仓", tp=None, sl=None, owner="用户"):
         """
@@ -15,6 +21,10 @@ class SimulatedTradingEngine:
         amount_usdt: 名义价值 (Position Value)
         leverage: 杠杆倍数
         """
+        with self._lock:
+            return self._open_position(symbol, side, price, amount_usdt, leverage, margin_mode, tp, sl, owner)
+
+    def _open_position(self, symbol, side, price, amount_usdt, leverage, margin_mode, tp, sl, owner):
         required_margin = amount_usdt / leverage
         if required_margin > self.balance:
             return False, "余额不足 (保证金不足)"
@@ -41,6 +51,10 @@ class SimulatedTradingEngine:
         return True, f"成功开仓 {side} {symbol}"
 
     def close_position(self, pos_id, current_price):
+        with self._lock:
+            return self._close_position(pos_id, current_price)
+
+    def _close_position(self, pos_id, current_price):
         for i, pos in enumerate(self.positions):
             if pos['id'] == pos_id:
                 # 计算盈亏
@@ -61,7 +75,9 @@ class SimulatedTradingEngine:
     def check_tp_sl(self, current_prices):
         """检查所有持仓是否触发止盈止损"""
         closed_messages = []
-        for pos in list(self.positions):
+        with self._lock:
+            candidates = list(self.positions)
+        for pos in candidates:
             symbol = pos['symbol']
             if symbol not in current_prices:
                 continue
@@ -95,13 +111,54 @@ class SimulatedTradingEngine:
                 equity += pos['margin'] + pnl
         return equity
 
+class RateLimiter:
+    """令牌桶限流，可在多个线程中共用；令牌不足时阻塞调用线程"""
+
+    def __init__(self, rate, burst):
+        self._rate = float(rate)
+        self._burst = float(burst)
+        self._tokens = float(burst)
+        self._token_time = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self._burst, self._tokens + (now - self._token_time) * self._rate)
+                self._token_time = now
+                if self._tokens >= 1.0:
+                    self._tokens -= 1.0
+                    return
+                wait = (1.0 - self._tokens) / self._rate
+            time.sleep(wait)
+
 class BinanceTradingEngine:
-    def __init__(self, binance_client):
+    def __init__(self, binance_client, metrics=None, rate_limiter=None):
         self.binance = binance_client
+        self.metrics = metrics or latency # 每个交易所请求和下单步骤的耗时统计
+        # 每次交易所调用消耗一个令牌 (一次开仓包含多次调用，按订单意图限流无法约束实际请求频率)
+        self.rate_limiter = rate_limiter or RateLimiter(config.EXCHANGE_REQUESTS_PER_SECOND, config.EXCHANGE_REQUEST_BURST)
         self.trade_history = []
         self._last_balance = 0.0
         self._account_cache = None
         self._cache_time = 0
+        self._orders_cache = None
+        self._orders_time = 0
+        # 持仓/挂单索引: (symbol, positionSide) -> 数据
+        self._synced_account = None
+        self._active_positions = {}
+        self._orders_index = {}
+        self._positions_view = []
+        self._positions_dirty = True
+        self._positions_lock = threading.RLock() # 账户同步可能在多个线程中同时读取持仓
+        # 下单路径缓存: 精度信息、杠杆、保证金模式 (按币种) 与持仓模式
+        self._symbol_filters = {}
+        self._leverage_cache = {}
+        self._margin_type_cache = {}
+        self._hedge_mode = None
+        # 止盈止损两个条件单并行提交
+        self._tp_sl_pool = ThreadPoolExecutor(max_workers=2, thread_name_prefix="tp-sl")
 
     def _get_account_info(self, force=False):
         """获取并缓存账户信息，减少 API 调用频率"""
@@ -112,96 +169,124 @@ class BinanceTradingEngine:
             return self._account_cache
         
         try:
-            self._account_cache = self.binance.client.futures_account()
+            self._account_cache = self._api('futures_account')
             self._cache_time = now
             return self._account_cache
         except Exception as e:
             print(f"Error fetching account info: {e}")
             return self._account_cache
 
+    def _api(self, method, **params):
+        """调用币安期货接口并记录耗时 (exchange.<方法名>)，调用前先通过限流"""
+        self.rate_limiter.acquire()
+        with self.metrics.span(f'exchange.{method}'):
+            return getattr(self.binance.client, method)(**params)
+
     def _round_step(self, value, step):
         """根据步长舍入数值"""
         from decimal import Decimal, ROUND_DOWN
         step_str = str(step).rstrip('0')
         return float(Decimal(str(value)).quantize(Decimal(step_str), rounding=ROUND_DOWN))
 
+    def _sync_positions(self, account):
+        """将账户快照增量合并进非零持仓集合 (同一快照只处理一次)"""
+        if account is self._synced_account:
+            return
+        for p in account['positions']:
+            self._apply_position_update(p)
+            # 账户快照中包含每个币种当前的杠杆和保证金模式，顺便用于下单缓存
+            if 'leverage' in p:
+                self._leverage_cache[p['symbol']] = int(p['leverage'])
+            if 'isolated' in p:
+                self._margin_type_cache[p['symbol']] = "ISOLATED" if p['isolated'] else "CROSSED"
+        self._synced_account = account
+
+    def _apply_position_update(self, p):
+        """更新单个持仓条目，只有非零持仓会进入活跃集合"""
+        key = (p['symbol'], p.get('positionSide', 'BOTH'))
+        if float(p['positionAmt']) != 0:
+            if self._active_positions.get(key) != p:
+                self._active_positions[key] = p
+                self._positions_dirty = True
+        elif key in self._active_positions:
+            del self._active_positions[key]
+            self._positions_dirty = True
+
+    def _index_orders(self, open_orders):
+        """按 (symbol, positionSide) 建立止盈止损挂单索引"""
+        index = {}
+        for o in open_orders:
+            o_stop_price = float(o.get('stopPrice', 0))
+            if o_stop_price <= 0:
+                continue
+            # 在单向持仓模式下 positionSide 是 BOTH，双向持仓模式下是 LONG/SHORT
+            key = (o['symbol'], o.get('positionSide', 'BOTH'))
+            entry = index.setdefault(key, {'tp': None, 'sl': None})
+            o_type = o.get('type', '')
+            if 'TAKE_PROFIT' in o_type:
+                entry['tp'] = o_stop_price
+            elif 'STOP' in o_type:
+                entry['sl'] = o_stop_price
+        if index != self._orders_index:
+            self._orders_index = index
+            self._positions_dirty = True
+
+    def _refresh_open_orders(self):
+        """获取并缓存挂单 (3 秒)，挂单变化时才重建索引"""
+        # 增加异常处理，防止挂单获取失败导致整个持仓列表显示异常
+        try:
+            if self._orders_cache is None or (time.time() - self._orders_time > 3):
+                self._orders_cache = self._api('futures_get_open_orders') or []
+                self._orders_time = time.time()
+                self._index_orders(self._orders_cache)
+        except Exception as e:
+            print(f"Warning: Could not fetch open orders: {e}")
+
+    def _build_position(self, key, p):
+        symbol, pos_side = key
+        amt = float(p['positionAmt'])
+        # 如果是单向持仓，根据数量正负判断
+        if pos_side == 'BOTH':
+            side = 'LONG' if amt > 0 else 'SHORT'
+        else:
+            side = pos_side # 'LONG' 或 'SHORT'
+        orders = self._orders_index.get(key, {})
+        return {
+            'id': f"REAL-{symbol}-{side}",
+            'symbol': symbol,
+            'side': side,
+            'amount': abs(amt),
+            'entry_price': float(p['entryPrice']),
+            'leverage': p['leverage'],
+            'margin_mode': '逐仓' if p['isolated'] else '全仓',
+            'tp': orders.get('tp'),
+            'sl': orders.get('sl'),
+            'owner': '实盘'
+        }
+
     @property
     def positions(self):
         """获取实盘当前持仓 (增强版，包含止盈止损显示)"""
         if not self.binance or not self.binance.client:
             return []
-        try:
-            # 1. 获取所有持仓信息 (使用缓存)
-            account = self._get_account_info()
-            if not account: return []
-            pos_info = account['positions']
-            
-            # 2. 获取所有挂单信息，用于提取止盈止损价格
-            # 增加异常处理和默认值，防止挂单获取失败导致整个持仓列表显示异常
-            open_orders = []
+        with self._positions_lock:
             try:
-                if not hasattr(self, '_orders_cache') or (time.time() - getattr(self, '_orders_time', 0) > 3):
-                    self._orders_cache = self.binance.client.futures_get_open_orders()
-                    self._orders_time = time.time()
-                open_orders = self._orders_cache or []
+                # 1. 获取持仓信息 (使用缓存)，增量合并到活跃持仓集合
+                account = self._get_account_info()
+                if not account: return list(self._positions_view)
+                self._sync_positions(account)
+
+                # 2. 获取挂单并按 (symbol, positionSide) 建索引，用于提取止盈止损价格
+                self._refresh_open_orders()
+
+                # 3. 数据未变化时直接复用上一次的结果，否则只按活跃持仓重建
+                if self._positions_dirty:
+                    self._positions_view = [self._build_position(key, p) for key, p in self._active_positions.items()]
+                    self._positions_dirty = False
             except Exception as e:
-                print(f"Warning: Could not fetch open orders: {e}")
-                open_orders = getattr(self, '_orders_cache', [])
-            
-            active_positions = []
-            for p in pos_info:
-                amt = float(p['positionAmt'])
-                if amt != 0:
-                    symbol = p['symbol']
-                    # 币安双向持仓模式下，p['positionSide'] 会指明是 LONG 还是 SHORT
-                    pos_side = p.get('positionSide', 'BOTH')
-                    
-                    # 如果是单向持仓，根据数量正负判断
-                    if pos_side == 'BOTH':
-                        side = 'LONG' if amt > 0 else 'SHORT'
-                    else:
-                        side = pos_side # 'LONG' 或 'SHORT'
-
-                    # 3. 在挂单中寻找该仓位的止盈止损
-                    tp_price = None
-                    sl_price = None
-                    
-                    for o in open_orders:
-                        if o['symbol'] == symbol:
-                            # 检查 positionSide 是否匹配
-                            # 在单向持仓模式下，pos_side 是 BOTH，o_pos_side 也是 BOTH
-                            # 在双向持仓模式下，pos_side 是 LONG/SHORT，o_pos_side 也是 LONG/SHORT
-                            o_pos_side = o.get('positionSide', 'BOTH')
-                            if o_pos_side != pos_side:
-                                continue
-                                
-                            o_type = o.get('type', '')
-                            o_stop_price = float(o.get('stopPrice', 0))
-                            
-                            if o_stop_price > 0:
-                                # 止盈单
-                                if 'TAKE_PROFIT' in o_type:
-                                    tp_price = o_stop_price
-                                # 止损单
-                                elif 'STOP' in o_type:
-                                    sl_price = o_stop_price
-
-                    active_positions.append({
-                        'id': f"REAL-{symbol}-{side}",
-                        'symbol': symbol,
-                        'side': side,
-                        'amount': abs(amt),
-                        'entry_price': float(p['entryPrice']),
-                        'leverage': p['leverage'],
-                        'margin_mode': '逐仓' if p['isolated'] else '全仓',
-                        'tp': tp_price,
-                        'sl': sl_price,
-                        'owner': '实盘'
-                    })
-            return active_positions
-        except Exception as e:
-            print(f"Error fetching real positions: {e}")
-            return []
+                # 出错时保留上一次的持仓，避免空列表绕过重复开仓检查
+                print(f"Error fetching real positions: {e}")
+            return list(self._positions_view)
 
     @property
     def balance(self):
@@ -238,58 +323,154 @@ class BinanceTradingEngine:
         """
         return []
 
+    def _get_symbol_filters(self, symbol):
+        """获取并缓存交易对精度 (数量步长、价格步长、最小名义价值)"""
+        if symbol in self._symbol_filters:
+            return self._symbol_filters[symbol]
+        with self.metrics.span('exchange.get_symbol_info'):
+            info = self.binance.get_symbol_info(symbol)
+        if not info:
+            return None
+
+        filters = {'qty_step': 0.001, 'price_tick': 0.01, 'min_notional': 5.0}
+        for f in info['filters']:
+            if f['filterType'] == 'LOT_SIZE':
+                filters['qty_step'] = float(f['stepSize'])
+            if f['filterType'] == 'PRICE_FILTER':
+                filters['price_tick'] = float(f['tickSize'])
+            if f['filterType'] == 'MIN_NOTIONAL':
+                filters['min_notional'] = float(f['notional'])
+        self._symbol_filters[symbol] = filters
+        return filters
+
+    def _is_hedge_mode(self):
+        """获取并缓存持仓模式 (单向/双向)"""
+        if self._hedge_mode is None:
+            mode_info = self._api('futures_get_position_mode')
+            self._hedge_mode = mode_info.get('dualSidePosition', False)
+        return self._hedge_mode
+
+    def _ensure_leverage(self, symbol, leverage):
+        """杠杆与缓存一致时跳过设置请求"""
+        if self._leverage_cache.get(symbol) == leverage:
+            return
+        try:
+            self._api('futures_change_leverage', symbol=symbol, leverage=leverage)
+            self._leverage_cache[symbol] = leverage
+        except Exception as e:
+            print(f"Leverage change failed (might be already set): {e}")
+
+    def _ensure_margin_type(self, symbol, margin_mode):
+        """保证金模式与缓存一致时跳过设置请求"""
+        target_mode = "ISOLATED" if margin_mode == "逐仓" else "CROSSED"
+        if self._margin_type_cache.get(symbol) == target_mode:
+            return
+        try:
+            self._api('futures_change_margin_type', symbol=symbol, marginType=target_mode)
+            self._margin_type_cache[symbol] = target_mode
+        except Exception as e:
+            # -4046: No need to change margin type，说明已经是目标模式
+            if getattr(e, 'code', None) == -4046:
+                self._margin_type_cache[symbol] = target_mode
+
+    def _confirm_fill(self, order):
+        """根据下单回报确认成交，未立即成交时查询一次订单状态 (不再固定等待)"""
+        if order.get('status') == 'FILLED':
+            return order
+        try:
+            return self._api('futures_get_order', symbol=order['symbol'], orderId=order['orderId'])
+        except Exception as e:
+            print(f"Order status query failed: {e}")
+            return order
+
+    def _place_tp_sl(self, symbol, side, tp, sl, price_tick, is_hedge, owner, quantity=None):
+        """
+        并行提交止盈止损单
+        逐个通过 futures_create_order 下单: 条件单 (TAKE_PROFIT_MARKET/STOP_MARKET) 由它自动转到 algoOrder 接口，
+        批量下单接口 (batchOrders) 不做这种转发，不能用于条件单
+        quantity: 为 None 时止盈止损平掉整个持仓 (closePosition)，否则只平掉该数量 (用于部分成交)
+        """
+        # 智能方向校验与修正
+        if tp and sl:
+            if side == 'LONG':
+                if tp < sl: tp, sl = sl, tp 
+            else:
+                if tp > sl: tp, sl = sl, tp 
+
+        tp_sl_side = SIDE_SELL if side == 'LONG' else SIDE_BUY
+        legs = []
+        if tp and float(tp) > 0:
+            legs.append(('止盈', 'TAKE_PROFIT_MARKET', self._round_step(tp, price_tick)))
+        if sl and float(sl) > 0:
+            legs.append(('止损', 'STOP_MARKET', self._round_step(sl, price_tick)))
+        if not legs:
+            return
+
+        def place(order_type, stop_price):
+            params = {
+                'symbol': symbol,
+                'side': tp_sl_side,
+                'type': order_type,
+                'stopPrice': stop_price,
+                'workingType': 'MARK_PRICE', # 手机端默认通常是标记价格触发
+                'priceProtect': True
+            }
+            if quantity is None:
+                params['closePosition'] = True
+            else:
+                params['quantity'] = quantity
+                if not is_hedge: params['reduceOnly'] = True # 双向持仓模式不接受 reduceOnly
+            if is_hedge: params['positionSide'] = 'LONG' if side == 'LONG' else 'SHORT'
+            return self._api('futures_create_order', **params)
+
+        # 两个条件单互不依赖，同时提交，总耗时约为一次请求
+        futures = [(label, stop_price, self._tp_sl_pool.submit(place, order_type, stop_price))
+                   for label, order_type, stop_price in legs]
+        for label, stop_price, future in futures:
+            try:
+                future.result()
+                self.trade_history.append(f"[{owner}] {label}单挂单成功: {stop_price}")
+            except Exception as e:
+                self.trade_history.append(f"[{owner}] {label}挂单失败: {str(e)}")
+
     def open_position(self, symbol, side, price, amount_usdt, leverage=1, margin_mode="全仓", tp=None, sl=None, owner="用户"):
+        with self.metrics.span('engine.open_position'):
+            return self._open_position(symbol, side, price, amount_usdt, leverage, margin_mode, tp, sl, owner)
+
+    def _open_position(self, symbol, side, price, amount_usdt, leverage, margin_mode, tp, sl, owner):
         if not self.binance or not self.binance.client:
             return False, "币安客户端未初始化"
         
         try:
-            # 获取精度信息
-            info = self.binance.get_symbol_info(symbol)
-            if not info:
-                return False, f"无法获取 {symbol} 的精度信息"
-            
-            qty_step = 0.001
-            price_tick = 0.01
-            min_notional = 5.0 
-            for f in info['filters']:
-                if f['filterType'] == 'LOT_SIZE':
-                    qty_step = float(f['stepSize'])
-                if f['filterType'] == 'PRICE_FILTER':
-                    price_tick = float(f['tickSize'])
-                if f['filterType'] == 'MIN_NOTIONAL':
-                    min_notional = float(f['notional'])
-
-            # 检查名义价值
-            if amount_usdt < min_notional:
-                return False, f"下单金额 ({amount_usdt} USDT) 低于该币种最小限制 ({min_notional} USDT)。"
-
-            # 设置杠杆
-            try:
-                self.binance.client.futures_change_leverage(symbol=symbol, leverage=leverage)
-            except Exception as e:
-                print(f"Leverage change failed (might be already set): {e}")
-            
-            # 设置保证金模式
-            try:
-                target_mode = "ISOLATED" if margin_mode == "逐仓" else "CROSSED"
-                self.binance.client.futures_change_margin_type(symbol=symbol, marginType=target_mode)
-            except:
-                pass 
-
-            # 计算并修正数量精度
-            quantity = self._round_step(amount_usdt / price, qty_step)
-            if quantity <= 0:
-                return False, f"下单数量过小，请增加下单金额"
+            with self.metrics.span('engine.open.prepare'):
+                # 获取精度信息 (按币种缓存)
+                filters = self._get_symbol_filters(symbol)
+                if not filters:
+                    return False, f"无法获取 {symbol} 的精度信息"
+
+                # 检查名义价值
+                min_notional = filters['min_notional']
+                if amount_usdt < min_notional:
+                    return False, f"下单金额 ({amount_usdt} USDT) 低于该币种最小限制 ({min_notional} USDT)。"
+
+                # 设置杠杆和保证金模式 (与缓存一致时不发请求)
+                self._ensure_leverage(symbol, leverage)
+                self._ensure_margin_type(symbol, margin_mode)
+
+                # 计算并修正数量精度
+                quantity = self._round_step(amount_usdt / price, filters['qty_step'])
+                if quantity <= 0:
+                    return False, f"下单数量过小，请增加下单金额"
             
-            # 检测持仓模式 (单向/双向)
-            mode_info = self.binance.client.futures_get_position_mode()
-            is_hedge = mode_info.get('dualSidePosition', False)
+                # 检测持仓模式 (单向/双向)
+                is_hedge = self._is_hedge_mode()
 
-            # 下单参数
+            # 下单参数，RESULT 回报类型会直接返回成交状态
             order_params = {
                 'symbol': symbol,
                 'type': ORDER_TYPE_MARKET,
-                'quantity': quantity
+                'quantity': quantity,
+                'newOrderRespType': 'RESULT'
             }
 
             if is_hedge:
@@ -300,79 +481,58 @@ class BinanceTradingEngine:
                 # 单向持仓模式
                 order_params['side'] = SIDE_BUY if side == 'LONG' else SIDE_SELL
 
-            # 执行开仓
-            order = self.binance.client.futures_create_order(**order_params)
-            self.trade_history.append(f"[{owner}] 主订单已成交: {side} {symbol} 数量 {quantity}")
-            
-            # 设置止盈止损
+            with self.metrics.span('engine.open.market_order'):
+                # 执行开仓
+                try:
+                    order = self._api('futures_create_order', **order_params)
+                except Exception:
+                    # 持仓模式可能已在其他终端修改，下次重新获取
+                    self._hedge_mode = None
+                    raise
+                order = self._confirm_fill(order)
+
+            # 持仓可能已变化，下次读取时强制刷新账户与挂单缓存
+            self._cache_time = 0
+            self._orders_time = 0
+
+            # 只有确认成交的数量才挂止盈止损并报告成功；市价单部分成交后剩余部分可能被交易所取消 (EXPIRED)
+            status = order.get('status')
+            executed = float(order.get('executedQty') or 0)
+            if status == 'FILLED':
+                executed = executed or quantity
+            elif executed <= 0:
+                if status == 'NEW':
+                    msg = f"实盘开仓未确认成交 (订单 {order.get('orderId')} 状态 NEW)，请在交易所核实"
+                else:
+                    msg = f"实盘开仓未成交 (订单状态 {status})"
+                self.trade_history.append(f"[{owner}] {msg}: {side} {symbol}")
+                return False, msg
+            partial = status != 'FILLED'
+            self.trade_history.append(f"[{owner}] 主订单{'部分' if partial else '已'}成交: {side} {symbol} 数量 {executed}"
+                                      + (f" / {quantity} (状态 {status})" if partial else ""))
+
+            # 设置止盈止损 (成交已确认，止盈止损并行提交；部分成交时只覆盖已成交数量)
             if tp or sl:
-                # 增加延迟，确保主订单在币安撮合引擎中完全成交并生成持仓
-                import time
-                time.sleep(2.0) 
-                
-                # 智能方向校验与修正
-                if tp and sl:
-                    if side == 'LONG':
-                        if tp < sl: tp, sl = sl, tp 
-                    else:
-                        if tp > sl: tp, sl = sl, tp 
-
-                tp_sl_side = SIDE_SELL if side == 'LONG' else SIDE_BUY
-                
-                # 止盈
-                if tp and float(tp) > 0:
-                    try:
-                        tp_price = self._round_step(tp, price_tick)
-                        tp_params = {
-                            'symbol': symbol,
-                            'side': tp_sl_side,
-                            'type': 'TAKE_PROFIT_MARKET',
-                            'stopPrice': tp_price,
-                            'closePosition': True,
-                            'workingType': 'MARK_PRICE', # 手机端默认通常是标记价格触发
-                            'priceProtect': True
-                        }
-                        if is_hedge: tp_params['positionSide'] = 'LONG' if side == 'LONG' else 'SHORT'
-                        
-                        self.binance.client.futures_create_order(**tp_params)
-                        self.trade_history.append(f"[{owner}] 止盈单挂单成功: {tp_price}")
-                    except Exception as e:
-                        self.trade_history.append(f"[{owner}] 止盈挂单失败: {str(e)}")
-
-                # 在止盈和止损单之间增加一个小延迟，防止请求过快
-                time.sleep(0.5)
-
-                # 止损
-                if sl and float(sl) > 0:
-                    try:
-                        sl_price = self._round_step(sl, price_tick)
-                        sl_params = {
-                            'symbol': symbol,
-                            'side': tp_sl_side,
-                            'type': 'STOP_MARKET',
-                            'stopPrice': sl_price,
-                            'closePosition': True,
-                            'workingType': 'MARK_PRICE',
-                            'priceProtect': True
-                        }
-                        if is_hedge: sl_params['positionSide'] = 'LONG' if side == 'LONG' else 'SHORT'
-                        
-                        self.binance.client.futures_create_order(**sl_params)
-                        self.trade_history.append(f"[{owner}] 止损单挂单成功: {sl_price}")
-                    except Exception as e:
-                        self.trade_history.append(f"[{owner}] 止损挂单失败: {str(e)}")
+                with self.metrics.span('engine.open.tp_sl'):
+                    self._place_tp_sl(symbol, side, tp, sl, filters['price_tick'], is_hedge, owner,
+                                      quantity=executed if partial else None)
 
+            if partial:
+                return True, f"实盘部分成交 {side} {symbol}: {executed} / {quantity} (状态 {status})"
             return True, f"实盘成功开仓 {side} {symbol}"
         except Exception as e:
             return False, f"实盘开仓失败: {str(e)}"
 
     def close_position(self, symbol, side, quantity, current_price):
         """实盘平仓"""
+        with self.metrics.span('engine.close_position'):
+            return self._close_position(symbol, side, quantity, current_price)
+
+    def _close_position(self, symbol, side, quantity, current_price):
         if not self.binance or not self.binance.client:
             return False, "币安客户端未初始化"
         try:
-            mode_info = self.binance.client.futures_get_position_mode()
-            is_hedge = mode_info.get('dualSidePosition', False)
+            is_hedge = self._is_hedge_mode()
 
             order_params = {
                 'symbol': symbol,
@@ -389,8 +549,91 @@ class BinanceTradingEngine:
                 order_params['side'] = SIDE_SELL if side == 'LONG' else SIDE_BUY
                 order_params['reduceOnly'] = True
 
-            self.binance.client.futures_create_order(**order_params)
+            try:
+                self._api('futures_create_order', **order_params)
+            except Exception:
+                self._hedge_mode = None
+                raise
+            self._cache_time = 0
+            self._orders_time = 0
             self.trade_history.append(f"实盘平仓 {symbol}: 价格 {current_price}")
             return True, "实盘平仓成功"
         except Exception as e:
             return False, f"实盘平仓失败: {str(e)}"
+
+
+class OrderExecutor:
+    """
+    订单执行队列:
+    - 同一币种的订单严格按提交顺序执行，不同币种并行执行
+    - 交易所频率限制由 BinanceTradingEngine 按每次接口调用限流 (一个订单意图包含多次调用)
+    - 提交返回 Future，结果为引擎返回的 (success, msg)
+    """
+
+    def __init__(self, max_workers=8):
+        self._pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="order")
+        self._lock = threading.Lock()
+        self._queues = {}   # symbol -> deque[(key, fn, args, kwargs, future)]
+        self._running = set() # 正在执行队列的币种
+        self._pending = {}  # (symbol, key) -> future，用于合并重复订单
+
+    def submit(self, symbol, fn, *args, callback=None, key=None, **kwargs):
+        """
+        提交订单意图: fn(*args, **kwargs) 会在该币种的队列中执行
+        key: 合并键，同一币种下相同 key 的订单尚未开始执行时，直接复用已有的 Future
+        callback: 完成后在工作线程中调用 callback(success, msg)
+        """
+        with self._lock:
+            if key is not None and (symbol, key) in self._pending:
+                future = self._pending[(symbol, key)]
+            else:
+                future = Future()
+                if key is not None:
+                    self._pending[(symbol, key)] = future
+                self._queues.setdefault(symbol, deque()).append((key, fn, args, kwargs, future))
+                if symbol not in self._running:
+                    self._running.add(symbol)
+                    self._pool.submit(self._drain, symbol)
+
+        if callback:
+            future.add_done_callback(lambda f: callback(*self._result_of(f)))
+        return future
+
+    def open_position(self, engine, symbol, side, price, amount_usdt, callback=None, key=None, **kwargs):
+        """便捷方法: 通过队列调用 engine.open_position"""
+        return self.submit(symbol, engine.open_position, symbol, side, price, amount_usdt,
+                           callback=callback, key=key, **kwargs)
+
+    def pending_count(self):
+        with self._lock:
+            return sum(len(q) for q in self._queues.values())
+
+    def shutdown(self, wait=True):
+        self._pool.shutdown(wait=wait)
+
+    @staticmethod
+    def _result_of(future):
+        try:
+            return future.result()
+        except Exception as e:
+            return False, f"订单执行异常: {str(e)}"
+
+    def _drain(self, symbol):
+        """按顺序执行某个币种队列中的所有订单"""
+        while True:
+            with self._lock:
+                queue = self._queues.get(symbol)
+                if not queue:
+                    self._queues.pop(symbol, None)
+                    self._running.discard(symbol)
+                    return
+                key, fn, args, kwargs, future = queue.popleft()
+                if key is not None:
+                    self._pending.pop((symbol, key), None)
+
+            if not future.set_running_or_notify_cancel():
+                continue
+            try:
+                future.set_result(fn(*args, **kwargs))
+            except Exception as e:
+                future.set_exception(e)
@@ -0,0 +1,264 @@
+import numpy as np
+import pyqtgraph as pg
+from PyQt5.QtCore import QLineF, QPointF, QRectF
+from timeframes import aggregate
+
+UP_COLOR = '#0ECB81'   # 涨：绿色
+DOWN_COLOR = '#F6465D' # 跌：红色
+
+
+class OhlcArrays:
+    """
+    图表使用的 K 线数据: 连续的 float64 数组 (x 为开盘时间，Unix 秒)
+    在数据线程中由 DataFrame 一次性转换，UI 线程直接使用
+    """
+    __slots__ = ('x', 'o', 'h', 'l', 'c')
+
+    def __init__(self, x, o, h, l, c):
+        self.x, self.o, self.h, self.l, self.c = x, o, h, l, c
+
+    @classmethod
+    def from_frame(cls, df):
+        ts = df['timestamp'].to_numpy()
+        if ts.dtype.kind == 'M':
+            ts = ts.astype('datetime64[ms]').astype('int64')
+        x = np.ascontiguousarray(ts, dtype=float) / 1000.0
+        cols = (np.ascontiguousarray(df[name].to_numpy(), dtype=float) for name in ('open', 'high', 'low', 'close'))
+        return cls(x, *cols)
+
+    def __len__(self):
+        return len(self.x)
+
+
+class OhlcPyramid:
+    """
+    多级 OHLC 金字塔: 第 0 层为原始 K 线，其余各层依次聚合为 5m、15m、1h、4h、1d
+    合并新数据时每层只重新聚合最后变化的那个周期，更新成本与历史长度无关
+    """
+    LEVEL_SECONDS = (300, 900, 3600, 14400, 86400)
+
+    def __init__(self):
+        self.clear()
+
+    def clear(self):
+        self.seconds = []  # 每层 K 线的周期 (秒)
+        self.levels = []   # 每层 [x, o, h, l, c]
+
+    def __len__(self):
+        return len(self.levels[0][0]) if self.levels else 0
+
+    def _init_levels(self, x):
+        interval = float(np.min(np.diff(x))) if len(x) > 1 else 60.0
+        self.seconds = [interval] + [s for s in self.LEVEL_SECONDS if s > interval and s % interval == 0]
+        self.levels = [[np.empty(0) for _ in range(5)] for _ in self.seconds]
+
+    def merge(self, x, cols):
+        """
+        合并一段最新的 K 线 (通常是固定长度的滚动窗口)，与已有历史重叠的部分只比较是否变化
+        返回每层第一根发生变化的 K 线下标；没有变化时返回 None
+        """
+        if len(x) == 0:
+            return None
+        base = self.levels[0] if self.levels else None
+        pos = int(np.searchsorted(base[0], x[0])) if base else 0
+        if (base is None or len(base[0]) == 0 or pos == 0 and base[0][0] != x[0]
+                or not np.array_equal(base[0][pos:pos + len(x)], x[:len(base[0]) - pos])):
+            # 首次加载、新数据早于已有历史或时间戳不一致: 整体替换
+            self._init_levels(x)
+            base, pos = self.levels[0], 0
+
+        overlap = min(len(base[0]) - pos, len(x))
+        changed = pos + overlap
+        if overlap > 0:
+            diff = np.flatnonzero(np.logical_or.reduce([old[pos:pos + overlap] != new[:overlap]
+                                                        for old, new in zip(base[1:], cols)]))
+            if len(diff):
+                changed = pos + int(diff[0])
+        if changed == len(base[0]) and overlap == len(x):
+            return None
+
+        if pos + len(x) == len(base[0]):
+            # 没有新增 K 线 (通常只是最后一根在变化): 原地更新，避免复制整段历史
+            for old, new in zip(base[1:], cols):
+                old[changed:] = new[changed - pos:]
+        else:
+            self.levels[0] = [np.concatenate((old[:pos], new)) for old, new in zip(base, [x] + list(cols))]
+        return [changed] + [self._update_level(k, changed) for k in range(1, len(self.levels))]
+
+    def _update_level(self, k, changed):
+        """从第 0 层的 changed 处开始重新聚合第 k 层，返回该层第一根变化的 K 线下标"""
+        base, level, seconds = self.levels[0], self.levels[k], self.seconds[k]
+        bucket = (base[0][changed] // seconds) * seconds
+        first = int(np.searchsorted(level[0], bucket))
+        x, o, h, l, c = (a[int(np.searchsorted(base[0], bucket)):] for a in base)
+        agg = aggregate(x, seconds, o, h, l, c)
+        if first + len(agg[0]) == len(level[0]):
+            for old, new in zip(level, agg):
+                old[first:] = new
+        else:
+            self.levels[k] = [np.concatenate((old[:first], new)) for old, new in zip(level, agg)]
+        return first
+
+    def prepend(self, x, cols):
+        """在已有历史之前补充更早的 K 线 (重叠部分以已有数据为准)，各层整体重新聚合"""
+        if not self.levels or len(self.levels[0][0]) == 0:
+            return self.merge(x, cols)
+        keep = x < self.levels[0][0][0]
+        if not keep.any():
+            return None
+        base = [np.concatenate((new[keep], old)) for new, old in zip([x] + list(cols), self.levels[0])]
+        self._init_levels(base[0])
+        self.levels[0] = base
+        for k in range(1, len(self.levels)):
+            self.levels[k] = list(aggregate(base[0], self.seconds[k], *base[1:]))
+        return [0] * len(self.levels)
+
+
+class CandlestickItem(pg.GraphicsObject):
+    """
+    增量、多分辨率绘制的 K 线图形项:
+    - 数据保存在 OhlcPyramid 中，根据可见范围的像素宽度选择合适的周期 (每根 K 线至少 MIN_CANDLE_PIXELS 像素)，
+      setMinInterval() 可指定最小周期 (切换周期只是换一层显示，不需要重新加载数据)
+    - 已收盘的 K 线按 CHUNK 根一组录制成 QPicture，每组内按颜色批量绘制，只在首次可见时录制
+    - 每个 tick 只使变化的分组失效，最后一根未收盘的 K 线每次直接绘制
+    绘制成本只与可见的 K 线数量有关，与历史长度无关
+    x 坐标需单调递增且对同一根 K 线保持不变 (如开盘时间戳)
+    """
+    CHUNK = 256
+    MIN_CANDLE_PIXELS = 3
+
+    def __init__(self, x=None, o=None, h=None, l=None, c=None):
+        pg.GraphicsObject.__init__(self)
+        self._pen = pg.mkPen('k', width=0.5)
+        self._brushes = {True: pg.mkBrush(UP_COLOR), False: pg.mkBrush(DOWN_COLOR)}
+        self.pyramid = OhlcPyramid()
+        self.min_interval = 0 # 最小显示周期 (秒)
+        self.clear()
+        if x is not None:
+            self.setData(x, o, h, l, c)
+
+    def clear(self):
+        self.pyramid.clear()
+        self.lod = 0          # 当前显示的金字塔层
+        self._pictures = []   # 每层 {分组下标: QPicture}
+        self._closed = []     # 每层已收盘 K 线数量 (最后一根始终视为未收盘)
+        self._y_closed = None # 第 0 层已收盘 K 线的 (最低价, 最高价)
+        self._bounds = QRectF()
+        self.prepareGeometryChange()
+        self.update()
+
+    def __len__(self):
+        return len(self.pyramid)
+
+    def setArrays(self, arrays):
+        """直接使用 OhlcArrays (不做类型转换)"""
+        self._apply(self.pyramid.merge(arrays.x, [arrays.o, arrays.h, arrays.l, arrays.c]))
+
+    def setData(self, x, o, h, l, c):
+        self._apply(self.pyramid.merge(np.asarray(x, dtype=float),
+                                       [np.asarray(a, dtype=float) for a in (o, h, l, c)]))
+
+    def prependArrays(self, arrays):
+        """补充更早的历史 K 线"""
+        self._apply(self.pyramid.prepend(arrays.x, [arrays.o, arrays.h, arrays.l, arrays.c]))
+
+    def _apply(self, changed):
+        if changed is None:
+            return
+        levels = self.pyramid.levels
+        if len(self._pictures) != len(levels) or changed[0] == 0:
+            self._pictures = [{} for _ in levels]
+            self._closed = [0] * len(levels)
+            self._y_closed = None
+        # 使包含变化或新收盘 K 线的分组失效，其余分组保留
+        for k, first in enumerate(changed):
+            start = min(first, self._closed[k]) // self.CHUNK
+            pictures = self._pictures[k]
+            for key in [key for key in pictures if key >= start]:
+                del pictures[key]
+            self._closed[k] = len(levels[k][0]) - 1
+
+        # 纵向范围: 已收盘部分增量维护，历史被修改时整体重算
+        x, _, h, l, _ = levels[0]
+        closed = len(x) - 1
+        if self._y_closed is None or changed[0] < self._y_closed[2]:
+            self._y_closed = (l[:closed].min(initial=np.inf), h[:closed].max(initial=-np.inf), closed)
+        elif closed > self._y_closed[2]:
+            lo, hi, start = self._y_closed
+            self._y_closed = (min(lo, l[start:closed].min()), max(hi, h[start:closed].max()), closed)
+
+        # 包围盒覆盖所有层 (最粗一层的周期起点可能早于第一根 K 线)，切换层级时无需改变几何
+        self.prepareGeometryChange()
+        w = self.pyramid.seconds[-1]
+        x0 = levels[-1][0][0] - w
+        lo, hi = min(self._y_closed[0], l[-1]), max(self._y_closed[1], h[-1])
+        self._bounds = QRectF(x0, lo, x[-1] + w - x0, hi - lo)
+        self.update()
+
+    def setMinInterval(self, seconds):
+        self.min_interval = seconds
+        self.update()
+
+    def _choose_lod(self):
+        """选择不小于 min_interval 且使每根 K 线至少占 MIN_CANDLE_PIXELS 像素的最细周期"""
+        px = self.pixelWidth() # 一个像素对应的 x 跨度 (秒)
+        lod = 0
+        while lod < len(self.pyramid.seconds) - 1 and self.pyramid.seconds[lod] < self.min_interval:
+            lod += 1
+        if px > 0:
+            while lod < len(self.pyramid.seconds) - 1 and self.pyramid.seconds[lod] / px < self.MIN_CANDLE_PIXELS:
+                lod += 1
+        return lod
+
+    def _record_chunk(self, level, chunk):
+        """把一组已收盘的 K 线按颜色批量录制成一个 QPicture"""
+        start = chunk * self.CHUNK
+        end = min(start + self.CHUNK, self._closed[level])
+        x, o, h, l, c = (a[start:end] for a in self.pyramid.levels[level])
+        w = self.pyramid.seconds[level] * 0.6
+        picture = pg.QtGui.QPicture()
+        p = pg.QtGui.QPainter(picture)
+        p.setPen(self._pen)
+        p.drawLines([QLineF(xi, li, xi, hi) for xi, li, hi in zip(x.tolist(), l.tolist(), h.tolist())])
+        up = c >= o
+        bottom, height = np.minimum(o, c), np.abs(c - o)
+        for is_up in (True, False):
+            mask = up if is_up else ~up
+            if not mask.any():
+                continue
+            p.setBrush(self._brushes[is_up])
+            p.drawRects([QRectF(xi - w / 2, yi, w, hi)
+                         for xi, yi, hi in zip(x[mask].tolist(), bottom[mask].tolist(), height[mask].tolist())])
+        p.end()
+        self._pictures[level][chunk] = picture
+        return picture
+
+    def paint(self, p, *args):
+        if len(self.pyramid) == 0:
+            return
+        # 每次绘制时按当前缩放比例选择层级
+        level = self.lod = self._choose_lod()
+        x, o, h, l, c = self.pyramid.levels[level]
+        w = self.pyramid.seconds[level] * 0.6
+        closed = self._closed[level]
+
+        # 只绘制与可见范围相交的分组，未录制的分组在此时录制
+        view = self.viewRect()
+        first, last = 0, closed
+        if view is not None:
+            first = int(np.searchsorted(x, view.left() - w))
+            last = min(closed, int(np.searchsorted(x, view.right() + w)))
+        pictures = self._pictures[level]
+        if first < last:
+            for chunk in range(first // self.CHUNK, (last - 1) // self.CHUNK + 1):
+                p.drawPicture(0, 0, pictures.get(chunk) or self._record_chunk(level, chunk))
+
+        # 未收盘的 K 线每次直接绘制
+        xi, oi, hi, li, ci = x[-1], o[-1], h[-1], l[-1], c[-1]
+        p.setPen(self._pen)
+        p.setBrush(self._brushes[ci >= oi])
+        p.drawLine(QPointF(xi, li), QPointF(xi, hi))
+        p.drawRect(QRectF(xi - w / 2, min(oi, ci), w, abs(ci - oi)))
+
+    def boundingRect(self):
+        return QRectF(self._bounds)
@@ -0,0 +1,144 @@
+import numpy as np
+import pyqtgraph as pg
+from PyQt5.QtWidgets import QApplication, QFrame, QGridLayout, QLabel, QScrollArea, QVBoxLayout, QHBoxLayout, QWidget
+from PyQt5.QtCore import QTimer, Qt, pyqtSignal
+from ui.chart_items import CandlestickItem
+
+
+class DashboardPanel(QFrame):
+    """看板中的单个币种: 迷你 K 线图 + 价格、24h 涨跌幅和指标"""
+    clicked = pyqtSignal(str)
+    VISIBLE_CANDLES = 60 # 迷你图显示的 K 线根数 (1 小时)
+
+    def __init__(self, symbol, parent=None):
+        super().__init__(parent)
+        self.symbol = symbol
+        self.setFrameShape(QFrame.StyledPanel)
+        self.setStyleSheet("DashboardPanel { border: 1px solid #333333; border-radius: 6px; }")
+        self.setCursor(Qt.PointingHandCursor)
+        layout = QVBoxLayout(self)
+        layout.setContentsMargins(6, 6, 6, 6)
+
+        header = QHBoxLayout()
+        self.symbol_label = QLabel(symbol)
+        self.symbol_label.setStyleSheet("font-weight: bold; color: #F0B90B;")
+        self.price_label = QLabel("加载中...")
+        self.change_label = QLabel("")
+        self._change_color = None
+        header.addWidget(self.symbol_label)
+        header.addStretch()
+        header.addWidget(self.price_label)
+        header.addWidget(self.change_label)
+        layout.addLayout(header)
+
+        self.plot = pg.PlotWidget()
+        self.plot.setBackground('#121212')
+        self.plot.hideAxis('bottom')
+        self.plot.hideAxis('left')
+        self.plot.setMouseEnabled(x=False, y=False)
+        self.plot.hideButtons()
+        self.plot.setMenuEnabled(False)
+        self.plot.setMinimumHeight(140)
+        self.candles = CandlestickItem()
+        self.plot.addItem(self.candles)
+        layout.addWidget(self.plot)
+
+        self.indicator_label = QLabel("")
+        self.indicator_label.setStyleSheet("color: #848E9C; font-size: 11px;")
+        layout.addWidget(self.indicator_label)
+
+    def _set_text(self, label, text):
+        # 文本不变时不调用 setText，避免无谓的重新布局
+        if label.text() != text:
+            label.setText(text)
+
+    def refresh(self, cache):
+        arrays = cache.klines(self.symbol)
+        if arrays is not None:
+            ts, o, h, l, c, _ = arrays
+            x = ts / 1000.0
+            self.candles.setData(x, o, h, l, c)
+            n = min(self.VISIBLE_CANDLES, len(x))
+            self.plot.setXRange(x[-n], x[-1], padding=0.02)
+            self.plot.setYRange(l[-n:].min(), h[-n:].max(), padding=0.05)
+
+        ticker = cache.ticker(self.symbol)
+        price = ticker['price'] if ticker else (float(arrays[4][-1]) if arrays is not None else None)
+        if price is not None:
+            self._set_text(self.price_label, f"{price:.6g}")
+        if ticker:
+            pct = ticker['change_pct']
+            color = "#0ECB81" if pct >= 0 else "#F6465D"
+            self._set_text(self.change_label, f"{pct:+.2f}%")
+            if self._change_color != color:
+                self.change_label.setStyleSheet(f"color: {color}; font-weight: bold;")
+                self._change_color = color
+
+        ind = cache.indicators.snapshot(self.symbol)
+        if ind:
+            rsi, sma, ema = ind.get('rsi', np.nan), ind.get('sma', np.nan), ind.get('ema', np.nan)
+            trend = "多" if sma > ema else "空" if sma < ema else "-"
+            self._set_text(self.indicator_label, f"RSI14 {rsi:.1f} | MA5/EMA20 {trend} | ATR14 {ind.get('atr', np.nan):.4g}")
+
+    def mousePressEvent(self, event):
+        self.clicked.emit(self.symbol)
+        super().mousePressEvent(event)
+
+
+class DashboardGrid(QScrollArea):
+    """
+    多币种看板: 所有面板共用一个 MarketDataCache，新增面板不会增加网络请求
+    数据变化只做标记，按屏幕刷新率合并刷新，且只刷新当前可见的面板；
+    不可见面板的变化保留到它重新可见时再刷新
+    """
+    symbol_selected = pyqtSignal(str)
+
+    def __init__(self, cache, symbols=(), columns=3, parent=None):
+        super().__init__(parent)
+        self.cache = cache
+        self.columns = columns
+        self.panels = {}
+        self._stale = set()
+        self.setWidgetResizable(True)
+        self._container = QWidget()
+        self._grid = QGridLayout(self._container)
+        self._grid.setSpacing(8)
+        self.setWidget(self._container)
+        self.set_symbols(symbols)
+
+        screen = QApplication.primaryScreen()
+        rate = screen.refreshRate() if screen else 60.0
+        self.timer = QTimer(self)
+        self.timer.timeout.connect(self.flush)
+        self.timer.start(max(8, int(1000 / (rate or 60.0))))
+
+    def set_symbols(self, symbols):
+        symbols = list(dict.fromkeys(symbols))
+        for symbol in [s for s in self.panels if s not in symbols]:
+            panel = self.panels.pop(symbol)
+            self._grid.removeWidget(panel)
+            panel.deleteLater()
+        for i, symbol in enumerate(symbols):
+            panel = self.panels.get(symbol)
+            if panel is None:
+                panel = self.panels[symbol] = DashboardPanel(symbol)
+                panel.clicked.connect(self.symbol_selected.emit)
+                self._stale.add(symbol)
+            self._grid.addWidget(panel, i // self.columns, i % self.columns)
+
+    def _is_visible(self, panel):
+        return panel.isVisible() and not panel.visibleRegion().isEmpty()
+
+    def flush(self):
+        self._stale |= self.cache.take_dirty() & self.panels.keys()
+        if not self._stale or not self.isVisible():
+            return
+        for symbol in list(self._stale):
+            panel = self.panels[symbol]
+            if self._is_visible(panel):
+                panel.refresh(self.cache)
+                self._stale.discard(symbol)
+
+    def showEvent(self, event):
+        super().showEvent(event)
+        self.flush()
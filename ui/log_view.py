@@ -0,0 +1,80 @@
+import logging
+import os
+import threading
+import time
+from logging.handlers import RotatingFileHandler
+from PyQt5.QtCore import QObject, QTimer
+import config
+
+
+class LogSink(QObject):
+    """
+    日志/对话输出: 任意线程调用 append() 只把文本放入缓冲区，
+    UI 定时器按批写入控件 (一次插入、一次重新布局)，控件文档最多保留 max_lines 行；
+    完整历史写入按大小轮转的日志文件，长时间运行时内存和 UI 线程开销保持恒定
+    """
+
+    def __init__(self, widget, name, max_lines=config.LOG_MAX_LINES, interval_ms=100, parent=None):
+        super().__init__(parent or widget)
+        self.widget = widget
+        self.max_lines = max_lines
+        self.widget.document().setMaximumBlockCount(max_lines)
+        self._pending = []
+        self._lock = threading.Lock()
+        self._logger = self._file_logger(name)
+
+        self.timer = QTimer(self)
+        self.timer.timeout.connect(self.flush)
+        self.timer.start(interval_ms)
+
+    @staticmethod
+    def _file_logger(name):
+        logger = logging.getLogger(f"ui.{name}")
+        logger.propagate = False
+        if not logger.handlers and config.LOG_DIR:
+            try:
+                os.makedirs(config.LOG_DIR, exist_ok=True)
+                handler = RotatingFileHandler(os.path.join(config.LOG_DIR, f"{name}.log"), encoding="utf-8",
+                                              maxBytes=config.LOG_FILE_MAX_BYTES, backupCount=config.LOG_BACKUP_COUNT)
+                handler.setFormatter(logging.Formatter("%(message)s"))
+                logger.addHandler(handler)
+                logger.setLevel(logging.INFO)
+            except Exception as e:
+                print(f"Log file error: {e}")
+        return logger
+
+    def append(self, text):
+        """线程安全: 追加一行 (下一次 flush 时显示并写入文件)"""
+        with self._lock:
+            self._pending.append((time.time(), str(text)))
+
+    @staticmethod
+    def _stamp(ts, text):
+        return f"{time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(ts))} {text}"
+
+    def pending_count(self):
+        with self._lock:
+            return len(self._pending)
+
+    def record(self, text):
+        """只写入日志文件，不显示 (用于已经直接渲染到控件中的内容，如流式回复)"""
+        self._logger.info(self._stamp(time.time(), text))
+
+    def flush(self):
+        """在 UI 线程中把缓冲的文本一次性写入控件和日志文件"""
+        with self._lock:
+            if not self._pending:
+                return
+            pending, self._pending = self._pending, []
+        # 整批作为一条记录写入文件 (每行带追加时的时间戳)
+        self._logger.info("\n".join(self._stamp(ts, text) for ts, text in pending))
+
+        # 超出上限的部分反正会被文档裁掉，直接不插入
+        text = "\n".join(text for _, text in pending[-self.max_lines:])
+        bar = self.widget.verticalScrollBar()
+        at_bottom = bar.value() >= bar.maximum() - 4
+        cursor = self.widget.textCursor()
+        cursor.movePosition(cursor.End)
+        cursor.insertText(text if self.widget.document().isEmpty() else "\n" + text)
+        if at_bottom:
+            bar.setValue(bar.maximum())
@@ -1,16 +1,30 @@
 import sys
-import pandas as pd
+import threading
+import time
 from PyQt5.QtWidgets import (QApplication, QMainWindow, QWidget, QVBoxLayout, QHBoxLayout, 
-                             QLabel, QLineEdit, QPushButton, QTextEdit, QComboBox, QSpinBox, QCheckBox,
-                             QTableWidget, QTableWidgetItem, QCompleter, QHeaderView, QDialog, QFormLayout,
-                             QGroupBox)
-from PyQt5.QtCore import QTimer, Qt, QThread, pyqtSignal, QObject, QSize
-from PyQt5.QtGui import QColor, QPalette, QFont, QPixmap, QIcon, QPainter
+                             QLabel, QLineEdit, QPushButton, QTextEdit, QPlainTextEdit, QComboBox, QSpinBox, QCheckBox,
+                             QTableView, QCompleter, QHeaderView, QDialog, QFormLayout,
+                             QGroupBox, QTabWidget, QShortcut)
+from PyQt5.QtCore import QTimer, Qt, pyqtSignal
+from PyQt5.QtGui import QPixmap, QPainter, QKeySequence
 from PyQt5.QtSvg import QSvgRenderer
 import pyqtgraph as pg
 from binance_client import BinanceDataClient
-from ai_client import CryptoAIAdvisor
-from trading_engine import SimulatedTradingEngine, BinanceTradingEngine
+from ai_client import CryptoAIAdvisor, AIScheduler
+from trading_engine import SimulatedTradingEngine, BinanceTradingEngine, OrderExecutor
+from ai_triggers import TriggerEngine
+from trading_core import TradingCore, parse_decision, build_signal
+from ui.chart_items import CandlestickItem, OhlcArrays
+from ui.dashboard import DashboardGrid
+from ui.positions import PositionTableModel, ButtonDelegate
+from ui.log_view import LogSink
+from ui.stall import StallDetector, ui_handler
+from ui.perf import PerfMonitor
+from ui.scanner import ScannerTableModel
+from market_data import MarketDataCache, MarketFeed
+from market_scanner import MarketScanner, UniverseFeed
+from task_pool import TaskPool
+from timeframes import interval_ms
 import config
 
 # 配置对话框
@@ -63,94 +77,69 @@ class SettingsDialog(QDialog):
         config.save_config(new_config)
         self.accept()
 
-# 自定义 K 线图形项 (Candlestick)
-class CandlestickItem(pg.GraphicsObject):
-    def __init__(self, data):
-        pg.GraphicsObject.__init__(self)
-        self.data = data  # [ (t, open, close, low, high), ... ]
-        self.generatePicture()
-
-    def generatePicture(self):
-        self.picture = pg.QtGui.QPicture()
-        p = pg.QtGui.QPainter(self.picture)
-        p.setPen(pg.mkPen('k', width=0.5))
-        w = 0.6
-        for t, open_val, close_val, low_val, high_val in self.data:
-            if open_val > close_val:
-                p.setBrush(pg.mkBrush('#F6465D')) # 跌：红色
-            else:
-                p.setBrush(pg.mkBrush('#0ECB81')) # 涨：绿色
-            
-            p.drawLine(pg.QtCore.QPointF(t, low_val), pg.QtCore.QPointF(t, high_val))
-            p.drawRect(pg.QtCore.QRectF(t - w/2, open_val, w, close_val - open_val))
-        p.end()
-
-    def paint(self, p, *args):
-        p.drawPicture(0, 0, self.picture)
-
-    def boundingRect(self):
-        return pg.QtCore.QRectF(self.picture.boundingRect())
-
-# 异步数据获取工作者
-class DataWorker(QThread):
-    data_received = pyqtSignal(object)
-    error_occurred = pyqtSignal(str)
-
-    def __init__(self, binance_client, symbol):
-        super().__init__()
-        self.binance = binance_client
-        self.symbol = symbol
-
-    def run(self):
-        try:
-            df = self.binance.get_klines(self.symbol)
-            if df is not None:
-                self.data_received.emit(df)
-            else:
-                self.error_occurred.emit("获取数据失败")
-        except Exception as e:
-            self.error_occurred.emit(str(e))
-
-# 异步 AI 工作者
-class AIWorker(QThread):
-    response_received = pyqtSignal(str)
-
-    def __init__(self, ai_client, symbol, summary, query):
-        super().__init__()
-        self.ai = ai_client
-        self.symbol = symbol
-        self.summary = summary
-        self.query = query
-
-    def run(self):
-        try:
-            advice = self.ai.get_advice(self.symbol, self.summary, self.query)
-            self.response_received.emit(advice)
-        except Exception as e:
-            self.response_received.emit(f"AI 错误: {str(e)}")
-
-# 异步账户信息获取工作者
-class AccountWorker(QThread):
-    account_data_received = pyqtSignal(dict)
-
-    def __init__(self, trading_engine, current_prices):
-        super().__init__()
-        self.trading = trading_engine
-        self.current_prices = current_prices
-
-    def run(self):
-        try:
-            # 在后台线程获取所有账户数据，避免阻塞 UI
-            data = {
-                'balance': self.trading.balance,
-                'equity': self.trading.get_total_equity(self.current_prices),
-                'positions': self.trading.positions
-            }
-            self.account_data_received.emit(data)
-        except Exception as e:
-            print(f"AccountWorker Error: {e}")
+# 后台任务: 在 TaskPool 的常驻工作线程中执行，结果经 task_ready 信号回到 UI 线程
+def fetch_klines(task, binance_client, symbol):
+    df = binance_client.get_klines(symbol)
+    if df is None:
+        raise RuntimeError("获取数据失败")
+    df.attrs['symbol'] = symbol
+    # 图表数组在工作线程中转换好，UI 线程不再逐行访问 DataFrame
+    return df, OhlcArrays.from_frame(df)
+
+def fetch_history(task, binance_client, symbol, end_time, limit, page_size=1000):
+    """从 end_time (毫秒) 向前分页加载图表历史，每页通过 task.progress(symbol, OhlcArrays) 立即回传"""
+    loaded = 0
+    while loaded < limit and not task.cancelled:
+        df = binance_client.get_klines(symbol, limit=min(page_size, limit - loaded), end_time=end_time)
+        if df is None or len(df) == 0:
+            break
+        page = OhlcArrays.from_frame(df)
+        task.progress(symbol, page)
+        loaded += len(page)
+        end_time = int(page.x[0] * 1000) - 1
+        if len(page) < page_size:
+            break
+
+def scan_market(task, scanner):
+    return scanner.scan()
+
+def fetch_account(task, core, current_prices):
+    # 在后台线程获取所有账户数据，避免阻塞 UI
+    return core.account_snapshot(current_prices)
+
+# 流式增量合并器：AI 调度器在工作线程中逐个回调增量，这里合并后批量发送，避免每个 token 触发一次重绘
+class StreamBatcher:
+    FLUSH_INTERVAL = 0.05
+
+    def __init__(self, emit):
+        self.emit = emit # emit(kind, text)
+        self.kind = None
+        self.buffer = []
+        self.streamed = False
+        self.last_flush = time.monotonic()
+
+    def add(self, kind, text):
+        if kind != self.kind and self.buffer:
+            self.flush()
+        self.kind = kind
+        self.buffer.append(text)
+        self.streamed = True
+        if time.monotonic() - self.last_flush >= self.FLUSH_INTERVAL:
+            self.flush()
+
+    def flush(self):
+        if self.buffer:
+            self.emit(self.kind, "".join(self.buffer))
+            self.buffer = []
+        self.last_flush = time.monotonic()
 
 class MainWindow(QMainWindow):
+    trade_finished = pyqtSignal(bool, str)          # 订单队列在工作线程中回调，经信号回到 UI 线程
+    ai_chunk_ready = pyqtSignal(str, str)           # AI 调度器回调同理
+    ai_response_ready = pyqtSignal(str)
+    ai_decision_ready = pyqtSignal(str, str) # (币种, 决策文本)
+    task_ready = pyqtSignal(object)                 # 后台任务回调，在 UI 线程中执行
+
     def __init__(self):
         super().__init__()
         self.setWindowTitle("Bianlance - 币安合约监控与AI助手 (专业版)")
@@ -158,29 +147,113 @@ class MainWindow(QMainWindow):
 
         self.binance = BinanceDataClient()
         self.ai = CryptoAIAdvisor()
+        self.ai_scheduler = AIScheduler(self.ai)
         self.sim_trading = SimulatedTradingEngine()
         self.real_trading = BinanceTradingEngine(self.binance)
-        self.trading = self.sim_trading # 默认使用模拟交易
+        self.order_executor = OrderExecutor()
+        self.trade_finished.connect(self.on_trade_finished)
+        self.ai_chunk_ready.connect(self.on_ai_chunk)
+        self.ai_response_ready.connect(self.on_ai_response)
+        # 流式渲染状态属于窗口，同一时间只允许一个对话请求在输出，避免多个回复交错
+        self._ai_chat_busy = False
+        self.ai_decision_ready.connect(self.process_ai_decision)
+        self.task_ready.connect(self.on_task_ready)
+        # K 线、账户、历史数据等后台任务共用固定数量的常驻线程
+        self.tasks = TaskPool(workers=config.TASK_POOL_WORKERS, dispatch=self.dispatch_task_callback, name="ui")
+        self._task_backlog = 0 # 已投递但 UI 线程尚未执行的任务回调数
+        self._task_backlog_lock = threading.Lock()
         
         self.current_symbol = config.DEFAULT_SYMBOLS[0]
         self.all_symbols = []
         self.last_df = None
+        self.last_chart = None # 最近一次的图表数组 (OhlcArrays)
+        # 多币种共享行情缓存 (K 线、24h 行情、指标)，主图和看板共用，由一个 WebSocket 组合流持续更新
+        self.market_cache = MarketDataCache(capacity=config.KLINE_LIMIT)
+        # 全市场扫描: miniTicker 由主行情流转发，全部合约的 K 线流分批订阅，定期在后台线程中排名
+        self.scanner = MarketScanner()
+        self.universe_feed = UniverseFeed(self.binance, self.scanner)
+        self.market_feed = MarketFeed(self.binance, self.market_cache, on_tickers=self.scanner.apply_tickers)
+        self.indicators = self.market_cache.indicators
+        self.ai_triggers = TriggerEngine(atr_mult=config.AI_TRIGGER_ATR_MULT, cooldown=config.AI_TRIGGER_COOLDOWN)
+        # 触发 → AI 决策 → 下单的编排逻辑与无界面守护进程 (headless.py) 共用，界面只负责展示和输入
+        self.core = TradingCore(self.ai_scheduler, self.market_cache, self.sim_trading, self.real_trading,
+                                self.order_executor, self.ai_triggers, scanner=self.scanner)
         self.ai_auto_trade = False
         self.last_ai_signal = None # 存储最新的 AI 信号
+        self._last_ai_alert = 0.0   # 上次输出 AI 调用告警的时间
         
-        # 缓存绘图对象，避免 clear() 导致 UI 闪烁和输入法中断
+        # 绘图对象只创建一次，之后增量更新，避免 clear() 导致 UI 闪烁和输入法中断
         self.candlestick_item = None
         self.ma_line_item = None
+        self.chart_symbol = None # 图表当前显示的币种
+        self.history_symbol = None # 已开始加载图表历史的币种
         
         self.apply_dark_gold_theme()
         self.init_ui()
+        # UI 线程中的处理函数 (@ui_handler) 超过一帧 (16ms) 时写入交易日志文件
+        self.stall_detector = StallDetector(log=self.log_sink.record)
+        self.init_perf_monitor()
         self.load_symbols()
+        if self.binance.client:
+            self.market_feed.set_symbols(list(config.DEFAULT_SYMBOLS) + [self.current_symbol])
         
         # 定时器更新数据
         self.timer = QTimer()
         self.timer.timeout.connect(self.refresh_data)
         self.timer.start(2000) # 增加到 2 秒，减少 API 压力
 
+        self.scan_timer = QTimer()
+        self.scan_timer.timeout.connect(self.refresh_scan)
+        if self.binance.client:
+            self.universe_feed.start()
+            self.scan_timer.start(int(config.SCANNER_INTERVAL * 1000))
+
+    @property
+    def trading(self):
+        """当前交易引擎 (模拟/实盘)，由 TradingCore 管理"""
+        return self.core.trading
+
+    def dispatch_task_callback(self, callback):
+        # 工作线程中调用
+        with self._task_backlog_lock:
+            self._task_backlog += 1
+        self.task_ready.emit(callback)
+
+    def on_task_ready(self, callback):
+        with self._task_backlog_lock:
+            self._task_backlog -= 1
+        callback()
+
+    def init_perf_monitor(self):
+        """性能浮层 (F12 切换) 和 trace 导出 (Ctrl+Shift+T)，统计事件循环延迟、槽函数和绘制耗时、各队列深度"""
+        self.perf = PerfMonitor(self, gauges={
+            '任务': self.tasks.pending_count,
+            '回调': lambda: self._task_backlog,
+            '订单': self.order_executor.pending_count,
+            'AI': self.ai_scheduler.pending_count,
+            '日志': self.log_sink.pending_count,
+        }, enabled=config.PERF_OVERLAY)
+        self.stall_detector.monitor = self.perf
+        self.perf.watch_paint(self.candlestick_item, "candlestick")
+        self.perf.watch_paint(self.plot_widget, "plot_widget", method="paintEvent")
+        QShortcut(QKeySequence("F12"), self, activated=self.perf.toggle)
+        QShortcut(QKeySequence("Ctrl+Shift+T"), self, activated=self.export_perf_trace)
+
+    def export_perf_trace(self):
+        try:
+            path = self.perf.export()
+            self.log_sink.append(f"系统: 性能 trace 已导出到 {path} (可用 chrome://tracing 或 Perfetto 打开)")
+        except Exception as e:
+            self.log_sink.append(f"系统错误: 导出性能 trace 失败: {e}")
+
+    def closeEvent(self, event):
+        self.market_feed.stop()
+        self.universe_feed.stop()
+        self.tasks.shutdown()
+        self.log_sink.flush()
+        self.chat_sink.flush()
+        super().closeEvent(event)
+
     def apply_dark_gold_theme(self):
         """应用黑金配色方案"""
         qss = """
@@ -249,7 +322,7 @@ class MainWindow(QMainWindow):
         QLineEdit:focus, QComboBox:focus, QDoubleSpinBox:focus, QSpinBox:focus {
             border-color: #F0B90B;
         }
-        QTableWidget {
+        QTableView {
             background-color: #121212;
             border: 1px solid #333333;
             gridline-color: #2B2F36;
@@ -263,6 +336,17 @@ class MainWindow(QMainWindow):
             border: none;
             font-weight: bold;
         }
+        QTabWidget::pane {
+            border: 1px solid #333333;
+        }
+        QTabBar::tab {
+            background-color: #1E2329;
+            color: #848E9C;
+            padding: 6px 16px;
+        }
+        QTabBar::tab:selected {
+            color: #F0B90B;
+        }
         QScrollBar:vertical {
             background: #121212;
             width: 10px;
@@ -334,21 +418,54 @@ class MainWindow(QMainWindow):
         
         self.reset_view_btn = QPushButton("重置视图")
         self.reset_view_btn.clicked.connect(self.reset_chart_view)
+
+        # 图表周期: 高周期由已加载的 1m K 线在本地聚合，切换时不需要网络请求
+        self.timeframe_combo = QComboBox()
+        self.timeframe_combo.addItems(["1m", "5m", "15m", "1h", "4h", "1d"])
+        self.timeframe_combo.currentTextChanged.connect(self.on_timeframe_changed)
         
         search_layout.addWidget(self.symbol_input)
         search_layout.addWidget(self.search_btn)
         search_layout.addWidget(self.settings_btn)
+        search_layout.addWidget(self.timeframe_combo)
         search_layout.addWidget(self.reset_view_btn)
         header_layout.addLayout(search_layout)
         
         left_panel.addLayout(header_layout)
 
         # K线图
-        self.plot_widget = pg.PlotWidget()
+        # x 轴为 K 线开盘时间 (秒)，同一根 K 线的坐标不随滚动窗口变化，已收盘的 K 线无需重绘
+        self.plot_widget = pg.PlotWidget(axisItems={'bottom': pg.DateAxisItem()})
         self.plot_widget.setBackground('#121212')
         self.plot_widget.showGrid(x=True, y=True, alpha=0.2)
         self.plot_widget.setFocusPolicy(Qt.NoFocus)
-        left_panel.addWidget(self.plot_widget)
+        self.candlestick_item = CandlestickItem()
+        self.plot_widget.addItem(self.candlestick_item)
+        # 直接使用 PlotCurveItem (PlotDataItem 每次 setData 的额外开销约为其 10 倍)
+        self.ma_line_item = pg.PlotCurveItem(pen=pg.mkPen('#2980b9', width=1.5), connect='finite')
+        self.plot_widget.addItem(self.ma_line_item)
+        # 多币种看板与主图放在同一个标签页组件中
+        self.dashboard = DashboardGrid(self.market_cache, config.DEFAULT_SYMBOLS)
+        self.dashboard.symbol_selected.connect(self.switch_symbol)
+        self.chart_tabs = QTabWidget()
+        self.chart_tabs.addTab(self.plot_widget, "K线图")
+        self.chart_tabs.addTab(self.dashboard, "多币种看板")
+        # 全市场扫描前 N 名，双击切换到该合约
+        scanner_widget = QWidget()
+        scanner_vbox = QVBoxLayout(scanner_widget)
+        self.scanner_status = QLabel("全市场扫描: 等待行情数据...")
+        self.scanner_status.setStyleSheet("color: #848E9C;")
+        scanner_vbox.addWidget(self.scanner_status)
+        self.scanner_model = ScannerTableModel(self)
+        self.scanner_table = QTableView()
+        self.scanner_table.setModel(self.scanner_model)
+        self.scanner_table.horizontalHeader().setSectionResizeMode(QHeaderView.Stretch)
+        self.scanner_table.verticalHeader().setVisible(False)
+        self.scanner_table.setSelectionBehavior(QTableView.SelectRows)
+        self.scanner_table.doubleClicked.connect(self.on_scanner_double_clicked)
+        scanner_vbox.addWidget(self.scanner_table)
+        self.chart_tabs.addTab(scanner_widget, "市场扫描")
+        left_panel.addWidget(self.chart_tabs)
 
         # 实时价格大字显示
         self.price_display = QLabel("加载中...")
@@ -482,10 +599,15 @@ class MainWindow(QMainWindow):
         info_layout.addStretch()
         info_vbox.addLayout(info_layout)
 
-        self.position_table = QTableWidget(0, 7)
-        self.position_table.setHorizontalHeaderLabels(["ID", "币种", "方向", "数量", "入场价", "止盈/止损", "操作"])
+        # 持仓表格: 模型按持仓 id 做差异更新，"平仓" 列由委托绘制，不再为每行创建按钮
+        self.position_model = PositionTableModel(self)
+        self.position_table = QTableView()
+        self.position_table.setModel(self.position_model)
         self.position_table.horizontalHeader().setSectionResizeMode(QHeaderView.Stretch)
         self.position_table.setFocusPolicy(Qt.NoFocus)
+        self.close_delegate = ButtonDelegate(self.position_table)
+        self.close_delegate.clicked.connect(self.on_close_clicked)
+        self.position_table.setItemDelegateForColumn(PositionTableModel.CLOSE_COLUMN, self.close_delegate)
         info_vbox.addWidget(self.position_table)
         
         left_panel.addWidget(info_group)
@@ -501,6 +623,7 @@ class MainWindow(QMainWindow):
         self.chat_display.setReadOnly(True)
         self.chat_display.setFocusPolicy(Qt.NoFocus)
         self.chat_display.setStyleSheet("background-color: #1E2329; border: 1px solid #333333; color: #EAECEF;")
+        self.chat_sink = LogSink(self.chat_display, "chat")
         ai_chat_vbox.addWidget(self.chat_display)
         
         self.chat_input = QLineEdit()
@@ -519,10 +642,12 @@ class MainWindow(QMainWindow):
         # 下半部分：AI 决策与交易日志
         log_group = QGroupBox("AI 决策与交易日志")
         log_vbox = QVBoxLayout(log_group)
-        self.log_display = QTextEdit()
+        self.log_display = QPlainTextEdit()
         self.log_display.setReadOnly(True)
         self.log_display.setFocusPolicy(Qt.NoFocus)
         self.log_display.setStyleSheet("background-color: #1E2329; color: #848E9C; border: 1px solid #333333; font-family: 'Consolas'; font-size: 11px;")
+        # 日志经由 LogSink 批量写入 (任意线程可调用，面板行数有上限，完整历史写入文件)
+        self.log_sink = LogSink(self.log_display, "trade")
         log_vbox.addWidget(self.log_display)
         right_panel.addWidget(log_group, 1)
 
@@ -537,7 +662,7 @@ class MainWindow(QMainWindow):
 
     def load_symbols(self):
         if not self.binance.client:
-            self.log_display.append("系统错误: 无法连接到币安服务器。")
+            self.log_sink.append("系统错误: 无法连接到币安服务器。")
             return
         self.all_symbols = self.binance.get_all_symbols()
         if self.all_symbols:
@@ -546,6 +671,7 @@ class MainWindow(QMainWindow):
             completer.setFilterMode(Qt.MatchContains)
             self.symbol_input.setCompleter(completer)
 
+    @ui_handler
     def on_search_symbol(self):
         raw_symbol = self.symbol_input.text().upper().replace(":", "").replace("/", "")
         if "USDT" in raw_symbol:
@@ -554,32 +680,82 @@ class MainWindow(QMainWindow):
             symbol = raw_symbol
 
         if symbol in self.all_symbols or not self.all_symbols:
-            self.current_symbol = symbol
-            self.refresh_data()
-            self.log_display.append(f"系统: 已切换至 {symbol}")
-            self.reset_chart_view()
+            self.switch_symbol(symbol)
         else:
-            self.log_display.append(f"系统: 未找到交易对 {symbol}")
-
+            self.log_sink.append(f"系统: 未找到交易对 {symbol}")
+
+    @ui_handler
+    def switch_symbol(self, symbol):
+        if symbol != self.current_symbol:
+            self.clear_ai_signal() # 旧币种的信号不能用于新币种
+        self.current_symbol = symbol
+        self.symbol_input.setText(symbol)
+        self.chart_tabs.setCurrentWidget(self.plot_widget)
+        if self.binance.client:
+            self.market_feed.set_symbols(list(config.DEFAULT_SYMBOLS) + [symbol])
+        # 共享缓存中已有该币种的 K 线时立即显示，不必等待 REST 请求
+        cached = self.market_cache.frame(symbol)
+        if cached is not None:
+            self.on_data_received(cached)
+        self.refresh_data(replace=True)
+        self.log_sink.append(f"系统: 已切换至 {symbol}")
+        self.reset_chart_view()
+
+    @ui_handler
     def reset_chart_view(self):
-        if self.last_df is not None:
-            self.plot_widget.setXRange(0, len(self.last_df))
-            y_min = self.last_df['low'].min() * 0.998
-            y_max = self.last_df['high'].max() * 1.002
-            self.plot_widget.setYRange(y_min, y_max)
-
-    def refresh_data(self):
-        if not self.binance.client: return
-        if hasattr(self, 'data_worker') and self.data_worker.isRunning():
+        if self.last_chart is not None:
+            chart = self.last_chart
+            self.plot_widget.setXRange(chart.x[0], chart.x[-1])
+            self.plot_widget.setYRange(chart.l.min() * 0.998, chart.h.max() * 1.002)
+
+    def refresh_scan(self):
+        # 上一次扫描未完成时合并
+        self.tasks.submit('scan', scan_market, self.scanner, key='scan', on_done=self.on_scan_done)
+
+    @ui_handler
+    def on_scan_done(self, result, error):
+        if error is not None or result is None:
             return
-        self.data_worker = DataWorker(self.binance, self.current_symbol)
-        self.data_worker.data_received.connect(self.on_data_received)
-        self.data_worker.start()
+        self.scanner_model.set_results(result['top'])
+        self.scanner_status.setText(f"全市场扫描: {result['symbols']} 个合约参与排名 | 耗时 {result['elapsed_ms']:.1f} ms | "
+                                    f"更新于 {time.strftime('%H:%M:%S', time.localtime(result['time']))} | 双击切换合约")
+
+    @ui_handler
+    def on_scanner_double_clicked(self, index):
+        symbol = self.scanner_model.symbol_at(index.row())
+        if symbol:
+            self.switch_symbol(symbol)
+
+    @ui_handler
+    def on_timeframe_changed(self, interval):
+        """切换图表周期 (缩小时仍会自动切换到更粗的周期)；MA5 基于 1m K 线，只在 1m 周期显示"""
+        self.candlestick_item.setMinInterval(interval_ms(interval) / 1000.0)
+        self.ma_line_item.setVisible(interval == config.KLINE_INTERVAL)
+
+    @ui_handler
+    def refresh_data(self, replace=False):
+        """请求当前币种的 K 线；上一次请求未完成时合并 (replace=True 时取消旧请求，用于切换币种)"""
+        if not self.binance.client: return
+        self.tasks.submit('klines', fetch_klines, self.binance, self.current_symbol,
+                          key='klines', replace=replace, on_done=self.on_klines_done)
 
-    def on_data_received(self, df):
+    def on_klines_done(self, result, error):
+        if error is None:
+            self.on_data_received(*result)
+
+    @ui_handler
+    def on_data_received(self, df, chart=None):
+        # 切换币种前发出的请求可能晚到，丢弃不属于当前币种的数据
+        if df.attrs.get('symbol', self.current_symbol) != self.current_symbol:
+            return
+        if chart is None:
+            chart = OhlcArrays.from_frame(df)
         self.last_df = df
-        self.plot_klines(df)
-        price = df['close'].iloc[-1]
+        self.last_chart = chart
+        # 写入共享缓存并增量更新指标 (仅处理新增/变化的 K 线，切换币种时批量预热)
+        self.market_cache.load_frame(self.current_symbol, df)
+        self.plot_klines(chart)
+        price = float(chart.c[-1])
         
         # 更新价格显示
         prev_price_text = self.price_display.text().replace(" USDT", "")
@@ -595,22 +771,18 @@ class MainWindow(QMainWindow):
         self.price_display.setText(f"{price} USDT")
         
         # 异步获取账户和持仓信息，不再阻塞 UI 线程
-        if not hasattr(self, 'account_worker') or not self.account_worker.isRunning():
-            self.account_worker = AccountWorker(self.trading, {self.current_symbol: price})
-            self.account_worker.account_data_received.connect(self.on_account_data_received)
-            self.account_worker.start()
+        self.refresh_account_info()
         
         # 检查止盈止损 (仅模拟模式需要本地检查)
-        if self.trading == self.sim_trading:
-            msgs = self.trading.check_tp_sl({self.current_symbol: price})
-            for m in msgs:
-                self.log_display.append(f"系统: {m}")
+        for m in self.core.check_tp_sl({self.current_symbol: price}):
+            self.log_sink.append(f"系统: {m}")
         
         self.run_ai_auto_logic(df)
 
+    @ui_handler
     def on_account_data_received(self, data):
         """处理异步返回的账户数据并更新 UI"""
-        self._last_known_positions = data['positions'] # 缓存持仓数据用于安全检查
+        self.core.apply_account(data) # 缓存账户数据，用于触发器、自动开仓的安全检查和 AI 对话
         
         self.balance_label.setText(f"可用余额: {data['balance']:.2f} USDT")
         equity = data['equity']
@@ -625,37 +797,46 @@ class MainWindow(QMainWindow):
             self.ai_profit_label.setText(f"实盘模式 (API 已连接)")
             self.ai_profit_label.setStyleSheet("font-weight: bold; color: #2980b9;")
         
-        # 更新持仓表格
-        self.position_table.blockSignals(True)
-        self.position_table.setRowCount(0)
-        for pos in data['positions']:
-            self.add_position_row(pos)
-        self.position_table.blockSignals(False)
-
-    def plot_klines(self, df):
-        # 移除旧对象而不是 clear() 全局，减少对 UI 线程的冲击
-        if self.candlestick_item:
-            self.plot_widget.removeItem(self.candlestick_item)
-        if self.ma_line_item:
-            self.plot_widget.removeItem(self.ma_line_item)
-
-        data = []
-        for i in range(len(df)):
-            data.append((i, df['open'].iloc[i], df['close'].iloc[i], df['low'].iloc[i], df['high'].iloc[i]))
-        
-        self.candlestick_item = CandlestickItem(data)
-        self.plot_widget.addItem(self.candlestick_item)
-        
-        ma5 = df['close'].rolling(window=5).mean()
-        self.ma_line_item = self.plot_widget.plot(range(len(ma5)), ma5.values, pen=pg.mkPen('#2980b9', width=1.5))
-
+        # 更新持仓表格 (只应用新增、删除和变化的持仓)
+        self.position_model.set_positions(data['positions'])
+
+    @ui_handler
+    def plot_klines(self, chart):
+        """chart: OhlcArrays，图形项直接使用数组，只重绘变化的 K 线"""
+        # 切换币种时清空图表历史，其余情况只合并新数据
+        if self.chart_symbol != self.current_symbol:
+            self.candlestick_item.clear()
+            self.chart_symbol = self.current_symbol
+        self.candlestick_item.setArrays(chart)
+        self.load_chart_history()
+        
+        # MA5 序列由指标引擎增量维护，与最近的 K 线对齐
+        ma5 = self.indicators.series(self.current_symbol, 'sma')
+        self.ma_line_item.setData(chart.x[len(chart) - len(ma5):], ma5)
+
+    def load_chart_history(self):
+        """在后台补充加载更早的 K 线，图表按缩放比例自动切换周期，可显示很长的历史"""
+        if config.CHART_HISTORY_LIMIT <= 0 or not self.binance.client or len(self.candlestick_item) == 0:
+            return
+        if self.history_symbol == self.chart_symbol:
+            return
+        # 仍在加载旧币种的历史时将其取消
+        self.history_symbol = self.chart_symbol
+        first = self.candlestick_item.pyramid.levels[0][0][0]
+        self.tasks.submit('history', fetch_history, self.binance, self.chart_symbol, int(first * 1000) - 1,
+                          config.CHART_HISTORY_LIMIT, key='history', replace=True, on_progress=self.on_history_page)
+
+    @ui_handler
+    def on_history_page(self, symbol, page):
+        if symbol == self.chart_symbol:
+            self.candlestick_item.prependArrays(page)
+
+    @ui_handler
     def handle_trade(self, side):
         try:
             amount_str = self.amount_input.text().strip()
             amount = float(amount_str) if amount_str else config.DEFAULT_TRADE_AMOUNT
             
-            price = self.binance.get_ticker_price(self.current_symbol)
-            
             tp_str = self.tp_input.text().strip()
             sl_str = self.sl_input.text().strip()
             tp = float(tp_str) if tp_str else None
@@ -665,201 +846,118 @@ class MainWindow(QMainWindow):
             margin_mode = self.margin_mode_input.currentText()
             
             # 异步执行交易，防止 UI 卡死
-            self.log_display.append(f"系统: 正在提交 {side} 订单...")
+            self.log_sink.append(f"系统: 正在提交 {side} 订单...")
             
-            class TradeWorker(QThread):
-                finished = pyqtSignal(bool, str)
-                def __init__(self, engine, symbol, side, price, amount, leverage, margin_mode, tp, sl):
-                    super().__init__()
-                    self.engine = engine
-                    self.symbol = symbol
-                    self.side = side
-                    self.price = price
-                    self.amount = amount
-                    self.leverage = leverage
-                    self.margin_mode = margin_mode
-                    self.tp = tp
-                    self.sl = sl
-                def run(self):
-                    success, msg = self.engine.open_position(
-                        self.symbol, self.side, self.price, self.amount, 
-                        leverage=self.leverage, margin_mode=self.margin_mode, tp=self.tp, sl=self.sl
-                    )
-                    self.finished.emit(success, msg)
-
-            self.trade_worker = TradeWorker(self.trading, self.current_symbol, side, price, amount, leverage, margin_mode, tp, sl)
-            self.trade_worker.finished.connect(lambda success, msg: self.on_trade_finished(success, msg, price))
-            self.trade_worker.start()
+            self.submit_trade(side, amount, leverage, margin_mode, tp, sl)
             
         except ValueError:
-            self.log_display.append("系统: 请输入有效的数值 (下单金额/止盈/止损)")
+            self.log_sink.append("系统: 请输入有效的数值 (下单金额/止盈/止损)")
 
-    def on_trade_finished(self, success, msg, price):
-        self.log_display.append(f"系统: {msg}")
-        self.refresh_account_info(price)
+    def submit_trade(self, side, amount, leverage, margin_mode, tp, sl, owner="用户", key=None):
+        """
+        通过订单队列异步开仓，结果经 trade_finished 信号回到 UI 线程
+        价格取自内存中的行情缓存；缓存中没有时在订单线程中查询，UI 线程不做网络请求
+        """
+        self.core.open_position(
+            self.current_symbol, side, self.market_cache.price(self.current_symbol), amount,
+            leverage=leverage, margin_mode=margin_mode, tp=tp, sl=sl, owner=owner, key=key,
+            callback=self.trade_finished.emit, fetch_price=self.binance.get_ticker_price
+        )
 
-    def refresh_account_info(self, price):
-        if not hasattr(self, 'account_worker') or not self.account_worker.isRunning():
-            self.account_worker = AccountWorker(self.trading, {self.current_symbol: price})
-            self.account_worker.account_data_received.connect(self.on_account_data_received)
-            self.account_worker.start()
+    @ui_handler
+    def on_trade_finished(self, success, msg):
+        self.log_sink.append(f"系统: {msg}")
+        self.refresh_account_info()
 
-    def update_account_ui(self, current_prices):
-        try:
-            balance = self.trading.balance
-            self.balance_label.setText(f"可用余额: {balance:.2f} USDT")
-            equity = self.trading.get_total_equity(current_prices)
-            self.equity_label.setText(f"账户权益: {equity:.2f} USDT")
-            
-            # 计算盈亏
-            if self.trading == self.sim_trading:
-                total_profit = equity - 10000.0
-                self.ai_profit_label.setText(f"模拟总盈亏: {total_profit:.2f} USDT")
-            else:
-                # 实盘盈亏逻辑可以更复杂，这里简单显示
-                self.ai_profit_label.setText(f"实盘模式 (API 已连接)")
-                total_profit = 0 # 实盘不显示相对于 10000 的盈亏
-                
-            self.ai_profit_label.setStyleSheet(f"font-weight: bold; color: {'#2ebd85' if total_profit >= 0 else '#f6465d'};")
-        except Exception as e:
-            print(f"UI Update Error: {e}")
-        
-        self.position_table.blockSignals(True)
-        self.position_table.setRowCount(0)
-        # 显示所有持仓
-        for pos in self.trading.positions:
-            self.add_position_row(pos)
-        self.position_table.blockSignals(False)
-
-    def add_position_row(self, pos):
-        row = self.position_table.rowCount()
-        self.position_table.insertRow(row)
-        owner = pos.get('owner', '用户')
-        self.position_table.setItem(row, 0, QTableWidgetItem(f"{owner}-{pos['id']}"))
-        
-        symbol_text = f"{pos['symbol']} ({pos.get('leverage', 1)}x {pos.get('margin_mode', '全仓')})"
-        self.position_table.setItem(row, 1, QTableWidgetItem(symbol_text))
-        
-        side_item = QTableWidgetItem(pos['side'])
-        side_item.setForeground(pg.mkColor('#2ebd85' if pos['side'] == 'LONG' else '#f6465d'))
-        self.position_table.setItem(row, 2, side_item)
-        
-        self.position_table.setItem(row, 3, QTableWidgetItem(f"{pos['amount']:.4f}"))
-        self.position_table.setItem(row, 4, QTableWidgetItem(f"{pos['entry_price']:.6f}".rstrip('0').rstrip('.')))
-        
-        # 优化止盈止损显示格式
-        tp_val = pos.get('tp')
-        sl_val = pos.get('sl')
-        tp_text = f"{tp_val:.6f}".rstrip('0').rstrip('.') if tp_val else "-"
-        sl_text = f"{sl_val:.6f}".rstrip('0').rstrip('.') if sl_val else "-"
-        self.position_table.setItem(row, 5, QTableWidgetItem(f"止盈:{tp_text} / 止损:{sl_text}"))
-        
-        close_btn = QPushButton("平仓")
-        close_btn.clicked.connect(lambda checked, p_id=pos['id']: self.handle_close(p_id))
-        self.position_table.setCellWidget(row, 6, close_btn)
+    def current_prices(self):
+        """当前币种和所有持仓币种的缓存价格 (用于计算权益)"""
+        symbols = {self.current_symbol} | {p['symbol'] for p in self.core.positions or []}
+        prices = {s: self.market_cache.price(s) for s in symbols}
+        return {s: p for s, p in prices.items() if p is not None}
 
-    def handle_close(self, pos_id):
-        price = self.binance.get_ticker_price(self.current_symbol)
-        
-        # 区分模拟和实盘平仓
-        if self.trading == self.sim_trading:
-            success, msg = self.trading.close_position(pos_id, price)
-        else:
-            # 实盘平仓需要从表格中获取 symbol, side, amount
-            for row in range(self.position_table.rowCount()):
-                if self.position_table.item(row, 0).text().endswith(pos_id):
-                    symbol_full = self.position_table.item(row, 1).text()
-                    symbol = symbol_full.split(' ')[0]
-                    side = self.position_table.item(row, 2).text()
-                    amount = float(self.position_table.item(row, 3).text())
-                    success, msg = self.trading.close_position(symbol, side, amount, price)
-                    break
-            else:
-                success, msg = False, "未找到实盘持仓数据"
+    def refresh_account_info(self):
+        self.tasks.submit('account', fetch_account, self.core, self.current_prices(),
+                          key='account', on_done=self.on_account_done)
 
-        self.log_display.append(f"系统: {msg}")
-        self.refresh_account_info(price)
+    def on_account_done(self, data, error):
+        if error is None:
+            self.on_account_data_received(data)
+
+    @ui_handler
+    def on_close_clicked(self, row):
+        pos = self.position_model.position_at(row)
+        if pos:
+            self.handle_close(pos['id'])
+
+    @ui_handler
+    def handle_close(self, pos_id):
+        # 持仓数据直接从表格模型中按 id 读取
+        pos = self.position_model.position(pos_id)
+        if pos is None:
+            self.log_sink.append("系统: 未找到持仓数据")
+            return
+        # 平仓 (实盘需查询持仓模式并下单) 在订单队列中执行，重复点击同一持仓只执行一次
+        self.log_sink.append(f"系统: 正在提交 {pos['symbol']} {pos['side']} 平仓...")
+        self.core.close_position(pos, self.market_cache.price(pos['symbol']), callback=self.trade_finished.emit,
+                                 fetch_price=self.binance.get_ticker_price)
 
+    @ui_handler
     def toggle_ai_trade(self, enabled):
         self.ai_auto_trade = enabled
         if enabled:
             self.ai_toggle_btn.setText("关闭 AI 自动跟单交易")
             self.ai_toggle_btn.setStyleSheet("background-color: #7f8c8d; color: white; font-weight: bold; padding: 10px;")
             self.ai_status_label.setText("AI 状态: 正在扫描行情...")
-            self.log_display.append("系统: AI 自动交易已开启，AI 将根据行情自主决策。")
+            self.log_sink.append("系统: AI 自动交易已开启，AI 将根据行情自主决策。")
         else:
             self.ai_toggle_btn.setText("开启 AI 自动跟单交易")
             self.ai_toggle_btn.setStyleSheet("background-color: #f39c12; color: white; font-weight: bold; padding: 10px;")
             self.ai_status_label.setText("AI 状态: 休息中")
-            self.log_display.append("系统: AI 自动交易已关闭。")
+            self.log_sink.append("系统: AI 自动交易已关闭。")
 
     def run_ai_auto_logic(self, df):
-        # 即使不开启自动交易，也每 30 秒获取一次 AI 信号供手动跟单
-        
-        # 避免过于频繁的 AI 请求
-        if not hasattr(self, 'last_ai_decision_time'):
-            self.last_ai_decision_time = 0
-        
-        import time
-        current_time = time.time()
-        if current_time - self.last_ai_decision_time < 30:
+        # 即使不开启自动交易，也持续获取 AI 信号供手动跟单
+        # 每个 tick 用本地指标评估触发条件 (价格异动、均线交叉、放量、接近止盈止损)，满足时才请求 AI
+        reasons, ind = self.core.evaluate(self.current_symbol)
+        if not reasons:
             return
-            
-        self.last_ai_decision_time = current_time
+
         self.ai_status_label.setText("AI 状态: 正在获取信号...")
-        
-        price = df['close'].iloc[-1]
-        ma5 = df['close'].rolling(5).mean().iloc[-1]
-        volatility = df['high'].max() - df['low'].min()
-        summary = f"当前价格: {price}, MA5: {ma5:.6f}, 波动率: {volatility:.6f}"
-        
-        # 异步获取 AI 决策
-        class AIDecisionWorker(QThread):
-            decision_received = pyqtSignal(str)
-            def __init__(self, ai_client, symbol, data):
-                super().__init__()
-                self.ai = ai_client
-                self.symbol = symbol
-                self.data = data
-            def run(self):
-                res = self.ai.get_trade_decision(self.symbol, self.data)
-                self.decision_received.emit(res)
-
-        self.decision_worker = AIDecisionWorker(self.ai, self.current_symbol, summary)
-        self.decision_worker.decision_received.connect(self.process_ai_decision)
-        self.decision_worker.start()
-
-    def process_ai_decision(self, res):
+        self.log_sink.append(f"[{self.current_symbol}] AI 触发: {'; '.join(reasons)}")
+        self.core.request_decision(self.current_symbol, reasons, ind, df,
+                                   on_done=lambda res, s=self.current_symbol: self.ai_decision_ready.emit(s, res))
+
+    def check_ai_telemetry(self):
+        """AI 调用耗时或错误率超出阈值时在日志中告警 (最多每 5 分钟一次)"""
+        if time.time() - self._last_ai_alert < 300:
+            return
+        alerts = self.ai.telemetry_alerts()
+        if alerts:
+            self._last_ai_alert = time.time()
+            for alert in alerts:
+                self.log_sink.append(f"系统告警: {alert}")
+
+    @ui_handler
+    def process_ai_decision(self, symbol, res):
+        self.check_ai_telemetry()
         # 解析格式: ACTION:LONG/SHORT/HOLD, TP_CONS:price, SL_CONS:price, TP_AGGR:price, SL_AGGR:price, LEVERAGE:num, MARGIN_MODE:全仓/逐仓, REASON:text
         try:
-            parts = {p.split(':')[0].strip(): p.split(':')[1].strip() for p in res.split(',')}
+            parts = parse_decision(res)
             action = parts.get('ACTION', 'HOLD')
             reason = parts.get('REASON', '无')
             
+            self.log_sink.append(f"[{symbol}] AI 信号: {action} | 理由: {reason}")
+            # 请求后已切换币种: 止盈止损价格属于旧币种，只记录不跟单
+            if symbol != self.current_symbol:
+                self.log_sink.append(f"[{symbol}] 已切换至 {self.current_symbol}，忽略该信号。")
+                return
             self.ai_status_label.setText(f"AI 信号: {action}")
-            self.log_display.append(f"[{self.current_symbol}] AI 信号: {action} | 理由: {reason}")
             
-            if action in ['LONG', 'SHORT']:
-                # 根据选择的策略提取止盈止损
-                is_aggr = "AGGR" in self.ai_strategy_combo.currentText()
-                tp_key = 'TP_AGGR' if is_aggr else 'TP_CONS'
-                sl_key = 'SL_AGGR' if is_aggr else 'SL_CONS'
-                
-                tp_val = parts.get(tp_key, 'NONE')
-                sl_val = parts.get(sl_key, 'NONE')
-
-                # 存储信号供手动操作
-                self.last_ai_signal = {
-                    'side': action,
-                    'tp': float(tp_val) if tp_val != 'NONE' else None,
-                    'sl': float(sl_val) if sl_val != 'NONE' else None,
-                    'tp_cons': float(parts.get('TP_CONS', 0)) if parts.get('TP_CONS', 'NONE') != 'NONE' else None,
-                    'sl_cons': float(parts.get('SL_CONS', 0)) if parts.get('SL_CONS', 'NONE') != 'NONE' else None,
-                    'tp_aggr': float(parts.get('TP_AGGR', 0)) if parts.get('TP_AGGR', 'NONE') != 'NONE' else None,
-                    'sl_aggr': float(parts.get('SL_AGGR', 0)) if parts.get('SL_AGGR', 'NONE') != 'NONE' else None,
-                    'leverage': self.leverage_input.value(),
-                    'margin_mode': self.margin_mode_input.currentText()
-                }
+            # 根据选择的策略提取止盈止损，存储信号供手动操作
+            self.last_ai_signal = build_signal(parts, aggressive="AGGR" in self.ai_strategy_combo.currentText(),
+                                               leverage=self.leverage_input.value(),
+                                               margin_mode=self.margin_mode_input.currentText())
+            if self.last_ai_signal:
                 self.follow_btn.setEnabled(True)
                 self.reverse_btn.setEnabled(True)
                 self.follow_btn.setText(f"一键跟单 ({action})")
@@ -872,73 +970,33 @@ class MainWindow(QMainWindow):
                     if self.last_ai_signal['sl']:
                         self.sl_input.setText(str(self.last_ai_signal['sl']))
 
-                # 如果开启了自动交易，则直接执行
+                # 如果开启了自动交易，则直接执行 (持仓未同步或已有持仓时由 TradingCore 跳过，防止重复开仓)
                 if self.ai_auto_trade:
-                    # --- 安全检查：防止重复开仓 ---
-                    # 1. 获取最新持仓（从最近一次 AccountWorker 更新的数据中获取）
-                    # 如果数据还没回来，为了安全，我们假设有持仓，不进行自动交易
-                    if not hasattr(self, '_last_known_positions'):
-                        self.log_display.append("AI 系统: 正在等待账户数据同步，暂不执行自动开仓。")
-                        return
-                    
-                    current_pos = self._last_known_positions
-                    # 检查该币种是否已有任何方向的持仓
-                    existing_pos = [p for p in current_pos if p['symbol'] == self.current_symbol]
-                    
-                    if existing_pos:
-                        self.log_display.append(f"AI 系统: {self.current_symbol} 已有持仓，跳过自动开仓以防止重仓。")
-                        return
-
-                    self.log_display.append(f"AI 系统: 正在为 {self.current_symbol} 执行自动开仓...")
-                    price = self.binance.get_ticker_price(self.current_symbol)
-                    
                     try:
                         amount = float(self.amount_input.text())
                     except:
                         amount = config.DEFAULT_TRADE_AMOUNT
-
-                    # 自动交易也使用异步 Worker
-                    class AutoTradeWorker(QThread):
-                        finished = pyqtSignal(bool, str)
-                        def __init__(self, engine, symbol, side, price, amount, leverage, margin_mode, tp, sl):
-                            super().__init__()
-                            self.engine = engine
-                            self.symbol = symbol
-                            self.side = side
-                            self.price = price
-                            self.amount = amount
-                            self.leverage = leverage
-                            self.margin_mode = margin_mode
-                            self.tp = tp
-                            self.sl = sl
-                        def run(self):
-                            success, msg = self.engine.open_position(
-                                self.symbol, self.side, self.price, self.amount, 
-                                leverage=self.leverage, margin_mode=self.margin_mode, 
-                                tp=self.tp, sl=self.sl, owner="AI"
-                            )
-                            self.finished.emit(success, msg)
-
-                    self.auto_trade_worker = AutoTradeWorker(
-                        self.trading, self.current_symbol, action, price, amount, 
-                        self.last_ai_signal['leverage'], self.last_ai_signal['margin_mode'], 
-                        self.last_ai_signal['tp'], self.last_ai_signal['sl']
+                    _, msg = self.core.auto_open(
+                        symbol, self.last_ai_signal, self.market_cache.price(symbol), amount,
+                        callback=self.trade_finished.emit, fetch_price=self.binance.get_ticker_price
                     )
-                    self.auto_trade_worker.finished.connect(lambda success, msg: self.on_trade_finished(success, msg, price))
-                    self.auto_trade_worker.start()
+                    self.log_sink.append(msg)
             else:
-                self.last_ai_signal = None
-                self.follow_btn.setEnabled(False)
-                self.reverse_btn.setEnabled(False)
-                self.follow_btn.setText("一键跟单 (无信号)")
-                self.reverse_btn.setText("一键反买 (无信号)")
+                self.clear_ai_signal()
 
         except Exception as e:
             print(f"AI Decision Parse Error: {e}, Raw: {res}")
 
+    def clear_ai_signal(self):
+        self.last_ai_signal = None
+        self.follow_btn.setEnabled(False)
+        self.reverse_btn.setEnabled(False)
+        self.follow_btn.setText("一键跟单 (无信号)")
+        self.reverse_btn.setText("一键反买 (无信号)")
+
+    @ui_handler
     def handle_follow_ai(self):
         if not self.last_ai_signal: return
-        price = self.binance.get_ticker_price(self.current_symbol)
         
         try:
             amount_str = self.amount_input.text().strip()
@@ -960,40 +1018,16 @@ class MainWindow(QMainWindow):
         if tp is None: tp = self.last_ai_signal['tp']
         if sl is None: sl = self.last_ai_signal['sl']
 
-        self.log_display.append(f"系统: 正在提交 AI 跟单订单 ({self.last_ai_signal['side']})...")
+        self.log_sink.append(f"系统: 正在提交 AI 跟单订单 ({self.last_ai_signal['side']})...")
         
-        class TradeWorker(QThread):
-            finished = pyqtSignal(bool, str)
-            def __init__(self, engine, symbol, side, price, amount, leverage, margin_mode, tp, sl, owner):
-                super().__init__()
-                self.engine = engine
-                self.symbol = symbol
-                self.side = side
-                self.price = price
-                self.amount = amount
-                self.leverage = leverage
-                self.margin_mode = margin_mode
-                self.tp = tp
-                self.sl = sl
-                self.owner = owner
-            def run(self):
-                success, msg = self.engine.open_position(
-                    self.symbol, self.side, self.price, self.amount, 
-                    leverage=self.leverage, margin_mode=self.margin_mode, tp=self.tp, sl=self.sl,
-                    owner=self.owner
-                )
-                self.finished.emit(success, msg)
-
-        self.trade_worker = TradeWorker(
-            self.trading, self.current_symbol, self.last_ai_signal['side'], price, amount, 
-            self.last_ai_signal['leverage'], self.last_ai_signal['margin_mode'], tp, sl, "用户(跟单)"
+        self.submit_trade(
+            self.last_ai_signal['side'], amount,
+            self.last_ai_signal['leverage'], self.last_ai_signal['margin_mode'], tp, sl, owner="用户(跟单)"
         )
-        self.trade_worker.finished.connect(lambda success, msg: self.on_trade_finished(success, msg, price))
-        self.trade_worker.start()
 
+    @ui_handler
     def handle_reverse_ai(self):
         if not self.last_ai_signal: return
-        price = self.binance.get_ticker_price(self.current_symbol)
         reverse_side = 'SHORT' if self.last_ai_signal['side'] == 'LONG' else 'LONG'
         
         try:
@@ -1021,88 +1055,128 @@ class MainWindow(QMainWindow):
             if tp: self.tp_input.setText(str(tp))
             if sl: self.sl_input.setText(str(sl))
 
-        self.log_display.append(f"系统: 正在提交 AI 反买订单 ({reverse_side})...")
+        self.log_sink.append(f"系统: 正在提交 AI 反买订单 ({reverse_side})...")
         
-        class TradeWorker(QThread):
-            finished = pyqtSignal(bool, str)
-            def __init__(self, engine, symbol, side, price, amount, leverage, margin_mode, tp, sl, owner):
-                super().__init__()
-                self.engine = engine
-                self.symbol = symbol
-                self.side = side
-                self.price = price
-                self.amount = amount
-                self.leverage = leverage
-                self.margin_mode = margin_mode
-                self.tp = tp
-                self.sl = sl
-                self.owner = owner
-            def run(self):
-                success, msg = self.engine.open_position(
-                    self.symbol, self.side, self.price, self.amount, 
-                    leverage=self.leverage, margin_mode=self.margin_mode, tp=self.tp, sl=self.sl,
-                    owner=self.owner
-                )
-                self.finished.emit(success, msg)
-
-        self.trade_worker = TradeWorker(
-            self.trading, self.current_symbol, reverse_side, price, amount, 
-            self.last_ai_signal['leverage'], self.last_ai_signal['margin_mode'], tp, sl, "用户(反买)"
+        self.submit_trade(
+            reverse_side, amount,
+            self.last_ai_signal['leverage'], self.last_ai_signal['margin_mode'], tp, sl, owner="用户(反买)"
         )
-        self.trade_worker.finished.connect(lambda success, msg: self.on_trade_finished(success, msg, price))
-        self.trade_worker.start()
 
     def open_settings(self):
         dialog = SettingsDialog(self)
         if dialog.exec_() == QDialog.Accepted:
-            self.log_display.append("系统: 配置已保存，请手动重启程序以应用新设置。")
+            self.log_sink.append("系统: 配置已保存，请手动重启程序以应用新设置。")
 
+    @ui_handler
     def on_trade_mode_changed(self, index):
+        self.core.set_real_mode(index != 0)
         if index == 0:
-            self.trading = self.sim_trading
-            self.log_display.append("系统: 已切换至 模拟交易 模式")
+            self.log_sink.append("系统: 已切换至 模拟交易 模式")
         else:
-            self.trading = self.real_trading
-            self.log_display.append("系统: 已切换至 实盘交易 模式 (请确保 API Key 有效)")
+            self.log_sink.append("系统: 已切换至 实盘交易 模式 (请确保 API Key 有效)")
 
+    @ui_handler
     def handle_ai_chat(self):
         query = self.chat_input.text()
         if not query: return
-        self.chat_display.append(f"你: {query}")
+        if self._ai_chat_busy:
+            # 上一个问题仍在回答中 (发送按钮已禁用)，问题保留在输入框中，回答结束后再发送
+            return
+        self._ai_chat_busy = True
+        self.send_btn.setEnabled(False)
+        self.chat_sink.append(f"你: {query}")
         self.chat_input.clear()
-        self.chat_display.append("AI: 正在思考...")
+        self.chat_sink.append("AI: 正在思考...")
         
         # 获取最新的行情数据摘要
         market_summary = ""
-        if self.last_df is not None:
-            df = self.last_df
-            price = df['close'].iloc[-1]
-            ma5 = df['close'].rolling(5).mean().iloc[-1]
-            high_24h = df['high'].max()
-            low_24h = df['low'].min()
-            market_summary = (f"当前价格: {price}, 24h最高: {high_24h}, 24h最低: {low_24h}, "
-                              f"MA5: {ma5:.6f}, 波动率: {high_24h - low_24h:.6f}")
+        ind = self.indicators.snapshot(self.current_symbol)
+        if ind:
+            price = ind['close']
+            # 区间高低点来自最近 range_window 根 K 线 (默认 900 根 1m，约 15 小时)，不是 24h 行情
+            high = ind['range_high']
+            low = ind['range_low']
+            window = f"近{self.indicators.params.get('range_window', 900)}根{self.market_cache.interval}K线"
+            market_summary = (f"当前价格: {price}, {window}最高: {high}, {window}最低: {low}, "
+                              f"波动率: {high - low:.6f}\n"
+                              f"{self.core.market_snapshot(self.current_symbol, self.last_df, ind)}")
+            scan = self.core.scanner_summary(self.current_symbol)
+            if scan:
+                market_summary += f"\n{scan}"
         else:
             market_summary = "正在获取实时行情..."
 
-        # 获取账户状态和最近交易历史
+        # 获取账户状态和最近交易历史 (使用后台同步的账户快照，不在 UI 线程访问交易所)
         recent_history = "\n".join(self.trading.trade_history[-5:]) # 最近5条记录
-        account_summary = (f"可用余额: {self.trading.balance:.2f} USDT, "
-                           f"当前持仓数: {len(self.trading.positions)}, "
-                           f"最近操作历史: {recent_history}")
+        account = self.core.account
+        if account is not None:
+            account_summary = (f"可用余额: {account['balance']:.2f} USDT, "
+                               f"当前持仓数: {len(account['positions'])}, "
+                               f"最近操作历史: {recent_history}")
+        else:
+            account_summary = f"账户数据同步中, 最近操作历史: {recent_history}"
 
         full_summary = f"【市场数据】: {market_summary}\n【账户状态】: {account_summary}"
 
-        self.ai_worker = AIWorker(self.ai, self.current_symbol, full_summary, query)
-        self.ai_worker.response_received.connect(self.on_ai_response)
-        self.ai_worker.start()
-
-    def on_ai_response(self, advice):
+        self._ai_stream_kind = None # 当前正在渲染的流式段落 (reasoning/content)
+        self._ai_stream_text = ["AI: "]
+        batcher = StreamBatcher(self.ai_chunk_ready.emit)
+
+        def on_done(error):
+            batcher.flush()
+            if batcher.streamed:
+                self.ai_chunk_ready.emit('end', '')
+            if error:
+                self.ai_response_ready.emit(f"AI 接口调用失败: {error}")
+            elif not batcher.streamed:
+                self.ai_response_ready.emit("AI 未返回任何内容")
+            # 所有输出都已排在前面，UI 线程处理到这里时本次对话已渲染完毕
+            self.ai_chunk_ready.emit('done', '')
+
+        # 对话请求优先于后台交易信号
+        self.ai_scheduler.submit_chat(self.current_symbol, full_summary, query,
+                                      on_delta=batcher.add, on_done=on_done)
+
+    def _remove_thinking_line(self):
         cursor = self.chat_display.textCursor()
         cursor.movePosition(cursor.End)
         cursor.select(cursor.LineUnderCursor)
         cursor.removeSelectedText()
-        self.chat_display.append(f"AI: {advice}")
+
+    @ui_handler
+    def on_ai_chunk(self, kind, text):
+        """增量渲染流式回复：首个增量替换“正在思考...”，之后直接追加到末尾；结束时把完整回复写入日志文件"""
+        if kind == 'done':
+            self._ai_chat_busy = False
+            self.send_btn.setEnabled(True)
+            return
+        if kind == 'end':
+            self.chat_sink.record("".join(self._ai_stream_text))
+            self._ai_stream_text = []
+            return
+        self.chat_sink.flush() # 先显示缓冲中的对话，保证顺序
+        if self._ai_stream_kind is None:
+            self._remove_thinking_line()
+            self.chat_display.append("AI: ")
+        if kind != self._ai_stream_kind:
+            if kind == 'reasoning':
+                text = "【思考过程】\n" + text
+            elif self._ai_stream_kind == 'reasoning':
+                text = "\n\n【建议】\n" + text
+            self._ai_stream_kind = kind
+        self._ai_stream_text.append(text)
+
+        cursor = self.chat_display.textCursor()
+        cursor.movePosition(cursor.End)
+        cursor.insertText(text)
+        self.chat_display.ensureCursorVisible()
+
+    @ui_handler
+    def on_ai_response(self, advice):
+        self.chat_sink.flush()
+        if self._ai_stream_kind is None:
+            self._remove_thinking_line()
+        self.chat_sink.append(f"AI: {advice}")
 
 if __name__ == "__main__":
     app = QApplication(sys.argv)
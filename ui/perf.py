@@ -0,0 +1,175 @@
+import json
+import os
+import threading
+import time
+from collections import deque
+from PyQt5.QtCore import QObject, QTimer, Qt
+from PyQt5.QtWidgets import QLabel
+from metrics import LatencyRecorder, latency
+import config
+
+
+class TraceRecorder:
+    """
+    Chrome trace 格式的事件环形缓冲区 (导出的文件可用 chrome://tracing 或 Perfetto 打开)，线程安全
+    只保留最近 max_events 个事件，长时间录制时内存固定
+    """
+
+    def __init__(self, max_events=200000):
+        self._events = deque(maxlen=max_events)
+        self._lock = threading.Lock()
+        self._origin = time.perf_counter()
+        self._pid = os.getpid()
+
+    def __len__(self):
+        return len(self._events)
+
+    def _us(self, t):
+        return (t - self._origin) * 1e6
+
+    def complete(self, name, start, ms, cat="slot"):
+        """一段耗时: start 为 time.perf_counter() 时刻"""
+        event = {'name': name, 'cat': cat, 'ph': 'X', 'ts': self._us(start), 'dur': ms * 1000.0,
+                 'pid': self._pid, 'tid': threading.get_ident()}
+        with self._lock:
+            self._events.append(event)
+
+    def counter(self, name, values):
+        """计数器曲线 (如事件循环延迟、队列深度)，values: {序列名: 数值}"""
+        event = {'name': name, 'ph': 'C', 'ts': self._us(time.perf_counter()), 'pid': self._pid, 'args': values}
+        with self._lock:
+            self._events.append(event)
+
+    def clear(self):
+        with self._lock:
+            self._events.clear()
+
+    def export(self, path):
+        with self._lock:
+            events = list(self._events)
+        # 线程名元数据，便于在查看器中区分 UI 线程和各工作线程
+        events += [{'name': 'thread_name', 'ph': 'M', 'pid': self._pid, 'tid': t.ident, 'args': {'name': t.name}}
+                   for t in threading.enumerate()]
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump({'traceEvents': events, 'displayTimeUnit': 'ms'}, f, ensure_ascii=False)
+        return path
+
+
+class PerfMonitor(QObject):
+    """
+    界面性能监控 (默认关闭，F12 切换):
+    - 事件循环延迟: 高精度定时器每 LAG_INTERVAL_MS 触发一次，实际间隔超出的部分即为 UI 线程被占用的时间
+    - 槽函数耗时: 由 StallDetector 转发 @ui_handler 的每次调用
+    - 绘制耗时: watch_paint() 包装指定对象的 paint/paintEvent
+    - 队列深度: 定期采样 gauges 中的各个函数
+    所有数据写入 Chrome trace 环形缓冲区，可随时导出；最近 10 秒的统计显示在窗口右上角的浮层中
+    """
+    LAG_INTERVAL_MS = 50
+    SAMPLE_INTERVAL_MS = 500
+
+    def __init__(self, window, gauges=None, enabled=False):
+        super().__init__(window)
+        self.window = window
+        self.gauges = dict(gauges or {}) # 名称 -> 返回当前队列深度的函数
+        self.trace = TraceRecorder(config.PERF_TRACE_EVENTS)
+        self.recent = LatencyRecorder(rolling_window=10)
+        self.enabled = False
+        self._depths = {}
+        self._last_tick = None
+
+        self._lag_timer = QTimer(self)
+        self._lag_timer.setTimerType(Qt.PreciseTimer)
+        self._lag_timer.timeout.connect(self._on_lag_tick)
+        self._sample_timer = QTimer(self)
+        self._sample_timer.timeout.connect(self._sample)
+
+        self.overlay = QLabel(window)
+        self.overlay.setAttribute(Qt.WA_TransparentForMouseEvents)
+        self.overlay.setStyleSheet("background-color: rgba(0, 0, 0, 180); color: #F0B90B; padding: 6px; "
+                                   "font-family: 'Consolas'; font-size: 11px; border: 1px solid #F0B90B;")
+        self.overlay.hide()
+        self.set_enabled(enabled)
+
+    def set_enabled(self, enabled):
+        self.enabled = enabled
+        if enabled:
+            self._last_tick = time.perf_counter()
+            self._lag_timer.start(self.LAG_INTERVAL_MS)
+            self._sample_timer.start(self.SAMPLE_INTERVAL_MS)
+            self._sample()
+            self.overlay.show()
+            self.overlay.raise_()
+        else:
+            self._lag_timer.stop()
+            self._sample_timer.stop()
+            self.overlay.hide()
+
+    def toggle(self):
+        self.set_enabled(not self.enabled)
+
+    def record(self, name, start, ms, cat="slot"):
+        if self.enabled:
+            self.recent.record(f"{cat}.{name}", ms)
+            self.trace.complete(name, start, ms, cat)
+
+    def watch_paint(self, obj, name, method="paint"):
+        """包装 obj 的绘制方法 (QGraphicsItem.paint 或 QWidget.paintEvent)，记录每次绘制的耗时"""
+        original = getattr(obj, method)
+        def timed(*args):
+            if not self.enabled:
+                return original(*args)
+            start = time.perf_counter()
+            try:
+                return original(*args)
+            finally:
+                self.record(name, start, (time.perf_counter() - start) * 1000.0, cat="paint")
+        setattr(obj, method, timed)
+
+    def _on_lag_tick(self):
+        now = time.perf_counter()
+        lag = max(0.0, (now - self._last_tick) * 1000.0 - self.LAG_INTERVAL_MS)
+        self._last_tick = now
+        self.recent.record("loop.lag", lag)
+        latency.record("ui.loop_lag", lag)
+        self.trace.counter("loop_lag_ms", {'lag': lag})
+
+    def _sample(self):
+        depths = {}
+        for name, fn in self.gauges.items():
+            try:
+                depths[name] = fn()
+            except Exception:
+                depths[name] = -1
+        self._depths = depths
+        if depths:
+            self.trace.counter("queue_depth", depths)
+        self._refresh_overlay()
+
+    def _refresh_overlay(self):
+        stats = self.recent.dump()
+        lines = []
+        lag = stats.get("loop.lag")
+        if lag:
+            lines.append(f"事件循环延迟  p95 {lag['p95_ms']:6.1f}  max {lag['max_ms']:6.1f} ms")
+        for cat, title in (("paint", "绘制"), ("slot", "槽函数")):
+            items = [(name[len(cat) + 1:], s) for name, s in stats.items() if name.startswith(cat + ".")]
+            items.sort(key=lambda kv: kv[1]['mean_ms'] * kv[1]['count'], reverse=True)
+            if items:
+                lines.append(f"{title} (近 10 秒 次数/p95/max ms)")
+                lines.extend(f"  {name:<26}{s['count']:>5}{s['p95_ms']:>7.1f}{s['max_ms']:>7.1f}" for name, s in items[:6])
+        if self._depths:
+            lines.append("队列: " + " | ".join(f"{name} {depth}" for name, depth in self._depths.items()))
+        lines.append(f"trace 事件 {len(self.trace)} | F12 关闭 | Ctrl+Shift+T 导出")
+        self.overlay.setText("\n".join(lines))
+        self.overlay.adjustSize()
+        self.overlay.move(self.window.width() - self.overlay.width() - 12, 12)
+        self.overlay.raise_()
+
+    def export(self, directory=None):
+        """导出 trace 文件 (同时导出全局耗时统计)，返回 trace 文件路径"""
+        directory = directory or config.LOG_DIR or "."
+        os.makedirs(directory, exist_ok=True)
+        path = os.path.join(directory, time.strftime("trace-%Y%m%d-%H%M%S.json"))
+        self.trace.export(path)
+        latency.export_json(path[:-len(".json")] + "-metrics.json")
+        return path
@@ -0,0 +1,127 @@
+from PyQt5.QtWidgets import QStyledItemDelegate, QStyleOptionButton, QStyle, QApplication
+from PyQt5.QtCore import QAbstractTableModel, QModelIndex, QEvent, Qt, pyqtSignal
+from PyQt5.QtGui import QColor
+
+
+def _fmt_price(value):
+    return f"{value:.6f}".rstrip('0').rstrip('.') if value else "-"
+
+
+class PositionTableModel(QAbstractTableModel):
+    """
+    持仓表格模型，以持仓 id 为键:
+    每次刷新只对新增、删除和内容变化的行发出 beginInsertRows / beginRemoveRows / dataChanged，
+    未变化的持仓不做任何格式化和重绘
+    """
+    HEADERS = ["ID", "币种", "方向", "数量", "入场价", "止盈/止损", "操作"]
+    CLOSE_COLUMN = 6
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self._ids = []        # 行顺序
+        self._positions = {}  # id -> 持仓字典 (副本)
+        self._cells = {}      # id -> 各列显示文本
+
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self._ids)
+
+    def columnCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self.HEADERS)
+
+    def headerData(self, section, orientation, role=Qt.DisplayRole):
+        if role == Qt.DisplayRole and orientation == Qt.Horizontal:
+            return self.HEADERS[section]
+        return super().headerData(section, orientation, role)
+
+    def data(self, index, role=Qt.DisplayRole):
+        if not index.isValid():
+            return None
+        pos_id = self._ids[index.row()]
+        if role == Qt.DisplayRole:
+            return self._cells[pos_id][index.column()]
+        if role == Qt.ForegroundRole and index.column() == 2:
+            return QColor('#2ebd85' if self._positions[pos_id]['side'] == 'LONG' else '#f6465d')
+        return None
+
+    @staticmethod
+    def _format(pos):
+        return (
+            f"{pos.get('owner', '用户')}-{pos['id']}",
+            f"{pos['symbol']} ({pos.get('leverage', 1)}x {pos.get('margin_mode', '全仓')})",
+            pos['side'],
+            f"{pos['amount']:.4f}",
+            _fmt_price(pos['entry_price']),
+            f"止盈:{_fmt_price(pos.get('tp'))} / 止损:{_fmt_price(pos.get('sl'))}",
+            "平仓",
+        )
+
+    def set_positions(self, positions):
+        """用最新的持仓列表更新模型，只应用差异"""
+        incoming = {pos['id']: pos for pos in positions}
+
+        # 删除: 从后往前，连续的行合并为一次 beginRemoveRows
+        row = len(self._ids) - 1
+        while row >= 0:
+            if self._ids[row] in incoming:
+                row -= 1
+                continue
+            end = row
+            while row > 0 and self._ids[row - 1] not in incoming:
+                row -= 1
+            self.beginRemoveRows(QModelIndex(), row, end)
+            for pos_id in self._ids[row:end + 1]:
+                del self._positions[pos_id]
+                del self._cells[pos_id]
+            del self._ids[row:end + 1]
+            self.endRemoveRows()
+            row -= 1
+
+        # 变化: 只对内容不同的单元格范围发出 dataChanged
+        for row, pos_id in enumerate(self._ids):
+            pos = incoming[pos_id]
+            if pos == self._positions[pos_id]:
+                continue
+            cells = self._format(pos)
+            old = self._cells[pos_id]
+            changed = [col for col in range(len(cells)) if cells[col] != old[col]]
+            self._positions[pos_id] = dict(pos)
+            self._cells[pos_id] = cells
+            if changed:
+                self.dataChanged.emit(self.index(row, changed[0]), self.index(row, changed[-1]))
+
+        # 新增: 追加到末尾
+        new_ids = [pos_id for pos_id in incoming if pos_id not in self._positions]
+        if new_ids:
+            first = len(self._ids)
+            self.beginInsertRows(QModelIndex(), first, first + len(new_ids) - 1)
+            for pos_id in new_ids:
+                self._positions[pos_id] = dict(incoming[pos_id])
+                self._cells[pos_id] = self._format(incoming[pos_id])
+            self._ids.extend(new_ids)
+            self.endInsertRows()
+
+    def position(self, pos_id):
+        """按 id 取持仓 (副本)；不存在时返回 None"""
+        pos = self._positions.get(pos_id)
+        return dict(pos) if pos else None
+
+    def position_at(self, row):
+        return self.position(self._ids[row]) if 0 <= row < len(self._ids) else None
+
+
+class ButtonDelegate(QStyledItemDelegate):
+    """把单元格绘制成按钮，点击时发出 clicked(row)，代替每行一个 QPushButton"""
+    clicked = pyqtSignal(int)
+
+    def paint(self, painter, option, index):
+        button = QStyleOptionButton()
+        button.rect = option.rect.adjusted(4, 2, -4, -2)
+        button.text = index.data(Qt.DisplayRole)
+        button.state = QStyle.State_Enabled
+        QApplication.style().drawControl(QStyle.CE_PushButton, button, painter)
+
+    def editorEvent(self, event, model, option, index):
+        if event.type() == QEvent.MouseButtonRelease and event.button() == Qt.LeftButton:
+            self.clicked.emit(index.row())
+            return True
+        return super().editorEvent(event, model, option, index)
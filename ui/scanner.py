@@ -0,0 +1,66 @@
+from PyQt5.QtCore import QAbstractTableModel, QModelIndex, Qt
+from PyQt5.QtGui import QColor
+
+
+class ScannerTableModel(QAbstractTableModel):
+    """
+    全市场扫描结果 (前 N 名) 的表格模型
+    行数不变时只对整张表发出一次 dataChanged，不重建表头和选择状态
+    """
+    HEADERS = ["#", "合约", "得分", "动量", "波动扩张", "量能 z", "价格", "24h 涨跌", "24h 成交额"]
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self._rows = []  # 扫描结果中的 top 列表
+        self._cells = []
+
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self._rows)
+
+    def columnCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self.HEADERS)
+
+    def headerData(self, section, orientation, role=Qt.DisplayRole):
+        if role == Qt.DisplayRole and orientation == Qt.Horizontal:
+            return self.HEADERS[section]
+        return super().headerData(section, orientation, role)
+
+    def data(self, index, role=Qt.DisplayRole):
+        if not index.isValid():
+            return None
+        if role == Qt.DisplayRole:
+            return self._cells[index.row()][index.column()]
+        if role == Qt.ForegroundRole and index.column() in (3, 7):
+            row = self._rows[index.row()]
+            value = row['momentum'] if index.column() == 3 else row['change_pct']
+            return QColor('#2ebd85' if value >= 0 else '#f6465d')
+        if role == Qt.TextAlignmentRole and index.column() != 1:
+            return Qt.AlignRight | Qt.AlignVCenter
+        return None
+
+    @staticmethod
+    def _format(rank, row):
+        return (
+            str(rank),
+            row['symbol'],
+            f"{row['score']:.2f}",
+            f"{row['momentum']:+.2f}%",
+            f"{row['vol_expansion']:.2f}x",
+            f"{row['volume_z']:+.1f}",
+            f"{row['price']:.6g}",
+            f"{row['change_pct']:+.2f}%",
+            f"{row['quote_volume'] / 1e6:,.1f}M",
+        )
+
+    def set_results(self, top):
+        cells = [self._format(i + 1, row) for i, row in enumerate(top)]
+        if len(top) != len(self._rows):
+            self.beginResetModel()
+            self._rows, self._cells = list(top), cells
+            self.endResetModel()
+        elif cells != self._cells:
+            self._rows, self._cells = list(top), cells
+            self.dataChanged.emit(self.index(0, 0), self.index(len(cells) - 1, len(self.HEADERS) - 1))
+
+    def symbol_at(self, row):
+        return self._rows[row]['symbol'] if 0 <= row < len(self._rows) else None
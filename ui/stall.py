@@ -0,0 +1,50 @@
+import functools
+import inspect
+import time
+from metrics import latency
+
+
+class StallDetector:
+    """
+    UI 线程卡顿检测: 统计被 @ui_handler 装饰的处理函数耗时 (写入 metrics，名称为 ui.<函数名>)，
+    超过 threshold_ms (默认 16ms，即 60Hz 下的一帧) 时输出日志
+    monitor: 可选的 PerfMonitor，每次调用同时写入其 trace
+    """
+
+    def __init__(self, threshold_ms=16.0, log=print, recorder=latency, monitor=None):
+        self.threshold_ms = threshold_ms
+        self.log = log
+        self.recorder = recorder
+        self.monitor = monitor
+        self.stalls = 0
+
+    def measure(self, name, ms, start=None):
+        self.recorder.record(f"ui.{name}", ms)
+        if self.monitor is not None and start is not None:
+            self.monitor.record(name, start, ms)
+        if ms > self.threshold_ms:
+            self.stalls += 1
+            self.log(f"UI 卡顿: {name} 耗时 {ms:.1f} ms (阈值 {self.threshold_ms:.0f} ms)")
+
+
+def ui_handler(fn):
+    """
+    装饰 UI 线程处理函数，耗时交给所属对象的 stall_detector 统计
+    PyQt 会按槽函数的参数个数传递信号参数，这里只转发原函数能接收的位置参数 (如 clicked 的 checked)
+    """
+    params = list(inspect.signature(fn).parameters.values())[1:]
+    if any(p.kind == p.VAR_POSITIONAL for p in params):
+        max_args = None
+    else:
+        max_args = sum(p.kind in (p.POSITIONAL_ONLY, p.POSITIONAL_OR_KEYWORD) for p in params)
+
+    @functools.wraps(fn)
+    def wrapper(self, *args, **kwargs):
+        start = time.perf_counter()
+        try:
+            return fn(self, *args[:max_args], **kwargs)
+        finally:
+            detector = getattr(self, 'stall_detector', None)
+            if detector is not None:
+                detector.measure(fn.__name__, (time.perf_counter() - start) * 1000.0, start)
+    return wrapper